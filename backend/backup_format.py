@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Formato binário de backup do SlotManager.
+
+Layout do arquivo:
+    MAGIC
+    bloco*        -> zlib(BSON concatenados), um bloco pertence a uma coleção
+    manifesto     -> JSON com coleções, blocos (offset, tamanho, crc32, qtd)
+    trailer       -> offset, tamanho e crc32 do manifesto + MAGIC
+
+Cada bloco tem seu próprio crc32, então a integridade pode ser verificada
+sem restaurar nada:
+    python3 backup_format.py verify backup.smbk
+    python3 backup_format.py to-json backup.smbk backup.json
+"""
+
+import json
+import struct
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+import bson
+
+MAGIC = b"SMBK\x01"
+FORMAT_NAME = "slotmanager-backup"
+FORMAT_VERSION = 1
+BLOCK_DOCS = 2000
+COMPRESSION_LEVEL = 6
+MEDIA_TYPE = "application/vnd.slotmanager.backup"
+
+_TRAILER = struct.Struct("<QII")
+
+
+class BackupFormatError(Exception):
+    pass
+
+
+# Tudo que um arquivo danificado pode levantar ao ler e decodificar um bloco
+READ_ERRORS = (BackupFormatError, zlib.error, bson.errors.BSONError)
+
+
+def encode_block(docs: List[dict]) -> bytes:
+    raw = b"".join(bson.encode(doc) for doc in docs)
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def decode_block(data: bytes) -> List[dict]:
+    return bson.decode_all(zlib.decompress(data))
+
+
+def chunk_documents(docs: Iterable[dict]) -> Iterator[List[dict]]:
+    block = []
+    for doc in docs:
+        block.append(doc)
+        if len(block) >= BLOCK_DOCS:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+class BackupWriter:
+    """Escreve blocos já comprimidos e o manifesto em um arquivo binário."""
+
+    def __init__(self, fileobj: BinaryIO, meta: Optional[dict] = None):
+        self.fileobj = fileobj
+        self.meta = meta or {}
+        self.collections: Dict[str, dict] = {}
+        self.fileobj.write(MAGIC)
+        self.offset = len(MAGIC)
+
+    def add_collection(self, name: str):
+        self.collections.setdefault(name, {"count": 0, "blocks": []})
+
+    def write_block(self, name: str, compressed: bytes, count: int):
+        self.add_collection(name)
+        self.fileobj.write(compressed)
+        entry = self.collections[name]
+        entry["blocks"].append({
+            "offset": self.offset,
+            "length": len(compressed),
+            "crc32": zlib.crc32(compressed),
+            "count": count,
+        })
+        entry["count"] += count
+        self.offset += len(compressed)
+
+    def close(self):
+        manifest = json.dumps({
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "compression": "zlib",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "meta": self.meta,
+            "collections": self.collections,
+        }, separators=(',', ':')).encode('utf-8')
+        self.fileobj.write(manifest)
+        self.fileobj.write(_TRAILER.pack(self.offset, len(manifest), zlib.crc32(manifest)))
+        self.fileobj.write(MAGIC)
+        self.fileobj.flush()
+
+
+def read_manifest(fileobj: BinaryIO) -> dict:
+    fileobj.seek(0)
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise BackupFormatError("Not a SlotManager binary backup")
+    if fileobj.seek(0, 2) < len(MAGIC) + _TRAILER.size + len(MAGIC):
+        raise BackupFormatError("Truncated backup")
+    fileobj.seek(-(_TRAILER.size + len(MAGIC)), 2)
+    offset, length, crc = _TRAILER.unpack(fileobj.read(_TRAILER.size))
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise BackupFormatError("Truncated backup: trailer missing")
+    fileobj.seek(offset)
+    data = fileobj.read(length)
+    if len(data) != length or zlib.crc32(data) != crc:
+        raise BackupFormatError("Manifest checksum mismatch")
+    try:
+        manifest = json.loads(data)
+    except ValueError:
+        raise BackupFormatError("Manifest is not valid JSON")
+    if not isinstance(manifest, dict) or manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise BackupFormatError("Unsupported backup format version")
+    return manifest
+
+
+def read_block(fileobj: BinaryIO, block: dict) -> bytes:
+    fileobj.seek(block["offset"])
+    data = fileobj.read(block["length"])
+    if len(data) != block["length"] or zlib.crc32(data) != block["crc32"]:
+        raise BackupFormatError(f"Block at offset {block['offset']} is corrupted")
+    return data
+
+
+def iter_documents(fileobj: BinaryIO, manifest: dict, name: str) -> Iterator[List[dict]]:
+    """Lê os blocos de uma coleção, retornando uma lista de documentos por bloco."""
+    for block in manifest["collections"].get(name, {}).get("blocks", []):
+        yield decode_block(read_block(fileobj, block))
+
+
+def verify(fileobj: BinaryIO) -> dict:
+    """Confere manifesto, crc32 e contagem de cada bloco sem restaurar."""
+    manifest = read_manifest(fileobj)
+    errors = []
+    collections = {}
+    for name, entry in manifest["collections"].items():
+        documents = 0
+        for block in entry["blocks"]:
+            try:
+                decoded = decode_block(read_block(fileobj, block))
+            except READ_ERRORS as e:
+                errors.append(f"{name}: {str(e)}")
+                continue
+            if len(decoded) != block["count"]:
+                errors.append(f"{name}: block at offset {block['offset']} has {len(decoded)} documents, expected {block['count']}")
+            documents += len(decoded)
+        collections[name] = {"blocks": len(entry["blocks"]), "documents": documents, "expected": entry["count"]}
+    return {
+        "valid": not errors,
+        "meta": manifest.get("meta", {}),
+        "created_at": manifest.get("created_at"),
+        "collections": collections,
+        "errors": errors,
+    }
+
+
+def to_json(fileobj: BinaryIO) -> dict:
+    manifest = read_manifest(fileobj)
+    backup = dict(manifest.get("meta", {}))
+    for name in manifest["collections"]:
+        backup[name] = [doc for block in iter_documents(fileobj, manifest, name) for doc in block]
+    return backup
+
+
+def from_json(backup: dict, fileobj: BinaryIO, collections: Iterable[str]):
+    meta = {k: v for k, v in backup.items() if not isinstance(v, list)}
+    writer = BackupWriter(fileobj, meta)
+    for name in collections:
+        writer.add_collection(name)
+        for block in chunk_documents(backup.get(name) or []):
+            writer.write_block(name, encode_block(block), len(block))
+    writer.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("verify", "to-json", "from-json"):
+        print("Uso: python3 backup_format.py verify <backup.smbk>")
+        print("     python3 backup_format.py to-json <backup.smbk> <saida.json>")
+        print("     python3 backup_format.py from-json <backup.json> <saida.smbk>")
+        sys.exit(1)
+
+    command, input_file = sys.argv[1], sys.argv[2]
+    try:
+        if command == "verify":
+            with open(input_file, 'rb') as f:
+                report = verify(f)
+            for name, info in report["collections"].items():
+                print(f"  {name}: {info['documents']}/{info['expected']} documentos em {info['blocks']} blocos")
+            for error in report["errors"]:
+                print(f"  ❌ {error}")
+            print("✓ Backup íntegro" if report["valid"] else "❌ Backup corrompido")
+            sys.exit(0 if report["valid"] else 2)
+        elif command == "to-json":
+            with open(input_file, 'rb') as f:
+                backup = to_json(f)
+            with open(sys.argv[3], 'w', encoding='utf-8') as f:
+                json.dump(backup, f, ensure_ascii=False, default=str)
+        else:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                backup = json.load(f)
+            names = [k for k, v in backup.items() if isinstance(v, list)]
+            with open(sys.argv[3], 'wb') as f:
+                from_json(backup, f, names)
+    except BackupFormatError as e:
+        print(f"\n❌ {str(e)}")
+        sys.exit(2)
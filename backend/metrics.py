@@ -0,0 +1,345 @@
+"""
+Prometheus text-format metrics without external dependencies.
+
+Labelled counters, gauges and histograms live in an in-process registry and
+`REGISTRY.render()` produces the payload served at /api/metrics. Updates take
+a lock because PyMongo monitoring events arrive on driver threads.
+
+Per-request query accounting (Server-Timing header and query budget warnings)
+lives here too, fed by the same command listener.
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import Counter as ShapeCounter
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple, object] = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self.lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self.values.items()]
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """`collector()` runs at scrape time, for values read from elsewhere (e.g. pool stats)."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.counter(
+    "slotmanager_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = REGISTRY.histogram(
+    "slotmanager_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+http_in_flight = REGISTRY.gauge(
+    "slotmanager_http_requests_in_flight", "HTTP requests currently being served")
+mongo_commands = REGISTRY.counter(
+    "slotmanager_mongo_commands_total", "MongoDB commands by collection and outcome", ("collection", "command", "outcome"))
+mongo_latency = REGISTRY.histogram(
+    "slotmanager_mongo_command_duration_seconds", "MongoDB command duration by collection",
+    ("collection", "command"), buckets=MONGO_BUCKETS)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request counts, latency and in-flight gauge, labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            # The router stores the matched route in the (shared) scope; using
+            # its template keeps label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(scope["method"], path, status_code)
+            http_latency.observe(scope["method"], path, value=elapsed)
+
+
+class RequestStats:
+    """Mongo work and serialization time attributed to one HTTP request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.shapes = ShapeCounter()
+
+    def record_query(self, shape: str, seconds: float):
+        with self.lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            self.shapes[shape] += 1
+
+    def repeated_shapes(self, limit: int = 5) -> Dict[str, int]:
+        with self.lock:
+            return {shape: n for shape, n in self.shapes.most_common(limit) if n > 1}
+
+
+# Set by RequestProfiler for the duration of a request. Motor runs driver calls
+# in a copy of the caller's context, so the command listener sees it too
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def query_shape(command_name: str, collection: str, command: dict) -> str:
+    """Command, collection and filter field names, e.g. `find machines {client_id,id}`."""
+    if command_name == "aggregate":
+        stages = [next(iter(stage), "?") for stage in command.get("pipeline") or []]
+        return f"aggregate {collection} [{','.join(stages)}]"
+    spec = command.get("filter", command.get("query"))
+    for key in ("updates", "deletes"):
+        if spec is None and command.get(key):
+            spec = command[key][0].get("q")
+    fields = ",".join(sorted(spec)) if isinstance(spec, dict) else ""
+    return f"{command_name} {collection} {{{fields}}}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times every MongoDB command through PyMongo command monitoring."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight: Dict[Tuple, Tuple] = {}
+
+    @staticmethod
+    def collection_of(event: monitoring.CommandStartedEvent) -> str:
+        value = event.command.get(event.command_name)
+        if isinstance(value, str):
+            return value
+        return event.command.get("collection") or "-"
+
+    def started(self, event):
+        collection = self.collection_of(event)
+        stats = current_request.get()
+        shape = query_shape(event.command_name, collection, event.command) if stats is not None else None
+        with self.lock:
+            self.inflight[(event.connection_id, event.request_id)] = (collection, stats, shape)
+
+    def _finish(self, event, outcome: str) -> Optional[str]:
+        with self.lock:
+            collection, stats, shape = self.inflight.pop((event.connection_id, event.request_id), ("-", None, None))
+        seconds = event.duration_micros / 1_000_000
+        mongo_commands.inc(collection, event.command_name, outcome)
+        mongo_latency.observe(collection, event.command_name, value=seconds)
+        if stats is not None:
+            stats.record_query(shape, seconds)
+        return collection
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """JSONResponse that charges its render time to the current request."""
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = self.encode(content)
+        stats = current_request.get()
+        if stats is not None:
+            stats.serialization_seconds += time.perf_counter() - started
+        return body
+
+    def encode(self, content) -> bytes:
+        """The encoder itself; subclasses swap it and keep the timing."""
+        return super().render(content)
+
+
+class RequestProfiler:
+    """
+    ASGI middleware that collects RequestStats for every request, adds a
+    `Server-Timing` header (db, compute, serialization) and logs a warning when
+    a request goes over its query count or time budget. DB time is the sum of
+    command durations, so concurrent queries can make it exceed wall time.
+    """
+
+    def __init__(self, app, max_queries: int, max_ms: float, server_timing: bool = True,
+                 logger: Optional[logging.Logger] = None):
+        self.app = app
+        self.max_queries = max_queries
+        self.max_ms = max_ms
+        self.server_timing = server_timing
+        self.logger = logger or logging.getLogger(__name__)
+
+    @staticmethod
+    def timing_header(stats: RequestStats, elapsed: float) -> bytes:
+        compute = max(elapsed - stats.db_seconds - stats.serialization_seconds, 0.0)
+        return (
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+            f"compute;dur={compute * 1000:.1f}, "
+            f"serialization;dur={stats.serialization_seconds * 1000:.1f}"
+        ).encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        event_stream = False
+
+        async def send_wrapper(message):
+            nonlocal event_stream
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                event_stream = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                   for name, value in headers)
+                if self.server_timing:
+                    headers.append((b"server-timing", self.timing_header(stats, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # Event streams stay open by design, their duration is not a budget breach
+            if not event_stream and (stats.queries > self.max_queries or elapsed_ms > self.max_ms):
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                self.logger.warning("Query budget exceeded: %s", json.dumps({
+                    "method": scope["method"],
+                    "route": route,
+                    "queries": stats.queries,
+                    "max_queries": self.max_queries,
+                    "elapsed_ms": round(elapsed_ms, 1),
+                    "max_ms": self.max_ms,
+                    "db_ms": round(stats.db_seconds * 1000, 1),
+                    "serialization_ms": round(stats.serialization_seconds * 1000, 1),
+                    "repeated_shapes": stats.repeated_shapes(),
+                }))
@@ -0,0 +1,52 @@
+"""
+Money in integer cents.
+
+Readings keep their amounts in integer cents next to the float fields the API
+has always returned. The calculation rounds each amount once, half up, so net
+always equals gross minus commissions to the cent, and totals are exact integer
+$sums in the aggregation. Documents written before cents existed fall back to
+their float value until the migrate_money_cents job has filled them.
+
+Used by the API and by the scripts that load readings straight into MongoDB.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+MONEY_FIELDS = {
+    "gross_value": "gross_cents",
+    "client_commission": "client_commission_cents",
+    "operator_commission": "operator_commission_cents",
+    "net_value": "net_cents",
+}
+CENT_FIELDS = list(MONEY_FIELDS.values())
+
+
+def round_cents(value: Decimal) -> int:
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_cents(value) -> int:
+    # str() first: the decimal repr of a float, not its binary expansion
+    return round_cents(Decimal(str(value)) * 100)
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def money_values(cents: dict) -> dict:
+    return {field: from_cents(cents.get(cents_field) or 0) for field, cents_field in MONEY_FIELDS.items()}
+
+
+def reading_cents(reading: dict) -> dict:
+    return {
+        cents_field: reading[cents_field] if reading.get(cents_field) is not None else to_cents(reading.get(field) or 0)
+        for field, cents_field in MONEY_FIELDS.items()
+    }
+
+
+def with_cents(reading: dict) -> dict:
+    """Fills the cents fields of a reading from outside (backups, converters) and aligns its floats with them."""
+    reading.update(reading_cents(reading))
+    reading.update(money_values(reading))
+    return reading
@@ -0,0 +1,147 @@
+"""
+Comprovantes de leitura em lote.
+
+Recebe os extratos já calculados pelo servidor (um por cliente) e gera HTML
+pronto para impressão: um documento com uma página por cliente (o navegador
+imprime ou salva como PDF) ou um .zip com um arquivo por cliente. São funções
+puras, chamadas em threads de trabalho para não travar o event loop.
+"""
+
+import csv
+import html
+import io
+import re
+import unicodedata
+import zipfile
+from typing import List, Optional, Tuple
+
+STYLE = """
+body { font-family: Arial, Helvetica, sans-serif; color: #1e293b; margin: 0; }
+.receipt { max-width: 760px; margin: 0 auto; padding: 32px; page-break-after: always; break-after: page; }
+.receipt:last-child { page-break-after: auto; break-after: auto; }
+h1 { font-size: 22px; margin: 0 0 4px; }
+.muted { color: #64748b; font-size: 13px; }
+.box { border: 1px solid #cbd5e1; border-radius: 6px; padding: 12px 16px; margin: 16px 0; }
+.box h2 { font-size: 15px; margin: 0 0 6px; text-transform: uppercase; color: #475569; }
+.name { font-size: 20px; font-weight: bold; }
+table { width: 100%; border-collapse: collapse; font-size: 14px; }
+th, td { padding: 6px 8px; border-bottom: 1px solid #e2e8f0; text-align: left; }
+th.num, td.num { text-align: right; }
+.summary td { border: none; padding: 4px 0; }
+.summary .net td { border-top: 2px solid #1e293b; font-size: 18px; font-weight: bold; padding-top: 8px; }
+.signature { margin-top: 48px; display: flex; gap: 48px; }
+.signature div { flex: 1; border-top: 1px solid #1e293b; padding-top: 4px; text-align: center; font-size: 13px; }
+"""
+
+
+def money(value: float) -> str:
+    formatted = f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {formatted}"
+
+
+def format_date(value: Optional[str]) -> str:
+    if not value or len(value) < 10:
+        return value or ""
+    year, month, day = value[:10].split("-")
+    return f"{day}/{month}/{year}"
+
+
+def commission_label(entity: dict) -> str:
+    if entity.get("commission_type") == "percentage":
+        return f"{entity.get('commission_value', 0):g}%"
+    return f"fixa de {money(entity.get('commission_value') or 0)} por leitura"
+
+
+def period_label(period: dict) -> str:
+    start, end = format_date(period.get("start")), format_date(period.get("end"))
+    if start and end:
+        return f"{start} a {end}"
+    if start:
+        return f"a partir de {start}"
+    if end:
+        return f"até {end}"
+    return "todas as leituras"
+
+
+def render_receipt(statement: dict) -> str:
+    """Uma página (section) de comprovante para um cliente."""
+    esc = html.escape
+    client = statement["client"]
+    totals = statement["totals"]
+    rows = "".join(
+        f"<tr><td>{esc(m['code'])} - {esc(m['name'])}</td><td class=\"num\">{m['multiplier']:g}</td>"
+        f"<td class=\"num\">{m['count']}</td><td class=\"num\">{money(m['gross_value'])}</td></tr>"
+        for m in statement["machines"]
+    )
+    operators = "".join(
+        f"<div class=\"name\">{esc(o['name'])}</div><div class=\"muted\">Comissão: {esc(commission_label(o))}</div>"
+        for o in statement["operators"]
+    )
+    operator_box = f"<div class=\"box\"><h2>Operador responsável</h2>{operators}</div>" if operators else ""
+    operator_row = (
+        f"<tr><td>Comissão operador</td><td class=\"num\">- {money(totals['operator_commission'])}</td></tr>"
+        if totals["operator_commission"] else ""
+    )
+    return f"""<section class="receipt">
+<h1>Comprovante de Leitura</h1>
+<div class="muted">Período: {esc(period_label(statement['period']))} &middot; Emitido em {esc(format_date(statement['issued_at']))}</div>
+<div class="box"><h2>Cliente</h2><div class="name">{esc(client['name'])}</div><div class="muted">Comissão: {esc(commission_label(client))}</div></div>
+{operator_box}
+<div class="box"><h2>Máquinas lidas ({len(statement['machines'])})</h2>
+<table><thead><tr><th>Máquina</th><th class="num">Multiplicador</th><th class="num">Leituras</th><th class="num">Valor bruto</th></tr></thead>
+<tbody>{rows}</tbody></table></div>
+<div class="box"><h2>Resumo financeiro</h2><table class="summary">
+<tr><td>Valor bruto total</td><td class="num">{money(totals['gross_value'])}</td></tr>
+<tr><td>Comissão cliente</td><td class="num">- {money(totals['client_commission'])}</td></tr>
+{operator_row}
+<tr class="net"><td>Valor líquido</td><td class="num">{money(totals['net_value'])}</td></tr>
+</table></div>
+<div class="signature"><div>Cliente</div><div>Operador</div></div>
+</section>
+"""
+
+
+def document_head(title: str) -> str:
+    return (f"<!DOCTYPE html>\n<html lang=\"pt-BR\"><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            f"<style>{STYLE}</style></head><body>\n")
+
+
+DOCUMENT_TAIL = "</body></html>\n"
+
+
+def render_pages(statements: List[dict]) -> str:
+    return "".join(render_receipt(statement) for statement in statements)
+
+
+def slug(value: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", ascii_text.lower()).strip("-") or "cliente"
+
+
+def render_files(statements: List[dict], first_number: int) -> List[Tuple[str, str]]:
+    """(nome do arquivo, HTML completo) por cliente, numerados a partir de `first_number`."""
+    return [
+        (f"{number:04d}-{slug(statement['client']['name'])}.html",
+         document_head(f"Comprovante - {statement['client']['name']}") + render_receipt(statement) + DOCUMENT_TAIL)
+        for number, statement in enumerate(statements, start=first_number)
+    ]
+
+
+def summary_csv(statements: List[dict]) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["cliente", "maquinas", "leituras", "valor_bruto", "comissao_cliente", "comissao_operador", "valor_liquido"])
+    for statement in statements:
+        totals = statement["totals"]
+        writer.writerow([statement["client"]["name"], len(statement["machines"]), totals["count"],
+                         *(f"{totals[f]:.2f}" for f in ("gross_value", "client_commission", "operator_commission", "net_value"))])
+    return output.getvalue()
+
+
+def build_zip(files: List[Tuple[str, str]], summary: str) -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+        archive.writestr("resumo.csv", summary)
+    return output.getvalue()
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -12,17 +13,136 @@ import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
+import orjson
 import io
 import csv
+import json
+import base64
+import asyncio
+import hashlib
+import heapq
+import re
+import unicodedata
+import socket
+import threading
+import time
+import contextlib
+from decimal import Decimal, ROUND_HALF_UP
+from pymongo import ReplaceOne, DeleteOne, UpdateOne, WriteConcern, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+import backup_format
+import metrics
+from money import CENT_FIELDS, MONEY_FIELDS, from_cents, money_values, reading_cents, round_cents, to_cents, with_cents
+import receipts
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters per server, fed by PyMongo CMAP events (called from driver threads)."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.servers = {}
+    
+    def _update(self, address, **deltas):
+        key = f"{address[0]}:{address[1]}"
+        with self.lock:
+            server = self.servers.setdefault(key, {"open": 0, "checked_out": 0, "waiting": 0, "created": 0, "check_out_failures": 0, "cleared": 0})
+            for field, delta in deltas.items():
+                server[field] += delta
+    
+    def snapshot(self) -> dict:
+        with self.lock:
+            servers = {key: dict(counts, available=max(counts["open"] - counts["checked_out"], 0))
+                       for key, counts in self.servers.items()}
+        totals = {field: sum(counts[field] for counts in servers.values())
+                  for field in ("open", "checked_out", "available", "waiting")}
+        return {**totals, "servers": servers}
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def pool_cleared(self, event): self._update(event.address, cleared=1)
+    def connection_created(self, event): self._update(event.address, open=1, created=1)
+    def connection_closed(self, event): self._update(event.address, open=-1)
+    def connection_check_out_started(self, event): self._update(event.address, waiting=1)
+    def connection_check_out_failed(self, event): self._update(event.address, waiting=-1, check_out_failures=1)
+    def connection_checked_out(self, event): self._update(event.address, waiting=-1, checked_out=1)
+    def connection_checked_in(self, event): self._update(event.address, checked_out=-1)
+
+def mongo_client_options() -> dict:
+    # Unset variables keep the driver defaults
+    settings = {
+        "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+        "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+        "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+        "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+        "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+        "compressors": ("MONGO_COMPRESSORS", str),  # e.g. "zstd,snappy,zlib"
+    }
+    options = {}
+    for option, (variable, cast) in settings.items():
+        if os.environ.get(variable):
+            options[option] = cast(os.environ[variable])
+    return options
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+mongo_options = mongo_client_options()
+pool_stats = PoolStats()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[pool_stats, metrics.CommandMetrics()], **mongo_options)
 db = client[os.environ['DB_NAME']]
 
+# Read preference per workload class. Reports, exports and search can read
+# from secondaries (e.g. READ_PREFERENCE_REPORTS=secondaryPreferred) so they
+# stay off the primary that takes the reading writes; writes and
+# read-your-writes flows keep using `db`. Secondaries lagging more than
+# READ_MAX_STALENESS_SECONDS (-1: no bound, otherwise 90 or more) are skipped
+READ_WORKLOADS = ("reports", "exports", "search")
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', '-1'))
+if READ_MAX_STALENESS_SECONDS != -1 and READ_MAX_STALENESS_SECONDS < 90:
+    raise ValueError("READ_MAX_STALENESS_SECONDS must be -1 or at least 90")
+
+def read_preference(mode: str):
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+READ_PREFERENCES = {
+    workload: read_preference(os.environ.get(f'READ_PREFERENCE_{workload.upper()}', 'primary'))
+    for workload in READ_WORKLOADS
+}
+
+def reads(workload: str):
+    """The database handle for a read-only workload class."""
+    preference = READ_PREFERENCES[workload]
+    if preference == Primary():
+        return db
+    return db.with_options(read_preference=preference)
+
+pool_connections = metrics.REGISTRY.gauge(
+    "slotmanager_mongo_pool_connections", "MongoDB pool connections by server and state", ("server", "state"))
+
+def collect_pool_metrics():
+    for server, counts in pool_stats.snapshot()["servers"].items():
+        for state in ("open", "checked_out", "available", "waiting"):
+            pool_connections.set(server, state, value=counts[state])
+
+metrics.REGISTRY.add_collector(collect_pool_metrics)
+
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -30,7 +150,7 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=metrics.ProfiledJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # ========== MODELS ==========
@@ -63,6 +183,7 @@ class Region(BaseModel):
     name: str
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class RegionCreate(BaseModel):
     name: str
@@ -77,6 +198,7 @@ class Client(BaseModel):
     phone: Optional[str] = None
     email: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class ClientCreate(BaseModel):
     name: str
@@ -93,6 +215,7 @@ class Operator(BaseModel):
     commission_value: float
     phone: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class OperatorCreate(BaseModel):
     name: str
@@ -111,6 +234,7 @@ class Machine(BaseModel):
     operator_id: Optional[str] = None
     active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class MachineCreate(BaseModel):
     code: str
@@ -120,6 +244,28 @@ class MachineCreate(BaseModel):
     region_id: str
     operator_id: Optional[str] = None
 
+class MachineBulkChanges(BaseModel):
+    # Only fields present in the request are applied; "operator_id": null clears it
+    operator_id: Optional[str] = None
+    region_id: Optional[str] = None
+    client_id: Optional[str] = None
+    active: Optional[bool] = None
+    multiplier: Optional[float] = None
+
+class MachineFilter(BaseModel):
+    client_id: Optional[str] = None
+    region_id: Optional[str] = None
+    operator_id: Optional[str] = None
+    active: Optional[bool] = None
+
+class MachineBulkUpdateByIds(BaseModel):
+    ids: List[str]
+    changes: MachineBulkChanges
+
+class MachineBulkUpdateByFilter(BaseModel):
+    filter: MachineFilter
+    changes: MachineBulkChanges
+
 class Reading(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -132,8 +278,14 @@ class Reading(BaseModel):
     client_commission: float
     operator_commission: float
     net_value: float
+    # Exact amounts in integer cents, the floats above are derived from them
+    gross_cents: Optional[int] = None
+    client_commission_cents: Optional[int] = None
+    operator_commission_cents: Optional[int] = None
+    net_cents: Optional[int] = None
     reading_date: datetime
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class ReadingCreate(BaseModel):
     machine_id: str
@@ -149,6 +301,7 @@ class Link(BaseModel):
     client_id: str
     operator_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None  # set by stamp() on every write
 
 class LinkCreate(BaseModel):
     client_id: str
@@ -161,6 +314,39 @@ class LinkCreate(BaseModel):
 async def root():
     return {"message": "SlotManager API", "status": "running"}
 
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness(response: Response):
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2')))
+        mongo = {"ok": True, "ping_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        mongo = {"ok": False, "error": str(e) or type(e).__name__}
+    
+    pool = pool_stats.snapshot()
+    return {
+        "status": "ready" if mongo["ok"] else "unavailable",
+        "mongo": mongo,
+        "pool": {
+            "max_pool_size": client.options.pool_options.max_pool_size,
+            "min_pool_size": client.options.pool_options.min_pool_size,
+            **pool
+        }
+    }
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    # Scrapers can't log in; when METRICS_TOKEN is set they must send it as a bearer token
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # ========== AUTH HELPERS ==========
 
 def hash_password(password: str) -> str:
@@ -175,9 +361,8 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def authenticate_token(token: str) -> dict:
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
@@ -188,9 +373,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
 # ========== AUTH ROUTES ==========
 
 @api_router.post("/auth/register", response_model=Token)
@@ -229,6 +417,598 @@ async def login(credentials: UserLogin):
         user={"id": user["id"], "email": user["email"], "name": user["name"]}
     )
 
+# ========== CHANGE TRACKING ==========
+
+TRACKED_COLLECTIONS = ["regions", "clients", "operators", "machines", "readings", "links"]
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+def stamp(doc: dict) -> dict:
+    doc['updated_at'] = utc_now_iso()
+    return doc
+
+async def record_tombstones(collection: str, entity_ids: List[str]):
+    if not entity_ids:
+        return
+    now = utc_now_iso()
+    await db.tombstones.insert_many([
+        {"id": str(uuid.uuid4()), "collection": collection, "entity_id": entity_id, "deleted_at": now}
+        for entity_id in entity_ids
+    ])
+
+def changed_since_filter(mark: Optional[dict], ts_field: str = "updated_at") -> dict:
+    # Keyset on (timestamp, id) so documents sharing a timestamp are never skipped
+    if not mark:
+        return {}
+    return {"$or": [
+        {ts_field: {"$gt": mark["ts"]}},
+        {ts_field: mark["ts"], "id": {"$gt": mark["id"]}},
+    ]}
+
+# updated_at is an application clock, so a write stamped at T can become
+# visible after an export already read past T. Marks handed out never go past
+# now minus this lag, which has to cover commit latency and clock skew between
+# workers; what falls inside it is sent again by the next delta, and restores
+# upsert by id, so the overlap is harmless
+CHANGES_SAFETY_LAG_SECONDS = float(os.environ.get('CHANGES_SAFETY_LAG_SECONDS', '60'))
+
+def settled_mark() -> dict:
+    settled = datetime.now(timezone.utc) - timedelta(seconds=CHANGES_SAFETY_LAG_SECONDS)
+    return {"ts": settled.isoformat(timespec='microseconds'), "id": ""}
+
+def hold_back(previous: Optional[dict], emitted: Optional[dict], horizon: dict) -> Optional[dict]:
+    """The mark to hand out: the last one emitted, capped at `horizon` but never behind `previous`."""
+    if emitted is None:
+        return previous
+    mark = min(emitted, horizon, key=lambda m: (m["ts"], m["id"]))
+    if previous and (previous["ts"], previous["id"]) > (mark["ts"], mark["id"]):
+        return previous
+    return mark
+
+async def latest_mark(collection: str, ts_field: str = "updated_at", database=None, session=None) -> Optional[dict]:
+    database = database if database is not None else db
+    latest = await database[collection].find({}, {"_id": 0, ts_field: 1, "id": 1}, session=session).sort([(ts_field, -1), ("id", -1)]).to_list(1)
+    if not latest:
+        return None
+    return {"ts": latest[0][ts_field], "id": latest[0]["id"]}
+
+def encode_watermark(watermark: dict) -> str:
+    raw = json.dumps(watermark, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_watermark(token: str) -> dict:
+    try:
+        watermark = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    if not isinstance(watermark, dict):
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    return watermark
+
+def check_marks(marks, detail: str = "Invalid watermark") -> dict:
+    """`marks` as decoded from a token: each value a mark or None, anything else is a 400."""
+    def is_mark(mark):
+        return mark is None or (isinstance(mark, dict) and isinstance(mark.get("ts"), str) and isinstance(mark.get("id"), str))
+    if not isinstance(marks, dict) or not all(is_mark(mark) for mark in marks.values()):
+        raise HTTPException(status_code=400, detail=detail)
+    return marks
+
+# ========== BACKGROUND JOBS ==========
+
+class Job(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    type: str
+    status: str  # "pending", "running", "completed" or "failed"
+    params: dict = {}
+    progress: dict = {}
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
+
+JOB_RUNNERS = {}
+running_jobs = set()
+
+# Every uvicorn worker resumes jobs, so a job only runs where it was claimed.
+# The owner renews the lease while the job runs; once it lapses (the worker
+# died) any worker may claim the job again
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+
+def lease_deadline() -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()
+
+def claimable_jobs() -> dict:
+    # Running jobs from before leases existed have no lease_until and count as lapsed
+    return {"$or": [
+        {"status": "pending"},
+        {"status": "running", "lease_until": {"$not": {"$gte": utc_now_iso()}}}
+    ]}
+
+def job_runner(job_type: str):
+    def register(runner):
+        JOB_RUNNERS[job_type] = runner
+        return runner
+    return register
+
+class JobProgress:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.counts = {}
+    
+    async def add(self, key: str, amount: int):
+        # Dotted keys nest the same way Mongo's $inc nests them in `progress`
+        *groups, name = key.split('.')
+        counts = self.counts
+        for group in groups:
+            counts = counts.setdefault(group, {})
+        counts[name] = counts.get(name, 0) + amount
+        await db.jobs.update_one(
+            {"id": self.job_id},
+            {"$inc": {f"progress.{key}": amount}, "$set": {"updated_at": utc_now_iso()}}
+        )
+
+jobs_finished = metrics.REGISTRY.counter(
+    "slotmanager_jobs_total", "Background jobs finished by type and status", ("type", "status"))
+job_duration = metrics.REGISTRY.histogram(
+    "slotmanager_job_duration_seconds", "Background job run time by type", ("type",),
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600))
+
+async def hold_lease(job_id: str):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await db.jobs.update_one({"id": job_id, "owner": WORKER_ID}, {"$set": {"lease_until": lease_deadline()}})
+        except Exception:
+            logger.exception("Could not renew the lease of job %s", job_id)
+
+async def run_job(job: dict):
+    claimed = await db.jobs.find_one_and_update(
+        {"id": job["id"], **claimable_jobs()},
+        {"$set": {"status": "running", "owner": WORKER_ID, "lease_until": lease_deadline(), "updated_at": utc_now_iso()}}
+    )
+    if not claimed:
+        return
+    lease = asyncio.create_task(hold_lease(job["id"]))
+    started = time.perf_counter()
+    try:
+        result = await JOB_RUNNERS[job["type"]](job["params"], JobProgress(job["id"]))
+        update = {"status": "completed", "result": result}
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job["id"], job["type"])
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        lease.cancel()
+    jobs_finished.inc(job["type"], update["status"])
+    job_duration.observe(job["type"], value=time.perf_counter() - started)
+    now = utc_now_iso()
+    # Releasing the singleton key lets the next job of its kind start
+    await db.jobs.update_one(
+        {"id": job["id"], "owner": WORKER_ID},
+        {"$set": {**update, "updated_at": now, "finished_at": now, "lease_until": None}, "$unset": {"singleton": ""}}
+    )
+
+async def detached(coro):
+    # Tasks inherit the caller's context; drop the request's query accounting
+    metrics.current_request.set(None)
+    return await coro
+
+def schedule_background(coro):
+    # Keep a reference so the task is not garbage collected mid-run
+    task = asyncio.create_task(detached(coro))
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
+    return task
+
+def schedule_job(job: dict):
+    return schedule_background(run_job(job))
+
+async def start_job(job_type: str, params: dict, singleton: Optional[str] = None) -> dict:
+    """
+    With `singleton`, at most one unfinished job holds that key (a unique
+    index enforces it across workers) and the existing one is returned.
+    """
+    now = utc_now_iso()
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": job_type,
+        "status": "pending",
+        "params": params,
+        "progress": {},
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None
+    }
+    if singleton:
+        job["singleton"] = singleton
+    while True:
+        try:
+            await db.jobs.insert_one(dict(job))
+            break
+        except DuplicateKeyError:
+            existing = await db.jobs.find_one({"singleton": singleton}, {"_id": 0})
+            # Gone means it finished in between, so the key is free again
+            if existing:
+                return existing
+    schedule_job(job)
+    return job
+
+@api_router.get("/jobs", response_model=List[Job])
+async def get_jobs(status: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    query = {"status": status} if status else {}
+    return await db.jobs.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ========== ENTITY LOADER ==========
+
+loader_lookups = metrics.REGISTRY.counter(
+    "slotmanager_entity_loader_lookups_total", "EntityLoader lookups answered from the request cache or the database",
+    ("collection", "result"))
+
+class EntityLoader:
+    """
+    Request-scoped lookups by `id`. Loads issued in the same event loop tick
+    are coalesced into one `$in` query per collection (collections are queried
+    concurrently) and every id is memoized for the rest of the request.
+    Returned documents are shared between callers and must not be mutated.
+    """
+    
+    def __init__(self):
+        self.cache = {}
+        self.pending = {}
+        self.tasks = set()
+    
+    def load(self, collection: str, entity_id: Optional[str]) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        if entity_id is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+        key = (collection, entity_id)
+        if key in self.cache:
+            loader_lookups.inc(collection, "hit")
+        else:
+            loader_lookups.inc(collection, "miss")
+            if not self.pending:
+                loop.call_soon(self._dispatch)
+            self.cache[key] = loop.create_future()
+            self.pending.setdefault(collection, {})[entity_id] = self.cache[key]
+        return self.cache[key]
+    
+    async def load_many(self, collection: str, entity_ids) -> List[Optional[dict]]:
+        return await asyncio.gather(*[self.load(collection, entity_id) for entity_id in entity_ids])
+    
+    def _dispatch(self):
+        pending, self.pending = self.pending, {}
+        for collection, futures in pending.items():
+            task = asyncio.create_task(self._fetch(collection, futures))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    async def _fetch(self, collection: str, futures: dict):
+        try:
+            docs = await db[collection].find({"id": {"$in": list(futures)}}, {"_id": 0}).to_list(None)
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        found = {doc["id"]: doc for doc in docs}
+        for entity_id, future in futures.items():
+            future.set_result(found.get(entity_id))
+
+def get_loader() -> EntityLoader:
+    return EntityLoader()
+
+# ========== LIVE EVENTS ==========
+
+# Dashboards subscribe over SSE. Reading changes are coalesced for
+# LIVE_EVENTS_COALESCE_MS, then each batch is encoded once and handed to every
+# subscriber queue. A subscriber that falls LIVE_EVENTS_QUEUE_SIZE batches
+# behind gets its backlog replaced by a resync event instead of growing.
+# On a replica set a change stream feeds the events, so writes made by any
+# server process reach every dashboard
+LIVE_EVENTS_SOURCE = os.environ.get('LIVE_EVENTS_SOURCE', 'auto')  # "auto", "local" or "change_stream"
+LIVE_EVENTS_COALESCE_MS = int(os.environ.get('LIVE_EVENTS_COALESCE_MS', '250'))
+LIVE_EVENTS_QUEUE_SIZE = int(os.environ.get('LIVE_EVENTS_QUEUE_SIZE', '100'))
+LIVE_EVENTS_HEARTBEAT_SECONDS = 15
+LIVE_EVENTS_MAX_ITEMS = 20
+LIVE_READING_FIELDS = ["id", "machine_id", "reading_date", "gross_value", "client_commission", "operator_commission", "net_value"]
+
+live_subscribers = metrics.REGISTRY.gauge(
+    "slotmanager_live_event_subscribers", "Dashboards connected to the live events stream")
+
+def sse_frame(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode('utf-8')
+
+RESYNC_FRAME = sse_frame("resync", {})
+
+class LiveEvents:
+    def __init__(self):
+        self.subscribers = set()
+        self.local = True  # False while a change stream publishes instead of the endpoints
+        self.flush_handle = None
+        self._reset()
+    
+    def _reset(self):
+        self.created = []
+        self.deleted = []
+        self.delta = {"total_readings": 0, "total_gross": 0, "total_commissions": 0, "total_net": 0}  # money in cents
+        self.needs_resync = False
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=LIVE_EVENTS_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        live_subscribers.set(value=len(self.subscribers))
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        live_subscribers.set(value=len(self.subscribers))
+    
+    def publish_created(self, readings: List[dict]):
+        if self.local:
+            self.record(readings, 1)
+    
+    def publish_deleted(self, readings: List[dict]):
+        if self.local:
+            self.record(readings, -1)
+    
+    def publish_resync(self):
+        if self.subscribers:
+            self.needs_resync = True
+            self._schedule()
+    
+    def record(self, readings: List[dict], sign: int):
+        # Nobody listening, nothing to keep
+        if not self.subscribers or not readings:
+            return
+        delta = self.delta
+        for r in readings:
+            cents = reading_cents(r)
+            delta["total_readings"] += sign
+            delta["total_gross"] += sign * cents["gross_cents"]
+            delta["total_commissions"] += sign * (cents["client_commission_cents"] + cents["operator_commission_cents"])
+            delta["total_net"] += sign * cents["net_cents"]
+        if sign > 0:
+            latest = [{field: r.get(field) for field in LIVE_READING_FIELDS} for r in readings[-LIVE_EVENTS_MAX_ITEMS:]]
+            self.created = (self.created + latest)[-LIVE_EVENTS_MAX_ITEMS:]
+        else:
+            self.deleted = (self.deleted + [r["id"] for r in readings])[-LIVE_EVENTS_MAX_ITEMS:]
+        self._schedule()
+    
+    def _schedule(self):
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(LIVE_EVENTS_COALESCE_MS / 1000, self._flush)
+    
+    def _flush(self):
+        self.flush_handle = None
+        if self.needs_resync:
+            frame = RESYNC_FRAME
+        else:
+            frame = sse_frame("readings", {
+                "created": self.created,
+                "deleted": self.deleted,
+                "delta": {key: value if key == "total_readings" else from_cents(value) for key, value in self.delta.items()}
+            })
+        self._reset()
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_FRAME)
+
+live_events = LiveEvents()
+
+async def watch_reading_changes():
+    # Inserted readings carry their values; deletes are only known through
+    # tombstones (archiving moves readings without leaving one), so they resync
+    pipeline = [{"$match": {"operationType": "insert", "$or": [
+        {"ns.coll": "readings"},
+        {"ns.coll": "tombstones", "fullDocument.collection": {"$in": ["readings", "machines"]}}
+    ]}}]
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(pipeline, resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    if change["ns"]["coll"] == "readings":
+                        live_events.record([change["fullDocument"]], 1)
+                    else:
+                        live_events.publish_resync()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Live events change stream failed, reconnecting")
+            # The resume token may be gone from the oplog; start fresh and let dashboards reload
+            resume_token = None
+            live_events.publish_resync()
+            await asyncio.sleep(5)
+
+@api_router.get("/events/dashboard")
+async def dashboard_events(token: str):
+    """
+    Server-Sent Events for the dashboard: `readings` events carry the newest
+    readings, deleted ids and the change to the dashboard totals; `resync`
+    means the totals must be reloaded.
+    """
+    # EventSource can't send headers, so the JWT comes as a query parameter
+    await authenticate_token(token)
+    
+    async def stream():
+        queue = live_events.subscribe()
+        try:
+            yield b"retry: 5000\n\n" + sse_frame("ready", {"source": "local" if live_events.local else "change_stream"})
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=LIVE_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            live_events.unsubscribe(queue)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ========== SEARCH ==========
+
+# Searchable entities keep normalized copies of their fields under `search`:
+# whole values (`keys`), their words and their trigrams, each with an index.
+# Prefix matches are anchored regexes on `keys`/`words`, which MongoDB answers
+# with an index range scan; substrings narrow by trigram first
+SEARCH_FIELDS = {
+    "machines": ("code", "name"),
+    "clients": ("name", "email", "phone"),
+    "operators": ("name",),
+}
+SEARCH_TYPES = {"machines": "machine", "clients": "client", "operators": "operator"}
+SEARCH_SORT_FIELD = {"machines": "code", "clients": "name", "operators": "name"}
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 500
+SEARCH_BACKFILL_BATCH = 1000
+PHONE_QUERY = re.compile(r"[\d\s()+.-]+")
+ENTITY_PROJECTION = {"_id": 0, "search": 0}
+
+def normalize_search_text(value) -> str:
+    # Case and accent insensitive, so "JOAO" finds "João"
+    text = unicodedata.normalize("NFKD", str(value or "")).casefold()
+    return " ".join("".join(ch for ch in text if not unicodedata.combining(ch)).split())
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def search_fields(collection: str, doc: dict) -> dict:
+    keys = []
+    for field in SEARCH_FIELDS[collection]:
+        value = doc.get(field)
+        key = re.sub(r"\D", "", str(value or "")) if field == "phone" else normalize_search_text(value)
+        if key:
+            keys.append(key)
+    return {
+        "keys": keys,
+        "words": sorted({word for key in keys for word in re.findall(r"\w+", key)}),
+        "grams": sorted(set().union(*map(trigrams, keys))),
+        "sort": normalize_search_text(doc.get(SEARCH_SORT_FIELD[collection])),
+    }
+
+def index_for_search(collection: str, doc: dict) -> dict:
+    doc["search"] = search_fields(collection, doc)
+    return doc
+
+def search_terms(q: str) -> List[str]:
+    term = normalize_search_text(q)
+    terms = [term] if term else []
+    # "(11) 9999-1234" is looked up as typed and as the digits stored for phones
+    digits = re.sub(r"\D", "", q)
+    if digits and digits != term and PHONE_QUERY.fullmatch(q.strip()):
+        terms.append(digits)
+    return terms
+
+def search_tiers(terms: List[str]) -> List[tuple]:
+    """(match, filter) pairs from best to worst match."""
+    def any_of(conditions):
+        return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+    tiers = [
+        ("exact", {"search.keys": {"$in": terms}}),
+        ("prefix", any_of([{"search.keys": {"$regex": "^" + re.escape(t)}} for t in terms])),
+        ("word", any_of([{"search.words": {"$regex": "^" + re.escape(t)}} for t in terms])),
+    ]
+    substrings = [
+        {"search.grams": {"$all": sorted(trigrams(t))}, "search.keys": {"$regex": re.escape(t)}}
+        for t in terms if len(t) >= 3
+    ]
+    if substrings:
+        tiers.append(("substring", any_of(substrings)))
+    return tiers
+
+@api_router.get("/search")
+async def search(q: str, types: Optional[str] = None, limit: int = 20, offset: int = 0, current_user: dict = Depends(get_current_user)):
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    collections = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_FIELDS)
+    unknown = [t for t in collections if t not in SEARCH_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type: {', '.join(unknown)}")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    # Pages are ranked across tiers, so deep offsets would rank thousands of matches
+    if not 0 <= offset <= SEARCH_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"offset must be between 0 and {SEARCH_MAX_OFFSET}")
+    
+    # Tiers run best first and stop once the page (plus one, for has_more) is
+    # full; within a tier results follow the order of `types`, then name/code
+    wanted = offset + limit + 1
+    database = reads("search")
+    seen = {collection: [] for collection in collections}
+    results = []
+    for match, condition in search_tiers(terms):
+        remaining = wanted - len(results)
+        if remaining <= 0:
+            break
+        batches = await asyncio.gather(*[
+            database[collection].find({**condition, "id": {"$nin": seen[collection]}}, ENTITY_PROJECTION)
+            .sort([("search.sort", 1), ("id", 1)]).limit(remaining).to_list(remaining)
+            for collection in collections
+        ])
+        for collection, docs in zip(collections, batches):
+            seen[collection].extend(doc["id"] for doc in docs)
+            results.extend({"type": SEARCH_TYPES[collection], "match": match, "item": doc} for doc in docs)
+    
+    return {
+        "results": results[offset:offset + limit],
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(results) > offset + limit
+    }
+
+# ========== LIST RESPONSES ==========
+
+# List endpoints send stored documents straight to orjson instead of
+# validating every row against response_model: the $project below already
+# gives each document the model's fields, with defaults filled in, and drops
+# the rest. The routes keep response_model, so the OpenAPI schema is unchanged
+
+class TrustedJSONResponse(metrics.ProfiledJSONResponse):
+    """orjson-encoded response for content that is already in its final shape."""
+
+    def encode(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def model_projection(model) -> dict:
+    projection = {"_id": 0}
+    for name, field in model.model_fields.items():
+        if field.is_required() or field.default_factory is not None:
+            # Always written by model_dump() on insert
+            projection[name] = 1
+        else:
+            projection[name] = {"$ifNull": [f"${name}", {"$literal": field.default}]}
+    return projection
+
+LIST_PROJECTIONS = {model: model_projection(model) for model in (Region, Client, Operator, Machine, Reading, Link)}
+
+async def list_response(collection: str, model, sort: Optional[dict] = None, limit: Optional[int] = 1000) -> TrustedJSONResponse:
+    pipeline = [{"$sort": sort}] if sort else []
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": LIST_PROJECTIONS[model]})
+    return TrustedJSONResponse(await db[collection].aggregate(pipeline).to_list(limit))
+
 # ========== REGIONS ==========
 
 @api_router.post("/regions", response_model=Region)
@@ -236,22 +1016,18 @@ async def create_region(region_data: RegionCreate, current_user: dict = Depends(
     region = Region(**region_data.model_dump())
     doc = region.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.regions.insert_one(doc)
-    return region
+    await db.regions.insert_one(stamp(doc))
+    return Region(**doc)
 
 @api_router.get("/regions", response_model=List[Region])
 async def get_regions(current_user: dict = Depends(get_current_user)):
-    regions = await db.regions.find({}, {"_id": 0}).to_list(1000)
-    for r in regions:
-        if isinstance(r['created_at'], str):
-            r['created_at'] = datetime.fromisoformat(r['created_at'])
-    return regions
+    return await list_response("regions", Region)
 
 @api_router.put("/regions/{region_id}", response_model=Region)
 async def update_region(region_id: str, region_data: RegionCreate, current_user: dict = Depends(get_current_user)):
     result = await db.regions.update_one(
         {"id": region_id},
-        {"$set": region_data.model_dump()}
+        {"$set": stamp(region_data.model_dump())}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Region not found")
@@ -261,11 +1037,14 @@ async def update_region(region_id: str, region_data: RegionCreate, current_user:
     return Region(**updated)
 
 @api_router.delete("/regions/{region_id}")
-async def delete_region(region_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_region(region_id: str, reassign_to: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    await ensure_reassign_target("regions", region_id, reassign_to, "Region")
     result = await db.regions.delete_one({"id": region_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Region not found")
-    return {"message": "Region deleted"}
+    await record_tombstones("regions", [region_id])
+    job = await start_cascade_delete("region", region_id, reassign_to)
+    return {"message": "Region deleted", "job_id": job["id"]}
 
 # ========== CLIENTS ==========
 
@@ -274,22 +1053,18 @@ async def create_client(client_data: ClientCreate, current_user: dict = Depends(
     client = Client(**client_data.model_dump())
     doc = client.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.clients.insert_one(doc)
-    return client
+    await db.clients.insert_one(stamp(index_for_search("clients", doc)))
+    return Client(**doc)
 
 @api_router.get("/clients", response_model=List[Client])
 async def get_clients(current_user: dict = Depends(get_current_user)):
-    clients = await db.clients.find({}, {"_id": 0}).to_list(1000)
-    for c in clients:
-        if isinstance(c['created_at'], str):
-            c['created_at'] = datetime.fromisoformat(c['created_at'])
-    return clients
+    return await list_response("clients", Client)
 
 @api_router.put("/clients/{client_id}", response_model=Client)
 async def update_client(client_id: str, client_data: ClientCreate, current_user: dict = Depends(get_current_user)):
     result = await db.clients.update_one(
         {"id": client_id},
-        {"$set": client_data.model_dump()}
+        {"$set": stamp(index_for_search("clients", client_data.model_dump()))}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -299,11 +1074,14 @@ async def update_client(client_id: str, client_data: ClientCreate, current_user:
     return Client(**updated)
 
 @api_router.delete("/clients/{client_id}")
-async def delete_client(client_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_client(client_id: str, reassign_to: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    await ensure_reassign_target("clients", client_id, reassign_to, "Client")
     result = await db.clients.delete_one({"id": client_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
-    return {"message": "Client deleted"}
+    await record_tombstones("clients", [client_id])
+    job = await start_cascade_delete("client", client_id, reassign_to)
+    return {"message": "Client deleted", "job_id": job["id"]}
 
 # ========== OPERATORS ==========
 
@@ -312,16 +1090,12 @@ async def create_operator(operator_data: OperatorCreate, current_user: dict = De
     operator = Operator(**operator_data.model_dump())
     doc = operator.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.operators.insert_one(doc)
-    return operator
+    await db.operators.insert_one(stamp(index_for_search("operators", doc)))
+    return Operator(**doc)
 
 @api_router.get("/operators", response_model=List[Operator])
 async def get_operators(current_user: dict = Depends(get_current_user)):
-    operators = await db.operators.find({}, {"_id": 0}).to_list(1000)
-    for o in operators:
-        if isinstance(o['created_at'], str):
-            o['created_at'] = datetime.fromisoformat(o['created_at'])
-    return operators
+    return await list_response("operators", Operator)
 
 @api_router.get("/operators/{operator_id}", response_model=Operator)
 async def get_operator(operator_id: str, current_user: dict = Depends(get_current_user)):
@@ -336,7 +1110,7 @@ async def get_operator(operator_id: str, current_user: dict = Depends(get_curren
 async def update_operator(operator_id: str, operator_data: OperatorCreate, current_user: dict = Depends(get_current_user)):
     result = await db.operators.update_one(
         {"id": operator_id},
-        {"$set": operator_data.model_dump()}
+        {"$set": stamp(index_for_search("operators", operator_data.model_dump()))}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Operator not found")
@@ -346,11 +1120,14 @@ async def update_operator(operator_id: str, operator_data: OperatorCreate, curre
     return Operator(**updated)
 
 @api_router.delete("/operators/{operator_id}")
-async def delete_operator(operator_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_operator(operator_id: str, reassign_to: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    await ensure_reassign_target("operators", operator_id, reassign_to, "Operator")
     result = await db.operators.delete_one({"id": operator_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Operator not found")
-    return {"message": "Operator deleted"}
+    await record_tombstones("operators", [operator_id])
+    job = await start_cascade_delete("operator", operator_id, reassign_to)
+    return {"message": "Operator deleted", "job_id": job["id"]}
 
 # ========== MACHINES ==========
 
@@ -359,22 +1136,18 @@ async def create_machine(machine_data: MachineCreate, current_user: dict = Depen
     machine = Machine(**machine_data.model_dump())
     doc = machine.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.machines.insert_one(doc)
-    return machine
+    await db.machines.insert_one(stamp(index_for_search("machines", doc)))
+    return Machine(**doc)
 
 @api_router.get("/machines", response_model=List[Machine])
 async def get_machines(current_user: dict = Depends(get_current_user)):
-    machines = await db.machines.find({}, {"_id": 0}).to_list(1000)
-    for m in machines:
-        if isinstance(m['created_at'], str):
-            m['created_at'] = datetime.fromisoformat(m['created_at'])
-    return machines
+    return await list_response("machines", Machine)
 
 @api_router.put("/machines/{machine_id}", response_model=Machine)
 async def update_machine(machine_id: str, machine_data: MachineCreate, current_user: dict = Depends(get_current_user)):
     result = await db.machines.update_one(
         {"id": machine_id},
-        {"$set": machine_data.model_dump()}
+        {"$set": stamp(index_for_search("machines", machine_data.model_dump()))}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Machine not found")
@@ -383,56 +1156,272 @@ async def update_machine(machine_id: str, machine_data: MachineCreate, current_u
         updated['created_at'] = datetime.fromisoformat(updated['created_at'])
     return Machine(**updated)
 
+MACHINE_REFS = [("client_id", "clients", "Client"), ("region_id", "regions", "Region"), ("operator_id", "operators", "Operator")]
+MACHINE_BULK_MAX = int(os.environ.get('MACHINE_BULK_MAX', '5000'))  # machines per bulk request
+
+async def machine_ref_errors(machines: List[dict]) -> List[Optional[str]]:
+    """Per machine, what it references that does not exist, or None."""
+    lookups = {}
+    for field, collection, _ in MACHINE_REFS:
+        ids = {m[field] for m in machines if m.get(field)}
+        if ids:
+            lookups[field] = db[collection].distinct("id", {"id": {"$in": list(ids)}})
+    found = dict(zip(lookups, [set(existing) for existing in await asyncio.gather(*lookups.values())]))
+    errors = []
+    for machine in machines:
+        missing = [f"{name} not found: {machine[field]}" for field, _, name in MACHINE_REFS
+                   if machine.get(field) and machine[field] not in found[field]]
+        errors.append("; ".join(missing) or None)
+    return errors
+
+async def validate_machine_refs(changes: dict):
+    error = (await machine_ref_errors([changes]))[0]
+    if error:
+        raise HTTPException(status_code=404, detail=error)
+
+def check_bulk_size(count: int):
+    if count > MACHINE_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MACHINE_BULK_MAX} machines per request, got {count}")
+
+def bulk_changes_to_set(changes: MachineBulkChanges) -> dict:
+    updates = changes.model_dump(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No changes given")
+    for field in ("client_id", "region_id", "active", "multiplier"):
+        if field in updates and updates[field] is None:
+            raise HTTPException(status_code=400, detail=f"{field} cannot be null")
+    return updates
+
+@api_router.post("/machines/bulk")
+async def create_machines_bulk(machines_data: List[MachineCreate], current_user: dict = Depends(get_current_user)):
+    """Creates the machines whose references exist; the rest come back in `errors` with their position."""
+    if not machines_data:
+        raise HTTPException(status_code=400, detail="No machines given")
+    check_bulk_size(len(machines_data))
+    
+    ref_errors = await machine_ref_errors([m.model_dump() for m in machines_data])
+    errors = [{"index": index, "code": m.code, "error": error}
+              for index, (m, error) in enumerate(zip(machines_data, ref_errors)) if error]
+    docs, positions = [], []
+    for index, (machine_data, error) in enumerate(zip(machines_data, ref_errors)):
+        if error:
+            continue
+        doc = Machine(**machine_data.model_dump()).model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        docs.append(stamp(index_for_search("machines", doc)))
+        positions.append(index)
+    
+    rejected = set()
+    if docs:
+        try:
+            await db.machines.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                rejected.add(err["index"])
+                errors.append({"index": positions[err["index"]], "code": docs[err["index"]]["code"], "error": err.get("errmsg")})
+            if e.details.get("writeConcernErrors"):
+                raise
+    errors.sort(key=lambda error: error["index"])
+    ids = [doc["id"] for position, doc in enumerate(docs) if position not in rejected]
+    return {"created": len(ids), "ids": ids, "failed": len(errors), "errors": errors}
+
+@api_router.patch("/machines/bulk/by-ids")
+async def update_machines_by_ids(bulk: MachineBulkUpdateByIds, current_user: dict = Depends(get_current_user)):
+    check_bulk_size(len(bulk.ids))
+    updates = bulk_changes_to_set(bulk.changes)
+    await validate_machine_refs(updates)
+    result = await db.machines.update_many({"id": {"$in": bulk.ids}}, {"$set": stamp(updates)})
+    missing = []
+    if result.matched_count < len(set(bulk.ids)):
+        found = set(await db.machines.distinct("id", {"id": {"$in": bulk.ids}}))
+        missing = sorted(set(bulk.ids) - found)
+    return {"matched": result.matched_count, "modified": result.modified_count, "missing": missing}
+
+@api_router.patch("/machines/bulk/by-filter")
+async def update_machines_by_filter(bulk: MachineBulkUpdateByFilter, current_user: dict = Depends(get_current_user)):
+    query = bulk.filter.model_dump(exclude_unset=True)
+    if not query:
+        raise HTTPException(status_code=400, detail="Filter cannot be empty")
+    updates = bulk_changes_to_set(bulk.changes)
+    await validate_machine_refs(updates)
+    # The ids are taken first so a filter never updates more than the limit
+    matching = await db.machines.find(query, {"_id": 0, "id": 1}).limit(MACHINE_BULK_MAX + 1).to_list(MACHINE_BULK_MAX + 1)
+    if len(matching) > MACHINE_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Filter matches more than {MACHINE_BULK_MAX} machines; narrow it down")
+    result = await db.machines.update_many({"id": {"$in": [m["id"] for m in matching]}}, {"$set": stamp(updates)})
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
 @api_router.delete("/machines/{machine_id}")
 async def delete_machine(machine_id: str, current_user: dict = Depends(get_current_user)):
     result = await db.machines.delete_one({"id": machine_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Machine not found")
-    return {"message": "Machine deleted"}
+    await record_tombstones("machines", [machine_id])
+    job = await start_cascade_delete("machine", machine_id)
+    return {"message": "Machine deleted", "job_id": job["id"]}
+
+# ========== READING INGESTION ==========
+
+# "direct" inserts each reading on its own. "buffered" queues validated
+# readings and commits them in insert_many batches (group commit) once a batch
+# fills up or its window closes; every request still waits for its own batch
+READINGS_WRITE_MODE = os.environ.get('READINGS_WRITE_MODE', 'direct')
+READINGS_BATCH_SIZE = int(os.environ.get('READINGS_BATCH_SIZE', '500'))
+READINGS_BATCH_WINDOW_MS = float(os.environ.get('READINGS_BATCH_WINDOW_MS', '10'))
+# Backpressure: readings queued or committing before new requests have to
+# wait, and how long they wait before getting a 503
+READINGS_MAX_PENDING = int(os.environ.get('READINGS_MAX_PENDING', '5000'))
+READINGS_ENQUEUE_TIMEOUT_S = float(os.environ.get('READINGS_ENQUEUE_TIMEOUT_S', '5'))
+# Durability of reading writes in both modes: READINGS_WRITE_W ("majority",
+# "1" or "0") and READINGS_WRITE_JOURNAL ("true"/"false") override just those
+# settings; unset, the write concern of MONGO_URL and the client applies
+READINGS_WRITE_OVERRIDES = {}
+if os.environ.get('READINGS_WRITE_W'):
+    _w = os.environ['READINGS_WRITE_W']
+    READINGS_WRITE_OVERRIDES["w"] = int(_w) if _w.isdigit() else _w
+if os.environ.get('READINGS_WRITE_JOURNAL'):
+    READINGS_WRITE_OVERRIDES["j"] = os.environ['READINGS_WRITE_JOURNAL'].lower() == 'true'
+
+reading_batches = metrics.REGISTRY.histogram(
+    "slotmanager_reading_batch_size", "Readings per buffered insert_many",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+readings_pending = metrics.REGISTRY.gauge(
+    "slotmanager_readings_pending", "Buffered readings waiting for or inside a batch commit")
+
+def readings_writes():
+    if not READINGS_WRITE_OVERRIDES:
+        return db.readings
+    concern = WriteConcern(**{**db.readings.write_concern.document, **READINGS_WRITE_OVERRIDES})
+    return db.readings.with_options(write_concern=concern)
+
+class ReadingWriter:
+    def __init__(self, batch_size: int, window_ms: float, max_pending: int, enqueue_timeout: float):
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self.slots = asyncio.Semaphore(max_pending)
+        self.queue = []  # (doc, future) in arrival order
+        self.flush_handle = None
+        self.commits = set()
+    
+    async def write(self, doc: dict):
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Reading ingestion is saturated, retry later")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((doc, future))
+        readings_pending.inc()
+        if len(self.queue) >= self.batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+        # Shielded so a client that disconnects leaves the batch alone
+        await asyncio.shield(future)
+    
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        while self.queue:
+            batch, self.queue = self.queue[:self.batch_size], self.queue[self.batch_size:]
+            task = schedule_background(self._commit(batch))
+            self.commits.add(task)
+            task.add_done_callback(self.commits.discard)
+    
+    async def _commit(self, batch: List[tuple]):
+        failures = {}
+        try:
+            # Stamped now rather than when queued, so updated_at follows commit order
+            await readings_writes().insert_many([stamp(doc) for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                failures = dict.fromkeys(range(len(batch)), e)
+            else:
+                failures = {error["index"]: e for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            failures = dict.fromkeys(range(len(batch)), e)
+        finally:
+            for _ in batch:
+                self.slots.release()
+            readings_pending.dec(amount=len(batch))
+        reading_batches.observe(value=len(batch))
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failures:
+                future.set_exception(failures[index])
+            else:
+                future.set_result(None)
+    
+    async def drain(self):
+        self.flush()
+        await asyncio.gather(*self.commits, return_exceptions=True)
+
+reading_writer = ReadingWriter(
+    READINGS_BATCH_SIZE, READINGS_BATCH_WINDOW_MS, READINGS_MAX_PENDING, READINGS_ENQUEUE_TIMEOUT_S
+) if READINGS_WRITE_MODE == "buffered" else None
+
+async def insert_reading(doc: dict):
+    """Writes a reading and stamps it as it goes in."""
+    if reading_writer is not None:
+        await reading_writer.write(doc)
+    else:
+        await readings_writes().insert_one(stamp(doc))
+
+# ========== MONEY ==========
+
+# Amounts are integer cents next to the legacy floats (see money.py)
+MONEY_MIGRATION_BATCH = int(os.environ.get('MONEY_MIGRATION_BATCH', '5000'))
+
+def money_sums() -> dict:
+    """$group accumulators summing every cents field."""
+    return {
+        cents_field: {"$sum": {"$ifNull": [f"${cents_field}", {"$multiply": [f"${field}", 100]}]}}
+        for field, cents_field in MONEY_FIELDS.items()
+    }
+
+def cents_totals(row: dict) -> dict:
+    # Exact unless a float fallback was summed, which only needs rounding
+    return {cents_field: round(row.get(cents_field) or 0) for cents_field in CENT_FIELDS}
 
 # ========== READINGS ==========
 
+def commission_cents(gross_cents: int, entity: dict) -> int:
+    if entity['commission_type'] == 'percentage':
+        return round_cents(Decimal(gross_cents) * Decimal(str(entity['commission_value'])) / 100)
+    return to_cents(entity['commission_value'])
+
 async def calculate_reading(reading_data: ReadingCreate, machine: dict, client: dict, operator: dict = None):
-    diff_in = reading_data.current_in - reading_data.previous_in
-    diff_out = reading_data.current_out - reading_data.previous_out
-    gross_value = (diff_in - diff_out) * machine['multiplier']
+    diff_in = Decimal(str(reading_data.current_in)) - Decimal(str(reading_data.previous_in))
+    diff_out = Decimal(str(reading_data.current_out)) - Decimal(str(reading_data.previous_out))
+    gross = round_cents((diff_in - diff_out) * Decimal(str(machine['multiplier'])) * 100)
     
-    # Calculate commissions
-    if client['commission_type'] == 'percentage':
-        client_commission = gross_value * (client['commission_value'] / 100)
-    else:
-        client_commission = client['commission_value']
+    # Commissions are taken from the rounded gross, so the parts add up
+    client_commission = commission_cents(gross, client)
+    operator_commission = commission_cents(gross, operator) if operator else 0
     
-    operator_commission = 0
-    if operator:
-        if operator['commission_type'] == 'percentage':
-            operator_commission = gross_value * (operator['commission_value'] / 100)
-        else:
-            operator_commission = operator['commission_value']
-    
-    net_value = gross_value - client_commission - operator_commission
-    
-    return {
-        'gross_value': round(gross_value, 2),
-        'client_commission': round(client_commission, 2),
-        'operator_commission': round(operator_commission, 2),
-        'net_value': round(net_value, 2)
+    cents = {
+        'gross_cents': gross,
+        'client_commission_cents': client_commission,
+        'operator_commission_cents': operator_commission,
+        'net_cents': gross - client_commission - operator_commission
     }
+    return {**money_values(cents), **cents}
 
 @api_router.post("/readings", response_model=Reading)
-async def create_reading(reading_data: ReadingCreate, current_user: dict = Depends(get_current_user)):
-    machine = await db.machines.find_one({"id": reading_data.machine_id}, {"_id": 0})
+async def create_reading(reading_data: ReadingCreate, current_user: dict = Depends(get_current_user), loader: EntityLoader = Depends(get_loader)):
+    machine = await loader.load("machines", reading_data.machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Machine not found")
     
-    client = await db.clients.find_one({"id": machine['client_id']}, {"_id": 0})
+    client, operator = await asyncio.gather(
+        loader.load("clients", machine['client_id']),
+        loader.load("operators", machine.get('operator_id'))
+    )
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    operator = None
-    if machine.get('operator_id'):
-        operator = await db.operators.find_one({"id": machine['operator_id']}, {"_id": 0})
-    
     calculations = await calculate_reading(reading_data, machine, client, operator)
     
     reading = Reading(
@@ -448,52 +1437,63 @@ async def create_reading(reading_data: ReadingCreate, current_user: dict = Depen
     doc = reading.model_dump()
     doc['reading_date'] = doc['reading_date'].isoformat()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.readings.insert_one(doc)
+    await insert_reading(doc)
+    live_events.publish_created([doc])
     
-    return reading
+    return Reading(**doc)
 
 @api_router.get("/readings", response_model=List[Reading])
 async def get_readings(current_user: dict = Depends(get_current_user)):
-    readings = await db.readings.find({}, {"_id": 0}).sort("reading_date", -1).to_list(1000)
-    for r in readings:
-        if isinstance(r['reading_date'], str):
-            r['reading_date'] = datetime.fromisoformat(r['reading_date'])
-        if isinstance(r['created_at'], str):
-            r['created_at'] = datetime.fromisoformat(r['created_at'])
-    return readings
+    return await list_response("readings", Reading, sort={"reading_date": -1})
 
-@api_router.post("/readings/import")
-async def import_readings(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
-    
-    content = await file.read()
-    csv_file = io.StringIO(content.decode('utf-8'))
-    csv_reader = csv.DictReader(csv_file)
+readings_imported = metrics.REGISTRY.counter(
+    "slotmanager_readings_import_rows_total", "CSV import rows by outcome", ("outcome",))
+
+def parse_readings_csv(content: bytes):
+    """Parses an import file into ReadingCreate rows plus one error per bad row."""
+    csv_reader = csv.DictReader(io.StringIO(content.decode('utf-8')))
     
-    imported = 0
     errors = []
-    
+    rows = []
     for row in csv_reader:
         try:
-            reading_data = ReadingCreate(
+            rows.append(ReadingCreate(
                 machine_id=row['machine_id'],
                 previous_in=float(row['previous_in']),
                 previous_out=float(row['previous_out']),
                 current_in=float(row['current_in']),
                 current_out=float(row['current_out']),
                 reading_date=datetime.fromisoformat(row['reading_date']) if row.get('reading_date') else None
-            )
-            
-            machine = await db.machines.find_one({"id": reading_data.machine_id}, {"_id": 0})
+            ))
+        except Exception as e:
+            errors.append(f"Error in row: {str(e)}")
+    return rows, errors
+
+@api_router.post("/readings/import")
+async def import_readings(file: UploadFile = File(...), current_user: dict = Depends(get_current_user), loader: EntityLoader = Depends(get_loader)):
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+    
+    rows, errors = parse_readings_csv(await file.read())
+    total = len(rows) + len(errors)
+    
+    # Three batched lookups for the whole file instead of three per row
+    machines = await loader.load_many("machines", {r.machine_id for r in rows})
+    await asyncio.gather(
+        loader.load_many("clients", {m['client_id'] for m in machines if m}),
+        loader.load_many("operators", {m['operator_id'] for m in machines if m and m.get('operator_id')})
+    )
+    
+    docs = []
+    for reading_data in rows:
+        try:
+            machine = await loader.load("machines", reading_data.machine_id)
             if not machine:
                 errors.append(f"Machine {reading_data.machine_id} not found")
                 continue
             
-            client = await db.clients.find_one({"id": machine['client_id']}, {"_id": 0})
-            operator = None
-            if machine.get('operator_id'):
-                operator = await db.operators.find_one({"id": machine['operator_id']}, {"_id": 0})
+            client = await loader.load("clients", machine['client_id'])
+            operator = await loader.load("operators", machine.get('operator_id'))
             
             calculations = await calculate_reading(reading_data, machine, client, operator)
             
@@ -510,54 +1510,73 @@ async def import_readings(file: UploadFile = File(...), current_user: dict = Dep
             doc = reading.model_dump()
             doc['reading_date'] = doc['reading_date'].isoformat()
             doc['created_at'] = doc['created_at'].isoformat()
-            await db.readings.insert_one(doc)
-            
-            imported += 1
+            docs.append(doc)
         except Exception as e:
             errors.append(f"Error in row: {str(e)}")
     
-    return {"imported": imported, "errors": errors}
+    if docs:
+        try:
+            await readings_writes().insert_many([stamp(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            # Unordered inserts go on past a rejected document, so everything
+            # not in writeErrors was written
+            rejected = {err["index"]: err for err in e.details.get("writeErrors", [])}
+            for index, err in sorted(rejected.items()):
+                errors.append(f"Reading for machine {docs[index]['machine_id']} rejected: {err.get('errmsg')}")
+            for err in e.details.get("writeConcernErrors", []):
+                errors.append(f"Write concern not satisfied: {err.get('errmsg')}")
+            docs = [doc for index, doc in enumerate(docs) if index not in rejected]
+        if docs:
+            live_events.publish_created(docs)
+    failed = total - len(docs)
+    readings_imported.inc("imported", amount=len(docs))
+    readings_imported.inc("error", amount=failed)
+    
+    return {"imported": len(docs), "failed": failed, "errors": errors}
 
 @api_router.delete("/readings/{reading_id}")
 async def delete_reading(reading_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.readings.delete_one({"id": reading_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Reading not found")
+    reading = await db.readings.find_one_and_delete({"id": reading_id}, {"_id": 0})
+    if not reading:
+        reading = await take_archived_reading(reading_id)
+        if not reading:
+            raise HTTPException(status_code=404, detail="Reading not found")
+        await refresh_rollups([reading])
+    await record_tombstones("readings", [reading_id])
+    live_events.publish_deleted([reading])
     return {"message": "Reading deleted"}
 
 
 # ========== LINKS (VÍNCULOS) ==========
 
 @api_router.post("/links", response_model=Link)
-async def create_link(link_data: LinkCreate, current_user: dict = Depends(get_current_user)):
-    # Check if link already exists
-    existing = await db.links.find_one({
-        "client_id": link_data.client_id,
-        "operator_id": link_data.operator_id
-    }, {"_id": 0})
+async def create_link(link_data: LinkCreate, current_user: dict = Depends(get_current_user), loader: EntityLoader = Depends(get_loader)):
+    # Duplicate check and client/operator lookups run concurrently
+    existing, client, operator = await asyncio.gather(
+        db.links.find_one({
+            "client_id": link_data.client_id,
+            "operator_id": link_data.operator_id
+        }, {"_id": 0, "id": 1}),
+        loader.load("clients", link_data.client_id),
+        loader.load("operators", link_data.operator_id)
+    )
     
     if existing:
         raise HTTPException(status_code=400, detail="Link already exists")
-    
-    # Verify client and operator exist
-    client = await db.clients.find_one({"id": link_data.client_id}, {"_id": 0})
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
-    
-    operator = await db.operators.find_one({"id": link_data.operator_id}, {"_id": 0})
     if not operator:
         raise HTTPException(status_code=404, detail="Operator not found")
     
     link = Link(**link_data.model_dump())
     doc = link.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.links.insert_one(doc)
-    return link
+    await db.links.insert_one(stamp(doc))
+    return Link(**doc)
 
 @api_router.get("/links", response_model=List[Link])
 async def get_links(current_user: dict = Depends(get_current_user)):
-    links = await db.links.find({}, {"_id": 0}).to_list(length=None)
-    return [Link(**link) for link in links]
+    return await list_response("links", Link, limit=None)
 
 @api_router.get("/links/{link_id}", response_model=Link)
 async def get_link(link_id: str, current_user: dict = Depends(get_current_user)):
@@ -571,9 +1590,363 @@ async def delete_link(link_id: str, current_user: dict = Depends(get_current_use
     result = await db.links.delete_one({"id": link_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Link not found")
+    await record_tombstones("links", [link_id])
     return {"message": "Link deleted"}
 
 
+# ========== READINGS ARCHIVE ==========
+
+# Readings older than the horizon move to readings_archive; their daily totals
+# per machine live in reading_rollups so dashboards never scan the archive, and
+# the monthly ones in reading_rollups_monthly for long ranges (leaderboards)
+READINGS_HOT_DAYS = int(os.environ.get('READINGS_HOT_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '5000'))
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', '0'))
+# "timeseries" keeps the archive in a MongoDB time-series collection (7.0+, for
+# deletes by id): machine_id is the metaField and reading_time, a BSON date
+# copy of reading_date, the timeField. reading_date itself stays an ISO string
+# (with microseconds) like everywhere else, so reading_time never leaves the server
+READINGS_STORAGE = os.environ.get('READINGS_STORAGE', 'standard')  # "standard" or "timeseries"
+ARCHIVE_TIMESERIES = READINGS_STORAGE == "timeseries"
+ARCHIVE_PROJECTION = {"_id": 0, "reading_time": 0}
+ARCHIVE_TIMESERIES_OPTIONS = {"timeField": "reading_time", "metaField": "machine_id", "granularity": "hours"}
+
+def archive_cutoff() -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=READINGS_HOT_DAYS)).isoformat()
+
+def needs_archive(start_date: Optional[str]) -> bool:
+    return start_date is None or start_date < archive_cutoff()
+
+def reading_date_filter(query: dict, start_date: Optional[str], end_date: Optional[str], field: str = "reading_date") -> dict:
+    bounds = {}
+    if start_date:
+        bounds["$gte"] = start_date
+    if end_date:
+        # A bare date covers the whole day ("T99" sorts after any time)
+        bounds["$lte"] = end_date + "T99" if len(end_date) == 10 else end_date
+    return {**query, field: bounds} if bounds else dict(query)
+
+def rollup_day_filter(query: dict, start_date: Optional[str], end_date: Optional[str]) -> dict:
+    return reading_date_filter(query, start_date and start_date[:10], end_date and end_date[:10], field="day")
+
+def parse_reading_time(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def archive_filter(query: dict, start_date: Optional[str], end_date: Optional[str], timeseries: Optional[bool] = None) -> dict:
+    query = reading_date_filter(query, start_date, end_date)
+    if not (ARCHIVE_TIMESERIES if timeseries is None else timeseries):
+        return query
+    # Bounds on the timeField let MongoDB skip whole buckets. They are a day
+    # wider than asked so UTC offsets never cut anything off; the string
+    # bounds on reading_date stay the exact filter
+    bounds = {}
+    try:
+        if start_date:
+            bounds["$gte"] = parse_reading_time(start_date) - timedelta(days=1)
+        if end_date:
+            bounds["$lt"] = parse_reading_time(end_date) + timedelta(days=2)
+    except ValueError:
+        return query
+    return {**query, "reading_time": bounds} if bounds else query
+
+async def write_archive(readings: List[dict]):
+    """Copies readings into the archive; rerunning with the same readings changes nothing."""
+    # Whatever reaches the archive carries cents, even after migrate_money_cents has run
+    readings = [with_cents(r) for r in readings]
+    if not ARCHIVE_TIMESERIES:
+        await db.readings_archive.bulk_write([ReplaceOne({"id": r["id"]}, r, upsert=True) for r in readings], ordered=False)
+        return
+    # Time-series collections take no upserts, so skip what a previous run copied
+    existing = set(await db.readings_archive.distinct("id", {"id": {"$in": [r["id"] for r in readings]}}))
+    docs = [{**r, "reading_time": parse_reading_time(r["reading_date"])} for r in readings if r["id"] not in existing]
+    for doc in docs:
+        doc.pop("_id", None)
+    if docs:
+        await db.readings_archive.insert_many(docs, ordered=False)
+
+async def replace_archived(readings: List[dict]):
+    if not ARCHIVE_TIMESERIES:
+        await db.readings_archive.bulk_write([ReplaceOne({"id": r["id"]}, r) for r in readings], ordered=False)
+        return
+    await db.readings_archive.delete_many({"id": {"$in": [r["id"] for r in readings]}})
+    await write_archive(readings)
+
+async def take_archived_reading(reading_id: str) -> Optional[dict]:
+    if not ARCHIVE_TIMESERIES:
+        return await db.readings_archive.find_one_and_delete({"id": reading_id}, ARCHIVE_PROJECTION)
+    # findAndModify is not available on time-series collections
+    reading = await db.readings_archive.find_one({"id": reading_id}, ARCHIVE_PROJECTION)
+    if reading:
+        await db.readings_archive.delete_one({"id": reading_id})
+    return reading
+
+async def find_readings(query: dict, start_date: Optional[str] = None, end_date: Optional[str] = None, limit: int = 1000) -> List[dict]:
+    """Readings from the hot collection, plus the archive when the range reaches it, newest first."""
+    reports = reads("reports")
+    cursors = [reports.readings.find(reading_date_filter(query, start_date, end_date), {"_id": 0}).sort("reading_date", -1).to_list(limit)]
+    if needs_archive(start_date):
+        archived = archive_filter(query, start_date, end_date)
+        cursors.append(reports.readings_archive.find(archived, ARCHIVE_PROJECTION).sort("reading_date", -1).to_list(limit))
+    tiers = await asyncio.gather(*cursors)
+    if len(tiers) == 1:
+        return tiers[0]
+    return list(heapq.merge(*tiers, key=lambda r: r['reading_date'], reverse=True))[:limit]
+
+async def reading_totals(query: dict, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    """Count and money totals (cents and their float values) across both tiers: hot readings are aggregated, archived ones come from rollups."""
+    reports = reads("reports")
+    group = {"_id": None, "count": {"$sum": 1}, **money_sums()}
+    pipelines = [reports.readings.aggregate([{"$match": reading_date_filter(query, start_date, end_date)}, {"$group": group}]).to_list(1)]
+    if needs_archive(start_date):
+        rollup_group = {"_id": None, "count": {"$sum": "$count"}, **money_sums()}
+        pipelines.append(reports.reading_rollups.aggregate([{"$match": rollup_day_filter(query, start_date, end_date)}, {"$group": rollup_group}]).to_list(1))
+    
+    totals = {"count": 0, **dict.fromkeys(CENT_FIELDS, 0)}
+    for result in await asyncio.gather(*pipelines):
+        if result:
+            totals["count"] += result[0]["count"]
+            for key, cents in cents_totals(result[0]).items():
+                totals[key] += cents
+    return {**totals, **money_values(totals)}
+
+async def refresh_rollups(readings: List[dict]):
+    """Recomputes the rollups touched by `readings` from the archive, so reruns never double count."""
+    keys = {(r['machine_id'], r['reading_date'][:10]) for r in readings}
+    if not keys:
+        return
+    machine_ids = list({machine_id for machine_id, _ in keys})
+    days = sorted({day for _, day in keys})
+    pipeline = [
+        {"$match": archive_filter({"machine_id": {"$in": machine_ids}}, days[0], days[-1])},
+        {"$group": {
+            "_id": {"machine_id": "$machine_id", "day": {"$substr": ["$reading_date", 0, 10]}},
+            "count": {"$sum": 1},
+            **money_sums()
+        }}
+    ]
+    rollups = {}
+    async for group in db.readings_archive.aggregate(pipeline):
+        key = (group["_id"]["machine_id"], group["_id"]["day"])
+        rollups[key] = {"id": f"{key[0]}:{key[1]}", "machine_id": key[0], "day": key[1], "count": group["count"],
+                        **cents_totals(group)}
+    
+    operations = [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in rollups.values()]
+    operations += [DeleteOne({"id": f"{m}:{d}"}) for m, d in keys if (m, d) not in rollups]
+    await db.reading_rollups.bulk_write(operations, ordered=False)
+    await refresh_monthly_rollups(sorted({day[:7] for day in days}), machine_ids)
+
+async def refresh_monthly_rollups(months: List[str], machine_ids: Optional[List[str]] = None):
+    """Recomputes the monthly rollups of `months` from the daily ones, for `machine_ids` or every machine."""
+    query = {"day": {"$gte": f"{months[0]}-01", "$lte": f"{months[-1]}-31"}}
+    if machine_ids is not None:
+        query["machine_id"] = {"$in": machine_ids}
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": {"machine_id": "$machine_id", "month": {"$substr": ["$day", 0, 7]}},
+            "count": {"$sum": "$count"},
+            **money_sums()
+        }}
+    ]
+    rollups = {}
+    async for group in db.reading_rollups.aggregate(pipeline):
+        machine_id, month = group["_id"]["machine_id"], group["_id"]["month"]
+        if month in months:
+            rollups[f"{machine_id}:{month}"] = {"id": f"{machine_id}:{month}", "machine_id": machine_id, "month": month,
+                                                "count": group["count"], **cents_totals(group)}
+    
+    if rollups:
+        await db.reading_rollups_monthly.bulk_write(
+            [ReplaceOne({"id": rollup_id}, doc, upsert=True) for rollup_id, doc in rollups.items()], ordered=False
+        )
+    stale = {"month": {"$in": months}, "id": {"$nin": list(rollups)}}
+    if machine_ids is not None:
+        stale["machine_id"] = {"$in": machine_ids}
+    await db.reading_rollups_monthly.delete_many(stale)
+
+@job_runner("backfill_monthly_rollups")
+async def run_backfill_monthly_rollups(params: dict, progress: JobProgress) -> dict:
+    # One month at a time, every machine; recomputing makes reruns harmless
+    months = sorted({day[:7] for day in await db.reading_rollups.distinct("day")})
+    for month in months:
+        await refresh_monthly_rollups([month])
+        await progress.add("rolled_up.months", 1)
+    return progress.counts
+
+@job_runner("archive_readings")
+async def run_archive_readings(params: dict, progress: JobProgress) -> dict:
+    # Each batch is copied, rolled up and only then removed from the hot
+    # collection; every step is idempotent so an interrupted run can resume
+    cutoff = params["cutoff"]
+    while True:
+        batch = await db.readings.find({"reading_date": {"$lt": cutoff}}, {"_id": 0}).sort("reading_date", 1).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            return progress.counts
+        await write_archive(batch)
+        await refresh_rollups(batch)
+        await db.readings.delete_many({"id": {"$in": [r["id"] for r in batch]}})
+        await progress.add("archived.readings", len(batch))
+
+async def start_archive_job() -> dict:
+    return await start_job("archive_readings", {"cutoff": archive_cutoff(), "hot_days": READINGS_HOT_DAYS},
+                           singleton="archive_readings")
+
+@api_router.post("/archive/run")
+async def run_archive(current_user: dict = Depends(get_current_user)):
+    job = await start_archive_job()
+    return {"message": "Archiving started", "job_id": job["id"]}
+
+@api_router.get("/archive/status")
+async def get_archive_status(current_user: dict = Depends(get_current_user)):
+    hot, archived, rollups, last_job = await asyncio.gather(
+        db.readings.count_documents({}),
+        db.readings_archive.count_documents({}),
+        db.reading_rollups.count_documents({}),
+        db.jobs.find({"type": "archive_readings"}, {"_id": 0}).sort("created_at", -1).to_list(1)
+    )
+    return {
+        "hot_days": READINGS_HOT_DAYS,
+        "storage": "timeseries" if ARCHIVE_TIMESERIES else "standard",
+        "cutoff": archive_cutoff(),
+        "hot_readings": hot,
+        "archived_readings": archived,
+        "rollups": rollups,
+        "last_job": last_job[0] if last_job else None
+    }
+
+@job_runner("migrate_money_cents")
+async def run_migrate_money_cents(params: dict, progress: JobProgress) -> dict:
+    # The stored floats were already rounded to cents, so converting them is
+    # exact. Batches only pick documents still missing cents, so reruns
+    # resume; hot readings go first, so whatever the archive job moves
+    # meanwhile is still met in the archive. Converted readings are stamped,
+    # so the next delta backup or sync carries their cents
+    missing = {"net_cents": {"$exists": False}}
+    while True:
+        batch = await db.readings.find(missing).limit(MONEY_MIGRATION_BATCH).to_list(MONEY_MIGRATION_BATCH)
+        if not batch:
+            break
+        await db.readings.bulk_write([UpdateOne({"_id": r["_id"]}, {"$set": stamp(reading_cents(r))}) for r in batch], ordered=False)
+        await progress.add("migrated.readings", len(batch))
+    while True:
+        batch = await db.readings_archive.find(missing, ARCHIVE_PROJECTION).limit(MONEY_MIGRATION_BATCH).to_list(MONEY_MIGRATION_BATCH)
+        if not batch:
+            break
+        await replace_archived([stamp(with_cents(r)) for r in batch])
+        await refresh_rollups(batch)
+        await progress.add("migrated.archived_readings", len(batch))
+    # Rollups still holding float sums are recomputed from the archive
+    while True:
+        batch = await db.reading_rollups.find(missing, {"_id": 0, "machine_id": 1, "day": 1}).limit(MONEY_MIGRATION_BATCH).to_list(MONEY_MIGRATION_BATCH)
+        if not batch:
+            return progress.counts
+        await refresh_rollups([{"machine_id": r["machine_id"], "reading_date": r["day"]} for r in batch])
+        await progress.add("migrated.rollups", len(batch))
+
+async def archive_periodically():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+        try:
+            await start_archive_job()
+        except Exception:
+            logger.exception("Could not start the archive job")
+
+# ========== CASCADE DELETES ==========
+
+CASCADE_BATCH_SIZE = 1000
+
+async def delete_in_batches(collection: str, query: dict, progress: JobProgress, entity: Optional[str] = None) -> int:
+    # `entity` names the tracked collection when deleting from a storage tier
+    entity = entity or collection
+    deleted = 0
+    while True:
+        batch = await db[collection].find(query, {"_id": 0, "id": 1}).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+        if not batch:
+            return deleted
+        ids = [doc["id"] for doc in batch]
+        result = await db[collection].delete_many({"id": {"$in": ids}})
+        await record_tombstones(entity, ids)
+        deleted += result.deleted_count
+        await progress.add(f"deleted.{entity}", result.deleted_count)
+
+async def update_in_batches(collection: str, query: dict, changes: dict, progress: JobProgress) -> int:
+    # `changes` must make documents stop matching `query`, or this never ends
+    updated = 0
+    while True:
+        batch = await db[collection].find(query, {"_id": 0, "id": 1}).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+        if not batch:
+            return updated
+        result = await db[collection].update_many(
+            {"id": {"$in": [doc["id"] for doc in batch]}},
+            {"$set": stamp(dict(changes))}
+        )
+        updated += result.modified_count
+        await progress.add(f"reassigned.{collection}", result.modified_count)
+
+async def move_links(field: str, entity_id: str, reassign_to: str, progress: JobProgress):
+    # A pair the target already has would turn into a duplicate link; it goes instead
+    other = "operator_id" if field == "client_id" else "client_id"
+    linked = await db.links.distinct(other, {field: reassign_to})
+    await delete_in_batches("links", {field: entity_id, other: {"$in": linked}}, progress)
+    await update_in_batches("links", {field: entity_id}, {field: reassign_to}, progress)
+
+async def delete_readings_cascade(machine_ids: List[str], progress: JobProgress):
+    query = {"machine_id": {"$in": machine_ids}}
+    await delete_in_batches("readings", query, progress)
+    await delete_in_batches("readings_archive", query, progress, entity="readings")
+    result = await db.reading_rollups.delete_many(query)
+    await progress.add("deleted.reading_rollups", result.deleted_count)
+    await db.reading_rollups_monthly.delete_many(query)
+
+async def delete_machines_cascade(query: dict, progress: JobProgress):
+    # Readings go first so an interrupted job never leaves readings whose
+    # machine is already gone
+    while True:
+        batch = await db.machines.find(query, {"_id": 0, "id": 1}).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+        if not batch:
+            return
+        machine_ids = [doc["id"] for doc in batch]
+        await delete_readings_cascade(machine_ids, progress)
+        await delete_in_batches("machines", {"id": {"$in": machine_ids}}, progress)
+
+@job_runner("cascade_delete")
+async def run_cascade_delete(params: dict, progress: JobProgress) -> dict:
+    entity, entity_id, reassign_to = params["entity"], params["entity_id"], params.get("reassign_to")
+    
+    if entity == "machine":
+        await delete_readings_cascade([entity_id], progress)
+    elif entity == "client":
+        if reassign_to:
+            await update_in_batches("machines", {"client_id": entity_id}, {"client_id": reassign_to}, progress)
+            await move_links("client_id", entity_id, reassign_to, progress)
+        else:
+            await delete_machines_cascade({"client_id": entity_id}, progress)
+            await delete_in_batches("links", {"client_id": entity_id}, progress)
+    elif entity == "region":
+        if reassign_to:
+            await update_in_batches("machines", {"region_id": entity_id}, {"region_id": reassign_to}, progress)
+        else:
+            await delete_machines_cascade({"region_id": entity_id}, progress)
+    elif entity == "operator":
+        await update_in_batches("machines", {"operator_id": entity_id}, {"operator_id": reassign_to}, progress)
+        if reassign_to:
+            await move_links("operator_id", entity_id, reassign_to, progress)
+        else:
+            await delete_in_batches("links", {"operator_id": entity_id}, progress)
+    
+    live_events.publish_resync()
+    return progress.counts
+
+async def start_cascade_delete(entity: str, entity_id: str, reassign_to: Optional[str] = None) -> dict:
+    return await start_job("cascade_delete", {"entity": entity, "entity_id": entity_id, "reassign_to": reassign_to})
+
+async def ensure_reassign_target(collection: str, entity_id: str, reassign_to: Optional[str], not_found: str):
+    if reassign_to is None:
+        return
+    if reassign_to == entity_id or not await db[collection].find_one({"id": reassign_to}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=400, detail=f"{not_found} to reassign to not found")
+
 # ========== BACKUP & IMPORT ==========
 
 class BackupData(BaseModel):
@@ -582,6 +1955,15 @@ class BackupData(BaseModel):
     regions: Optional[List[dict]] = []
     machines: Optional[List[dict]] = []
     readings: Optional[List[dict]] = []
+    links: Optional[List[dict]] = []
+    kind: Optional[str] = "full"  # "full" or "delta"
+    since: Optional[str] = None
+    watermark_token: Optional[str] = None
+    deleted: Optional[List[dict]] = []
+
+class RestoreRequest(BaseModel):
+    backups: List[BackupData]  # base backup followed by its deltas, oldest first
+    drop_existing: bool = False
 
 @api_router.post("/backup/import")
 async def import_backup(backup_data: BackupData, current_user: dict = Depends(get_current_user)):
@@ -601,7 +1983,8 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
         "operators": 0,
         "regions": 0,
         "machines": 0,
-        "readings": 0
+        "readings": 0,
+        "links": 0
     }
     errors = []
     
@@ -616,7 +1999,7 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
                     else:
                         client_data['created_at'] = datetime.now(timezone.utc).isoformat()
                     
-                    await db.clients.insert_one(client_data)
+                    await db.clients.insert_one(stamp(index_for_search("clients", client_data)))
                     imported["clients"] += 1
                 except Exception as e:
                     errors.append(f"Client error: {str(e)}")
@@ -630,7 +2013,7 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
                     else:
                         operator_data['created_at'] = datetime.now(timezone.utc).isoformat()
                     
-                    await db.operators.insert_one(operator_data)
+                    await db.operators.insert_one(stamp(index_for_search("operators", operator_data)))
                     imported["operators"] += 1
                 except Exception as e:
                     errors.append(f"Operator error: {str(e)}")
@@ -644,7 +2027,7 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
                     else:
                         region_data['created_at'] = datetime.now(timezone.utc).isoformat()
                     
-                    await db.regions.insert_one(region_data)
+                    await db.regions.insert_one(stamp(region_data))
                     imported["regions"] += 1
                 except Exception as e:
                     errors.append(f"Region error: {str(e)}")
@@ -658,7 +2041,7 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
                     else:
                         machine_data['created_at'] = datetime.now(timezone.utc).isoformat()
                     
-                    await db.machines.insert_one(machine_data)
+                    await db.machines.insert_one(stamp(index_for_search("machines", machine_data)))
                     imported["machines"] += 1
                 except Exception as e:
                     errors.append(f"Machine error: {str(e)}")
@@ -674,11 +2057,24 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
                     else:
                         reading_data['created_at'] = datetime.now(timezone.utc).isoformat()
                     
-                    await db.readings.insert_one(reading_data)
+                    await db.readings.insert_one(stamp(with_cents(reading_data)))
                     imported["readings"] += 1
                 except Exception as e:
                     errors.append(f"Reading error: {str(e)}")
         
+        # Import Links
+        if backup_data.links:
+            for link_data in backup_data.links:
+                try:
+                    if not isinstance(link_data.get('created_at'), str):
+                        link_data['created_at'] = datetime.now(timezone.utc).isoformat()
+                    
+                    await db.links.insert_one(stamp(link_data))
+                    imported["links"] += 1
+                except Exception as e:
+                    errors.append(f"Link error: {str(e)}")
+        
+        live_events.publish_resync()
         return {
             "success": True,
             "imported": imported,
@@ -688,130 +2084,852 @@ async def import_backup(backup_data: BackupData, current_user: dict = Depends(ge
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Import failed: {str(e)}")
 
+def storage_tiers(collection: str) -> List[str]:
+    # Archived readings are still readings as far as backups are concerned
+    return ["readings", "readings_archive"] if collection == "readings" else [collection]
+
+async def dump_collection(collection: str, mark: Optional[dict], ts_field: str = "updated_at", database=None, session=None):
+    """Lê as alterações de uma coleção em lotes de até BLOCK_DOCS documentos, ordenados por (ts, id) em cada tier."""
+    # Every tier is read in full past the old mark, so the largest (ts, id)
+    # emitted can become the new mark without skipping anything below it
+    query = changed_since_filter(mark, ts_field)
+    database = database if database is not None else db
+    for tier in storage_tiers(collection):
+        projection = ARCHIVE_PROJECTION if tier == "readings_archive" else ENTITY_PROJECTION
+        cursor = database[tier].find(query, projection, session=session).sort([(ts_field, 1), ("id", 1)])
+        batch = []
+        async for doc in cursor.batch_size(backup_format.BLOCK_DOCS):
+            batch.append(doc)
+            if len(batch) >= backup_format.BLOCK_DOCS:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def max_mark(mark: Optional[dict], sorted_docs: List[dict], ts_field: str) -> Optional[dict]:
+    if not sorted_docs:
+        return mark
+    last = {"ts": sorted_docs[-1][ts_field], "id": sorted_docs[-1]["id"]}
+    if mark is None or (last["ts"], last["id"]) > (mark["ts"], mark["id"]):
+        return last
+    return mark
+
+DUMP_QUEUE_BATCHES = 4  # batches each collection reads ahead while an earlier section is streamed
+
+async def queued_batches(queue: asyncio.Queue):
+    while (batch := await queue.get()) is not None:
+        if isinstance(batch, Exception):
+            raise batch
+        yield batch
+
+class BackupDump:
+    """
+    Leitura das alterações desde `since`. `sections()` devolve (nome, lotes)
+    para "deleted" e cada coleção, nessa ordem; cada seção deve ser lida até o
+    fim antes da próxima, e `watermark` fica completo ao final. As coleções
+    são lidas em paralelo, cada uma alguns lotes à frente da que está sendo
+    entregue.
+    """
+
+    def __init__(self, since: Optional[str], collections: List[str] = TRACKED_COLLECTIONS, workload: Optional[str] = None):
+        self.since = since
+        self.previous = check_marks(decode_watermark(since)) if since else {}
+        self.collections = collections
+        self.workload = workload
+        self.watermark = {}
+        self.horizon = None
+
+    async def sections(self):
+        # Taken before the first read; marks never go past it (see settled_mark)
+        self.horizon = settled_mark()
+        database = reads(self.workload) if self.workload else db
+        async with await self._session(database) as session:
+            # Tombstones are read before the data: a delete landing in between is
+            # already absent from the data and its tombstone comes with the next
+            # delta, instead of the tombstone being skipped with the document kept
+            if self.since:
+                yield "deleted", self._read("tombstones", "deleted_at", database, session)
+            else:
+                yield "deleted", self._tombstones_mark(database, session)
+            # Only then every collection starts reading into its own bounded
+            # queue, and the queues are drained in order
+            queues = {collection: asyncio.Queue(DUMP_QUEUE_BATCHES) for collection in self.collections}
+            producers = [asyncio.create_task(self._produce(collection, queues[collection], database, session))
+                         for collection in self.collections]
+            try:
+                for collection in self.collections:
+                    yield collection, queued_batches(queues[collection])
+            finally:
+                for producer in producers:
+                    producer.cancel()
+
+    async def _session(self, database, after=None):
+        # On secondaries consecutive reads may hit different members; a causally
+        # consistent session makes every read see at least what the previous saw.
+        # A session serves one operation at a time, so each concurrent reader
+        # gets its own, advanced past the tombstone read
+        if database is db:
+            return contextlib.nullcontext()
+        session = await client.start_session(causal_consistency=True)
+        if after is not None and after.cluster_time is not None:
+            session.advance_cluster_time(after.cluster_time)
+            session.advance_operation_time(after.operation_time)
+        return session
+
+    async def _produce(self, collection: str, queue: asyncio.Queue, database, after):
+        try:
+            async with await self._session(database, after) as session:
+                async for batch in self._read(collection, "updated_at", database, session):
+                    await queue.put(batch)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def _read(self, collection: str, ts_field: str, database, session):
+        mark = self.previous.get(collection)
+        async for batch in dump_collection(collection, mark, ts_field, database, session):
+            mark = max_mark(mark, batch, ts_field)
+            yield batch
+        self.watermark[collection] = hold_back(self.previous.get(collection), mark, self.horizon)
+
+    async def _tombstones_mark(self, database, session):
+        # A full backup carries no tombstones, only the mark to continue from
+        latest = await latest_mark("tombstones", ts_field="deleted_at", database=database, session=session)
+        self.watermark["tombstones"] = hold_back(None, latest, self.horizon)
+        return
+        yield
+
+def backup_meta(dump: BackupDump) -> dict:
+    return {
+        "watermark": dump.watermark,
+        "watermark_token": encode_watermark(dump.watermark),
+        "exported_at": datetime.now(timezone.utc).isoformat()
+    }
+
+async def stream_json_backup(dump: BackupDump):
+    # Written as it is read; a failure midway cuts the body short, which
+    # leaves invalid JSON rather than a backup that looks complete
+    yield b'{"kind":' + orjson.dumps("delta" if dump.since else "full") + b',"since":' + orjson.dumps(dump.since)
+    async for name, batches in dump.sections():
+        yield b',"' + name.encode() + b'":['
+        separator = b""
+        async for batch in batches:
+            yield separator + b",".join(orjson.dumps(doc) for doc in batch)
+            separator = b","
+        yield b"]"
+    meta = orjson.dumps(backup_meta(dump))
+    yield b"," + meta[1:]
+
+def take_buffer(output: io.BytesIO) -> bytes:
+    chunk = output.getvalue()
+    output.seek(0)
+    output.truncate()
+    return chunk
+
+async def stream_binary_backup(dump: BackupDump):
+    output = io.BytesIO()
+    # The manifest is written at close, so the watermark can still go in it
+    writer = backup_format.BackupWriter(output, {"kind": "delta" if dump.since else "full", "since": dump.since})
+    async for name, batches in dump.sections():
+        writer.add_collection(name)
+        async for batch in batches:
+            writer.write_block(name, await asyncio.to_thread(backup_format.encode_block, batch), len(batch))
+            yield take_buffer(output)
+    writer.meta.update(backup_meta(dump))
+    writer.close()
+    yield take_buffer(output)
+
 @api_router.get("/backup/export")
-async def export_backup(current_user: dict = Depends(get_current_user)):
+async def export_backup(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     """
-    Exporta todos os dados do sistema em formato JSON
+    Exporta os dados do sistema em formato JSON.
+    Sem `since`, gera um backup completo. Com `since` (o `watermark_token` de
+    um backup anterior), gera um delta contendo apenas os documentos inseridos
+    ou alterados desde então e as remoções como `deleted`. O watermark fica um
+    pouco atrás do relógio, então deltas seguidos podem repetir documentos.
     """
+    dump = BackupDump(since, workload="exports")
+    return StreamingResponse(stream_json_backup(dump), media_type="application/json")
+
+@api_router.get("/backup/export/binary")
+async def export_backup_binary(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """
+    Exporta no formato binário (BSON em blocos zlib com crc32 e manifesto).
+    Aceita o mesmo `since` da exportação JSON.
+    """
+    dump = BackupDump(since, workload="exports")
+    filename = f"backup-slotmanager-{datetime.now(timezone.utc).strftime('%Y-%m-%d')}.smbk"
+    return StreamingResponse(
+        stream_binary_backup(dump),
+        media_type=backup_format.MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def validate_restore_chain(chain: List[dict]):
+    if not chain:
+        raise HTTPException(status_code=400, detail="No backups to restore")
+    if chain[0].get("kind") != "full":
+        raise HTTPException(status_code=400, detail="Restore chain must start with a full backup")
+    for position, backup in enumerate(chain[1:], start=1):
+        if backup.get("kind") != "delta" or backup.get("since") != chain[position - 1].get("watermark_token"):
+            raise HTTPException(status_code=400, detail=f"Backup {position} does not continue the chain")
+
+async def apply_tombstones(tombstones: List[dict]) -> int:
+    ids_by_collection = {}
+    for tombstone in tombstones:
+        if tombstone.get("collection") in TRACKED_COLLECTIONS:
+            ids_by_collection.setdefault(tombstone["collection"], []).append(tombstone.get("entity_id"))
+    deleted = 0
+    for collection, ids in ids_by_collection.items():
+        result = await db[collection].delete_many({"id": {"$in": ids}})
+        deleted += result.deleted_count
+        if collection == "readings":
+            archived = await db.readings_archive.find({"id": {"$in": ids}}, ARCHIVE_PROJECTION).to_list(None)
+            if archived:
+                await db.readings_archive.delete_many({"id": {"$in": [r["id"] for r in archived]}})
+                await refresh_rollups(archived)
+                deleted += len(archived)
+    return deleted
+
+async def upsert_documents(collection: str, docs: List[dict]) -> int:
+    for doc in docs:
+        doc.pop('_id', None)
+        if 'updated_at' not in doc:
+            stamp(doc)
+        if collection in SEARCH_FIELDS:
+            index_for_search(collection, doc)
+        if collection == "readings":
+            with_cents(doc)
+    if not docs:
+        return 0
+    
+    # Readings already in the archive are replaced there, everything else
+    # lands in the hot collection and is archived later as usual
+    archived_ids = set()
+    if collection == "readings":
+        archived_ids = set(await db.readings_archive.distinct("id", {"id": {"$in": [doc["id"] for doc in docs]}}))
+    hot = [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in docs if doc["id"] not in archived_ids]
+    if hot:
+        await db[collection].bulk_write(hot, ordered=False)
+    if archived_ids:
+        archived = [doc for doc in docs if doc["id"] in archived_ids]
+        await replace_archived(archived)
+        await refresh_rollups(archived)
+    return len(docs)
+
+async def apply_backup(backup: BackupData) -> dict:
+    """Aplica um backup completo ou delta com upsert por `id`."""
+    # Deletes go first so a document removed and later re-created inside the
+    # same delta window ends up present, as it is in the source
+    applied = {"deleted": await apply_tombstones(backup.deleted or [])}
+    counts = await asyncio.gather(*[
+        upsert_documents(collection, getattr(backup, collection) or []) for collection in TRACKED_COLLECTIONS
+    ])
+    applied.update(zip(TRACKED_COLLECTIONS, counts))
+    return applied
+
+async def clear_tracked_collections():
+    collections = TRACKED_COLLECTIONS + ["readings_archive", "reading_rollups", "reading_rollups_monthly"]
+    await asyncio.gather(*[db[collection].delete_many({}) for collection in collections])
+
+@api_router.post("/backup/restore")
+async def restore_backup(restore: RestoreRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Restaura um backup completo seguido de uma cadeia de deltas.
+    Cada delta deve ter `since` igual ao `watermark_token` do backup anterior.
+    """
+    validate_restore_chain([backup.model_dump(include={"kind", "since", "watermark_token"}) for backup in restore.backups])
+    
+    if restore.drop_existing:
+        await clear_tracked_collections()
+    
+    applied = []
+    for backup in restore.backups:
+        applied.append(await apply_backup(backup))
+    live_events.publish_resync()
+    
+    return {
+        "success": True,
+        "applied": applied,
+        "watermark_token": restore.backups[-1].watermark_token
+    }
+
+async def read_binary_backup(file: UploadFile):
+    content = await file.read()
+    # Every block is checked up front, so nothing is cleared or half-applied
+    # because of a damaged file further down the chain
     try:
-        clients = await db.clients.find({}, {"_id": 0}).to_list(10000)
-        operators = await db.operators.find({}, {"_id": 0}).to_list(10000)
-        regions = await db.regions.find({}, {"_id": 0}).to_list(10000)
-        machines = await db.machines.find({}, {"_id": 0}).to_list(10000)
-        readings = await db.readings.find({}, {"_id": 0}).to_list(10000)
-        
-        return {
-            "clients": clients,
-            "operators": operators,
-            "regions": regions,
-            "machines": machines,
-            "readings": readings,
-            "exported_at": datetime.now(timezone.utc).isoformat()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+        report = await asyncio.to_thread(backup_format.verify, io.BytesIO(content))
+        manifest = backup_format.read_manifest(io.BytesIO(content))
+    except backup_format.READ_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+    if not report["valid"]:
+        raise HTTPException(status_code=400, detail=f"{file.filename}: {'; '.join(report['errors'])}")
+    return content, manifest
+
+async def restore_binary_collection(content: bytes, manifest: dict, collection: str) -> int:
+    # Each collection reads through its own view of the upload so blocks can be
+    # decoded in worker threads concurrently
+    view = io.BytesIO(content)
+    restored = 0
+    for block in manifest["collections"].get(collection, {}).get("blocks", []):
+        docs = await asyncio.to_thread(lambda: backup_format.decode_block(backup_format.read_block(view, block)))
+        restored += await upsert_documents(collection, docs)
+    return restored
+
+@api_router.post("/backup/restore/binary")
+async def restore_backup_binary(files: List[UploadFile] = File(...), drop_existing: bool = False, current_user: dict = Depends(get_current_user)):
+    """
+    Restaura backups binários: um completo seguido de deltas, na ordem enviada.
+    Todos os arquivos são verificados antes de qualquer alteração; as coleções
+    de cada backup são restauradas em paralelo.
+    """
+    backups = [await read_binary_backup(file) for file in files]
+    validate_restore_chain([manifest.get("meta", {}) for _, manifest in backups])
+    
+    if drop_existing:
+        await clear_tracked_collections()
+    
+    applied = []
+    try:
+        for content, manifest in backups:
+            view = io.BytesIO(content)
+            tombstones = [doc for block in backup_format.iter_documents(view, manifest, "deleted") for doc in block]
+            result = {"deleted": await apply_tombstones(tombstones)}
+            counts = await asyncio.gather(*[
+                restore_binary_collection(content, manifest, collection) for collection in TRACKED_COLLECTIONS
+            ])
+            result.update(zip(TRACKED_COLLECTIONS, counts))
+            applied.append(result)
+    except backup_format.READ_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
+    live_events.publish_resync()
+    
+    return {
+        "success": True,
+        "applied": applied,
+        "watermark_token": backups[-1][1].get("meta", {}).get("watermark_token")
+    }
+
+@api_router.post("/backup/verify")
+async def verify_backup(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """
+    Verifica a integridade de um backup binário (manifesto, crc32 e contagens)
+    sem restaurá-lo.
+    """
+    content = await file.read()
+    try:
+        return await asyncio.to_thread(backup_format.verify, io.BytesIO(content))
+    except backup_format.READ_ERRORS as e:
+        return {"valid": False, "meta": {}, "created_at": None, "collections": {}, "errors": [str(e)]}
+
+# ========== SYNC ==========
+
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', '1000'))
+SYNC_MAX_PAGE_SIZE = 10000
+
+async def changes_page(collection: str, mark: Optional[dict], limit: int, ts_field: str = "updated_at",
+                       query: Optional[dict] = None) -> List[dict]:
+    # Each tier is read past the mark in (ts, id) order and the first `limit`
+    # of the merge are kept; whatever is left over stays past the new mark
+    query = {**(query or {}), **changed_since_filter(mark, ts_field)}
+    docs = []
+    for tier in storage_tiers(collection):
+        projection = ARCHIVE_PROJECTION if tier == "readings_archive" else ENTITY_PROJECTION
+        docs.extend(await db[tier].find(query, projection).sort([(ts_field, 1), ("id", 1)]).to_list(limit))
+    docs.sort(key=lambda doc: (doc[ts_field], doc["id"]))
+    return docs[:limit]
+
+def sync_state(since: Optional[str], selected: List[str]) -> dict:
+    """
+    The sync token: `marks` and `deleted` hold the mark of each collection and
+    of its tombstones, `resume` the exact position of a listing still being
+    paged. A delta backup watermark is accepted as `since` too.
+    """
+    if not since:
+        return {"marks": {}, "deleted": {}, "resume": {}}
+    token = decode_watermark(since)
+    if "marks" in token:
+        return {part: check_marks(token.get(part, {}), "Invalid sync token") for part in ("marks", "deleted", "resume")}
+    tombstones = check_marks(token, "Invalid sync token").get("tombstones")
+    return {
+        "marks": {c: token.get(c) for c in TRACKED_COLLECTIONS},
+        "deleted": {c: tombstones for c in selected},
+        "resume": {}
+    }
+
+@api_router.get("/sync")
+async def sync_changes(since: Optional[str] = None, collections: Optional[str] = None, limit: int = SYNC_PAGE_SIZE,
+                       current_user: dict = Depends(get_current_user)):
+    """
+    Sincronização incremental para o frontend e clientes offline.
+    Sem `since`, devolve todos os documentos; com `since` (o `token` da
+    sincronização anterior), só os inseridos ou alterados desde então, e as
+    remoções em `deleted`. `collections` (separadas por vírgula) limita a
+    resposta às coleções pedidas; o token guarda a posição de cada uma.
+    Cada página traz até `limit` documentos; com `more`, chame de novo com o
+    `token` recebido até `more` voltar falso.
+    """
+    selected = [c.strip() for c in collections.split(",") if c.strip()] if collections else TRACKED_COLLECTIONS
+    unknown = [c for c in selected if c not in TRACKED_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collection: {', '.join(unknown)}")
+    if not 1 <= limit <= SYNC_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SYNC_MAX_PAGE_SIZE}")
+    
+    state = sync_state(since, selected)
+    marks, deleted_marks, resume = state["marks"], state["deleted"], state["resume"]
+    horizon = settled_mark()
+    if since is None:
+        # A full listing carries no tombstones, only where to continue from
+        for collection in selected:
+            latest = await db.tombstones.find(
+                {"collection": collection}, {"_id": 0, "deleted_at": 1, "id": 1}
+            ).sort([("deleted_at", -1), ("id", -1)]).to_list(1)
+            last = {"ts": latest[0]["deleted_at"], "id": latest[0]["id"]} if latest else None
+            deleted_marks[collection] = hold_back(None, last, horizon)
+    
+    # Per collection, tombstones are read before the data (see BackupDump).
+    # `resume` is where a page stopped; the marks never pass the horizon, so
+    # once a listing is complete the next sync sends the overlap again
+    changes, deleted, remaining = {}, [], limit
+    for collection in selected:
+        phases = [
+            (f"tombstones:{collection}", "tombstones", "deleted_at", {"collection": collection}, deleted_marks),
+            (collection, collection, "updated_at", None, marks),
+        ]
+        for key, source, ts_field, query, saved in phases:
+            if since is None and source == "tombstones":
+                continue
+            if not remaining:
+                break
+            position = resume.pop(key, None) or saved.get(collection)
+            docs = await changes_page(source, position, remaining, ts_field, query)
+            remaining -= len(docs)
+            emitted = max_mark(position, docs, ts_field)
+            if not remaining:
+                resume[key] = emitted
+            saved[collection] = hold_back(saved.get(collection), emitted, horizon)
+            if source == "tombstones":
+                deleted.extend({"collection": collection, "id": t["entity_id"], "deleted_at": t["deleted_at"]} for t in docs)
+            else:
+                changes[collection] = docs
+    
+    token = {"marks": marks, "deleted": deleted_marks}
+    if resume:
+        token["resume"] = resume
+    return {
+        "full": since is None,
+        "changes": changes,
+        "deleted": deleted,
+        "more": bool(resume),
+        "token": encode_watermark(token)
+    }
+
+# ========== BOOTSTRAP ==========
+
+BOOTSTRAP_COLLECTIONS = ["regions", "clients", "operators", "machines", "links"]
+METER_STATE = {"reading_id": "$id", "current_in": "$current_in", "current_out": "$current_out", "reading_date": "$reading_date"}
+
+async def bootstrap_etag(include_meters: bool) -> str:
+    # Writes stamp updated_at and deletes leave tombstones, so the latest marks
+    # move whenever the payload would; counts catch anything removed without one
+    collections = BOOTSTRAP_COLLECTIONS + (["readings", "readings_archive"] if include_meters else [])
+    state = await asyncio.gather(
+        latest_mark("tombstones", ts_field="deleted_at"),
+        *[latest_mark(collection) for collection in collections],
+        *[db[collection].estimated_document_count() for collection in collections]
+    )
+    raw = json.dumps([include_meters, state], separators=(',', ':'), default=str).encode('utf-8')
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+def meter_pipeline(match: dict) -> list:
+    # Sorted like the {machine_id, reading_date} index, $group/$first reads one entry per machine
+    return [
+        {"$match": match},
+        {"$sort": {"machine_id": 1, "reading_date": -1}},
+        {"$group": {"_id": "$machine_id", **{field: {"$first": value} for field, value in METER_STATE.items()}}}
+    ]
+
+def meters_by_machine(rows: List[dict]) -> dict:
+    return {row.pop("_id"): row for row in rows}
+
+@api_router.get("/bootstrap")
+async def bootstrap(request: Request, include_meters: bool = False, current_user: dict = Depends(get_current_user)):
+    """
+    Dados de referência para a abertura do app numa só resposta: regiões,
+    clientes, operadores, máquinas e vínculos e, com `include_meters`, o último
+    contador (entrada/saída) de cada máquina. Responde com ETag; quando o
+    If-None-Match confere, devolve 304 sem ler as coleções.
+    """
+    etag = await bootstrap_etag(include_meters)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cursors = [db[collection].find({}, ENTITY_PROJECTION).to_list(None) for collection in BOOTSTRAP_COLLECTIONS]
+    if include_meters:
+        cursors.append(db.readings.aggregate(meter_pipeline({})).to_list(None))
+    results = await asyncio.gather(*cursors)
+    data = dict(zip(BOOTSTRAP_COLLECTIONS, results))
+    if include_meters:
+        meters = meters_by_machine(results[-1])
+        # Machines idle past the hot horizon only have archived readings
+        idle = [m["id"] for m in data["machines"] if m["id"] not in meters]
+        if idle:
+            archived = await db.readings_archive.aggregate(meter_pipeline({"machine_id": {"$in": idle}})).to_list(None)
+            meters.update(meters_by_machine(archived))
+        data["meters"] = meters
+
+    return TrustedJSONResponse(data, headers=headers)
 
 # ========== REPORTS ==========
 
+# Every report takes optional start_date/end_date (ISO dates); the archive is
+# read only when the range reaches past the hot horizon
+
 @api_router.get("/reports/dashboard")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    total_machines = await db.machines.count_documents({"active": True})
-    total_clients = await db.clients.count_documents({})
-    total_operators = await db.operators.count_documents({})
-    
-    # Calculate total revenue from readings
-    readings = await db.readings.find({}, {"_id": 0}).to_list(10000)
-    total_gross = sum(r['gross_value'] for r in readings)
-    total_commissions = sum(r['client_commission'] + r['operator_commission'] for r in readings)
-    total_net = sum(r['net_value'] for r in readings)
+async def get_dashboard_stats(start_date: Optional[str] = None, end_date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    reports = reads("reports")
+    total_machines, total_clients, total_operators, totals = await asyncio.gather(
+        reports.machines.count_documents({"active": True}),
+        reports.clients.count_documents({}),
+        reports.operators.count_documents({}),
+        reading_totals({}, start_date, end_date)
+    )
     
     return {
         "total_machines": total_machines,
         "total_clients": total_clients,
         "total_operators": total_operators,
-        "total_readings": len(readings),
-        "total_gross": round(total_gross, 2),
-        "total_commissions": round(total_commissions, 2),
-        "total_net": round(total_net, 2)
+        "total_readings": totals["count"],
+        "total_gross": totals["gross_value"],
+        "total_commissions": from_cents(totals["client_commission_cents"] + totals["operator_commission_cents"]),
+        "total_net": totals["net_value"]
     }
 
-@api_router.get("/reports/by-machine/{machine_id}")
-async def get_machine_report(machine_id: str, current_user: dict = Depends(get_current_user)):
-    machine = await db.machines.find_one({"id": machine_id}, {"_id": 0})
-    if not machine:
-        raise HTTPException(status_code=404, detail="Machine not found")
-    
-    readings = await db.readings.find({"machine_id": machine_id}, {"_id": 0}).sort("reading_date", -1).to_list(1000)
-    
+def parse_reading_dates(readings: List[dict]) -> List[dict]:
     for r in readings:
         if isinstance(r['reading_date'], str):
             r['reading_date'] = datetime.fromisoformat(r['reading_date'])
+    return readings
+
+@api_router.get("/reports/by-machine/{machine_id}")
+async def get_machine_report(machine_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    machine = await db.machines.find_one({"id": machine_id}, ENTITY_PROJECTION)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
     
-    total_gross = sum(r['gross_value'] for r in readings)
-    total_net = sum(r['net_value'] for r in readings)
+    query = {"machine_id": machine_id}
+    readings, totals = await asyncio.gather(
+        find_readings(query, start_date, end_date),
+        reading_totals(query, start_date, end_date)
+    )
     
     return {
         "machine": machine,
-        "readings": readings,
-        "total_gross": round(total_gross, 2),
-        "total_net": round(total_net, 2),
-        "total_readings": len(readings)
+        "readings": parse_reading_dates(readings),
+        "total_gross": totals["gross_value"],
+        "total_net": totals["net_value"],
+        "total_readings": totals["count"]
     }
 
 @api_router.get("/reports/by-client/{client_id}")
-async def get_client_report(client_id: str, current_user: dict = Depends(get_current_user)):
-    client = await db.clients.find_one({"id": client_id}, {"_id": 0})
+async def get_client_report(client_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    client = await db.clients.find_one({"id": client_id}, ENTITY_PROJECTION)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    machines = await db.machines.find({"client_id": client_id}, {"_id": 0}).to_list(1000)
-    machine_ids = [m['id'] for m in machines]
-    
-    readings = await db.readings.find({"machine_id": {"$in": machine_ids}}, {"_id": 0}).sort("reading_date", -1).to_list(1000)
-    
-    for r in readings:
-        if isinstance(r['reading_date'], str):
-            r['reading_date'] = datetime.fromisoformat(r['reading_date'])
-    
-    total_gross = sum(r['gross_value'] for r in readings)
-    total_commission = sum(r['client_commission'] for r in readings)
+    machines = await db.machines.find({"client_id": client_id}, ENTITY_PROJECTION).to_list(1000)
+    query = {"machine_id": {"$in": [m['id'] for m in machines]}}
+    readings, totals = await asyncio.gather(
+        find_readings(query, start_date, end_date),
+        reading_totals(query, start_date, end_date)
+    )
     
     return {
         "client": client,
         "machines": machines,
-        "readings": readings,
-        "total_gross": round(total_gross, 2),
-        "total_commission": round(total_commission, 2),
-        "total_readings": len(readings)
+        "readings": parse_reading_dates(readings),
+        "total_gross": totals["gross_value"],
+        "total_commission": totals["client_commission"],
+        "total_readings": totals["count"]
     }
 
 @api_router.get("/reports/by-region/{region_id}")
-async def get_region_report(region_id: str, current_user: dict = Depends(get_current_user)):
+async def get_region_report(region_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     region = await db.regions.find_one({"id": region_id}, {"_id": 0})
     if not region:
         raise HTTPException(status_code=404, detail="Region not found")
     
-    machines = await db.machines.find({"region_id": region_id}, {"_id": 0}).to_list(1000)
-    machine_ids = [m['id'] for m in machines]
-    
-    readings = await db.readings.find({"machine_id": {"$in": machine_ids}}, {"_id": 0}).sort("reading_date", -1).to_list(1000)
-    
-    for r in readings:
-        if isinstance(r['reading_date'], str):
-            r['reading_date'] = datetime.fromisoformat(r['reading_date'])
-    
-    total_gross = sum(r['gross_value'] for r in readings)
-    total_net = sum(r['net_value'] for r in readings)
+    machines = await db.machines.find({"region_id": region_id}, ENTITY_PROJECTION).to_list(1000)
+    query = {"machine_id": {"$in": [m['id'] for m in machines]}}
+    readings, totals = await asyncio.gather(
+        find_readings(query, start_date, end_date),
+        reading_totals(query, start_date, end_date)
+    )
     
     return {
         "region": region,
         "machines": machines,
-        "readings": readings,
-        "total_gross": round(total_gross, 2),
-        "total_net": round(total_net, 2),
+        "readings": parse_reading_dates(readings),
+        "total_gross": totals["gross_value"],
+        "total_net": totals["net_value"],
         "total_machines": len(machines)
     }
 
+# ========== LEADERBOARDS ==========
+
+# Entities ranked by their totals over a period in a single aggregation:
+# hot readings through the reading_date index, archived whole months from
+# reading_rollups_monthly and the days around them from reading_rollups, all
+# added up per machine with $unionWith (MongoDB 4.4+). Clients and regions are
+# reached with a $lookup after that, so the join runs once per machine, and
+# MongoDB sorts and keeps only the requested rows
+LEADERBOARD_ENTITIES = {"machines": None, "clients": "client_id", "regions": "region_id"}
+LEADERBOARD_METRICS = {"gross": "gross_cents", "net": "net_cents", "commission": "commission_cents"}
+LEADERBOARD_ORDERS = {"top": -1, "bottom": 1}
+LEADERBOARD_MAX_LIMIT = 100
+
+def month_after(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+def month_before(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year - (number == 1):04d}-{(number - 2) % 12 + 1:02d}"
+
+def last_day(month: str) -> str:
+    return (datetime.fromisoformat(f"{month_after(month)}-01") - timedelta(days=1)).date().isoformat()
+
+def rollup_ranges(start_date: Optional[str], end_date: Optional[str]):
+    """
+    Splits a period into the whole months it covers, as a filter on `month`
+    (None when there are none), and the days left around them, as
+    (first, last) pairs where None is unbounded.
+    """
+    start_day, end_day = start_date and start_date[:10], end_date and end_date[:10]
+    first = start_day and (start_day[:7] if start_day.endswith("-01") else month_after(start_day[:7]))
+    last = end_day and (end_day[:7] if end_day == last_day(end_day[:7]) else month_before(end_day[:7]))
+    if first and last and first > last:
+        return None, [(start_day, end_day)]
+    months = {}
+    if first:
+        months["$gte"] = first
+    if last:
+        months["$lte"] = last
+    days = []
+    if start_day and first != start_day[:7]:
+        days.append((start_day, last_day(start_day[:7])))
+    if end_day and last != end_day[:7]:
+        days.append((f"{end_day[:7]}-01", end_day))
+    return months, days
+
+def machine_group(count) -> dict:
+    return {"$group": {"_id": "$machine_id", "count": {"$sum": count}, **money_sums()}}
+
+def leaderboard_pipeline(entity: str, start_date: Optional[str], end_date: Optional[str], field: str,
+                         direction: int, limit: int, seed: bool) -> List[dict]:
+    pipeline = [{"$match": reading_date_filter({}, start_date, end_date)}, machine_group(1)]
+    if needs_archive(start_date):
+        months, days = rollup_ranges(start_date, end_date)
+        if months is not None:
+            pipeline.append({"$unionWith": {"coll": "reading_rollups_monthly", "pipeline": [
+                {"$match": {"month": months} if months else {}}, machine_group("$count")
+            ]}})
+        for first, last in days:
+            pipeline.append({"$unionWith": {"coll": "reading_rollups", "pipeline": [
+                {"$match": rollup_day_filter({}, first, last)}, machine_group("$count")
+            ]}})
+    totals = {"count": {"$sum": "$count"}, **{f: {"$sum": f"${f}"} for f in CENT_FIELDS}}
+    pipeline.append({"$group": {"_id": "$_id", **totals}})
+    entity_field = LEADERBOARD_ENTITIES[entity]
+    if entity_field:
+        pipeline += [
+            {"$lookup": {"from": "machines", "localField": "_id", "foreignField": "id", "as": "machine"}},
+            {"$unwind": "$machine"},
+            {"$group": {"_id": f"$machine.{entity_field}", **totals}},
+            {"$match": {"_id": {"$ne": None}}}
+        ]
+    if seed:
+        # Entities without readings in the period rank with zero
+        zeros = {"_id": "$id", "count": {"$literal": 0}, **{f: {"$literal": 0} for f in CENT_FIELDS}}
+        pipeline += [
+            {"$unionWith": {"coll": entity, "pipeline": [{"$project": zeros}]}},
+            {"$group": {"_id": "$_id", **totals}}
+        ]
+    pipeline += [
+        {"$addFields": {"commission_cents": {"$add": ["$client_commission_cents", "$operator_commission_cents"]}}},
+        {"$sort": {field: direction, "_id": 1}},
+        {"$limit": limit}
+    ]
+    return pipeline
+
+@api_router.get("/reports/leaderboards/{entity}")
+async def get_leaderboard(
+    entity: str,
+    metric: str = "gross",
+    order: str = "top",
+    limit: int = 10,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if entity not in LEADERBOARD_ENTITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown leaderboard: {entity}")
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail="metric must be gross, net or commission")
+    if order not in LEADERBOARD_ORDERS:
+        raise HTTPException(status_code=400, detail="order must be top or bottom")
+    if not 1 <= limit <= LEADERBOARD_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {LEADERBOARD_MAX_LIMIT}")
+    
+    pipeline = leaderboard_pipeline(entity, start_date, end_date, LEADERBOARD_METRICS[metric], LEADERBOARD_ORDERS[order],
+                                    limit, seed=order == "bottom")
+    ranked = await reads("reports").readings.aggregate(pipeline).to_list(limit)
+    
+    docs = await db[entity].find({"id": {"$in": [row["_id"] for row in ranked]}}, ENTITY_PROJECTION).to_list(limit)
+    by_id = {doc["id"]: doc for doc in docs}
+    items = []
+    for rank, row in enumerate(ranked, start=1):
+        cents = cents_totals(row)
+        items.append({
+            "rank": rank,
+            "id": row["_id"],
+            "item": by_id.get(row["_id"]),
+            "count": row["count"],
+            **money_values(cents),
+            "commission": from_cents(cents["client_commission_cents"] + cents["operator_commission_cents"])
+        })
+    return {"entity": entity, "metric": metric, "order": order, "items": items}
+
+# ========== RECEIPTS ==========
+
+RECEIPT_RENDER_CHUNK = 100  # statements per render task
+
+async def machine_totals(query: dict, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    """Per-machine count and money totals in cents across both tiers, like reading_totals."""
+    reports = reads("reports")
+    sums = money_sums()
+    pipelines = [reports.readings.aggregate([
+        {"$match": reading_date_filter(query, start_date, end_date)},
+        {"$group": {"_id": "$machine_id", "count": {"$sum": 1}, **sums}}
+    ]).to_list(None)]
+    if needs_archive(start_date):
+        pipelines.append(reports.reading_rollups.aggregate([
+            {"$match": rollup_day_filter(query, start_date, end_date)},
+            {"$group": {"_id": "$machine_id", "count": {"$sum": "$count"}, **sums}}
+        ]).to_list(None))
+    
+    totals = {}
+    for result in await asyncio.gather(*pipelines):
+        for row in result:
+            machine = totals.setdefault(row["_id"], {"count": 0, **dict.fromkeys(CENT_FIELDS, 0)})
+            machine["count"] += row["count"]
+            for key, cents in cents_totals(row).items():
+                machine[key] += cents
+    return totals
+
+def build_statements(machines: List[dict], totals: dict, clients: dict, operators: dict, period: dict) -> List[dict]:
+    by_client = {}
+    for machine in machines:
+        if machine["id"] in totals and machine["client_id"] in clients:
+            by_client.setdefault(machine["client_id"], []).append(machine)
+    
+    issued_at = utc_now_iso()
+    statements = []
+    for client_id, client_machines in by_client.items():
+        client_machines.sort(key=lambda m: m["code"])
+        rows = [{**m, **totals[m["id"]], **money_values(totals[m["id"]])} for m in client_machines]
+        client_totals = {key: sum(row[key] for row in rows) for key in ["count"] + CENT_FIELDS}
+        operator_ids = sorted({m["operator_id"] for m in client_machines if m.get("operator_id") in operators})
+        statements.append({
+            "client": clients[client_id],
+            "operators": [operators[operator_id] for operator_id in operator_ids],
+            "machines": rows,
+            "totals": {**client_totals, **money_values(client_totals)},
+            "period": period,
+            "issued_at": issued_at
+        })
+    statements.sort(key=lambda st: normalize_search_text(st["client"]["name"]))
+    return statements
+
+@api_router.get("/receipts/batch")
+async def batch_receipts(
+    region_id: Optional[str] = None,
+    operator_id: Optional[str] = None,
+    client_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: str = "html",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Comprovantes de todos os clientes de uma rota (região, operador ou
+    cliente) no período, para o fechamento do mês.
+    `format=html` devolve um documento com uma página por cliente, pronto para
+    imprimir ou salvar como PDF; `format=zip`, um HTML por cliente e um
+    resumo.csv com os totais.
+    """
+    if format not in ("html", "zip"):
+        raise HTTPException(status_code=400, detail="format must be html or zip")
+    
+    machine_query = {field: value for field, value in
+                     (("region_id", region_id), ("operator_id", operator_id), ("client_id", client_id)) if value}
+    machines = await db.machines.find(machine_query, {
+        "_id": 0, "id": 1, "code": 1, "name": 1, "multiplier": 1, "client_id": 1, "operator_id": 1
+    }).to_list(None)
+    # Totals for every machine come out of one grouped aggregation per tier
+    reading_query = {"machine_id": {"$in": [m["id"] for m in machines]}} if machine_query else {}
+    totals = await machine_totals(reading_query, start_date, end_date)
+    
+    read = [m for m in machines if m["id"] in totals]
+    client_ids = list({m["client_id"] for m in read})
+    operator_ids = list({m["operator_id"] for m in read if m.get("operator_id")})
+    commission = {"_id": 0, "id": 1, "name": 1, "commission_type": 1, "commission_value": 1}
+    client_docs, operator_docs = await asyncio.gather(
+        db.clients.find({"id": {"$in": client_ids}}, commission).to_list(None),
+        db.operators.find({"id": {"$in": operator_ids}}, commission).to_list(None)
+    )
+    statements = build_statements(
+        read, totals, {c["id"]: c for c in client_docs}, {o["id"]: o for o in operator_docs},
+        {"start": start_date, "end": end_date}
+    )
+    if not statements:
+        raise HTTPException(status_code=404, detail="No readings for these filters")
+    
+    # Rendering is spread over worker threads in chunks; the HTML document is
+    # streamed in order as each chunk finishes
+    chunks = [statements[i:i + RECEIPT_RENDER_CHUNK] for i in range(0, len(statements), RECEIPT_RENDER_CHUNK)]
+    name = f"comprovantes-{(end_date or utc_now_iso())[:10]}"
+    if format == "zip":
+        rendered = await asyncio.gather(*[
+            asyncio.to_thread(receipts.render_files, chunk, index * RECEIPT_RENDER_CHUNK + 1) for index, chunk in enumerate(chunks)
+        ])
+        content = await asyncio.to_thread(
+            receipts.build_zip, [file for files in rendered for file in files], receipts.summary_csv(statements)
+        )
+        return Response(content=content, media_type="application/zip",
+                        headers={"Content-Disposition": f'attachment; filename="{name}.zip"'})
+    
+    tasks = [asyncio.create_task(asyncio.to_thread(receipts.render_pages, chunk)) for chunk in chunks]
+    
+    async def document():
+        yield receipts.document_head(f"Comprovantes ({len(statements)})")
+        for task in tasks:
+            yield await task
+        yield receipts.DOCUMENT_TAIL
+    
+    return StreamingResponse(document(), media_type="text/html; charset=utf-8",
+                             headers={"Content-Disposition": f'inline; filename="{name}.html"'})
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -821,6 +2939,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    metrics.RequestProfiler,
+    max_queries=int(os.environ.get('QUERY_BUDGET_COUNT', '25')),
+    max_ms=float(os.environ.get('QUERY_BUDGET_MS', '500')),
+    server_timing=os.environ.get('SERVER_TIMING', 'true').lower() == 'true',
+)
+app.add_middleware(metrics.MetricsMiddleware)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -828,6 +2953,134 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_change_tracking():
+    # Documents written before change tracking existed get stamped once, so the
+    # next delta backup carries them
+    for collection in TRACKED_COLLECTIONS:
+        await db[collection].update_many(
+            {"updated_at": {"$exists": False}},
+            {"$set": {"updated_at": utc_now_iso()}}
+        )
+        await db[collection].create_index([("updated_at", 1), ("id", 1)])
+    await db.tombstones.create_index([("deleted_at", 1), ("id", 1)])
+    await db.tombstones.create_index([("collection", 1), ("deleted_at", 1), ("id", 1)])
+
+@app.on_event("startup")
+async def ensure_search():
+    for collection in SEARCH_FIELDS:
+        for field in ("search.keys", "search.words", "search.grams"):
+            await db[collection].create_index(field)
+        # Documents from before search existed, or inserted directly by the
+        # data scripts, are indexed once here. Not a data change, so no stamp
+        while True:
+            batch = await db[collection].find({"search": {"$exists": False}}).limit(SEARCH_BACKFILL_BATCH).to_list(SEARCH_BACKFILL_BATCH)
+            if not batch:
+                break
+            await db[collection].bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"search": search_fields(collection, doc)}}) for doc in batch
+            ], ordered=False)
+
+@app.on_event("startup")
+async def ensure_readings_storage():
+    # Runs before ensure_archive, whose indexes would create a plain collection.
+    # Moving an existing plain archive is left to scripts/migrate_archive.py,
+    # run with the API stopped; until then this worker keeps standard storage
+    global ARCHIVE_TIMESERIES
+    if not ARCHIVE_TIMESERIES:
+        return
+    version = tuple((await client.server_info())["versionArray"][:2])
+    if version < (7, 0):
+        logger.error("READINGS_STORAGE=timeseries needs MongoDB 7.0 or newer; using standard storage")
+        ARCHIVE_TIMESERIES = False
+        return
+    existing = {c["name"]: c async for c in await db.list_collections(filter={"name": {"$in": ["readings_archive", "readings_archive_legacy"]}})}
+    archive = existing.get("readings_archive")
+    if archive and archive.get("type") != "timeseries":
+        logger.error("readings_archive is a plain collection; run scripts/migrate_archive.py with the API stopped. "
+                     "Using standard storage meanwhile")
+        ARCHIVE_TIMESERIES = False
+        return
+    if "readings_archive_legacy" in existing:
+        logger.error("readings_archive_legacy still holds archived readings that reports and backups do not see; "
+                     "run scripts/migrate_archive.py with the API stopped to finish moving them")
+    if not archive:
+        await db.create_collection("readings_archive", timeseries=ARCHIVE_TIMESERIES_OPTIONS)
+
+@app.on_event("startup")
+async def ensure_archive():
+    for collection in ("readings", "readings_archive"):
+        await db[collection].create_index([("reading_date", -1)])
+        await db[collection].create_index([("machine_id", 1), ("reading_date", -1)])
+    await db.readings_archive.create_index([("updated_at", 1), ("id", 1)])
+    await db.readings_archive.create_index("id")
+    await db.reading_rollups.create_index("id", unique=True)
+    await db.reading_rollups.create_index([("machine_id", 1), ("day", 1)])
+    await db.reading_rollups.create_index([("day", 1)])
+    if ARCHIVE_INTERVAL_HOURS > 0:
+        schedule_background(archive_periodically())
+
+@app.on_event("startup")
+async def ensure_leaderboards():
+    # The leaderboards' $lookup joins each machine total through machines.id
+    await db.machines.create_index("id")
+    await db.reading_rollups_monthly.create_index("id", unique=True)
+    await db.reading_rollups_monthly.create_index([("month", 1), ("machine_id", 1)])
+
+@app.on_event("startup")
+async def start_live_events():
+    if LIVE_EVENTS_SOURCE == "local":
+        return
+    try:
+        hello = await db.command("hello")
+    except Exception as e:
+        logger.warning("Could not detect the replica set, live events stay local: %s", e)
+        return
+    if "setName" not in hello:
+        if LIVE_EVENTS_SOURCE == "change_stream":
+            logger.warning("LIVE_EVENTS_SOURCE=change_stream needs a replica set; publishing locally")
+        return
+    live_events.local = False
+    schedule_background(watch_reading_changes())
+
+async def claim_jobs_periodically():
+    # Jobs are idempotent, so anything cut short by a restart simply runs
+    # again; run_job's claim decides which worker gets it
+    while True:
+        unfinished = await db.jobs.find(claimable_jobs(), {"_id": 0}).to_list(None)
+        for job in unfinished:
+            if job["type"] in JOB_RUNNERS:
+                schedule_job(job)
+        await asyncio.sleep(JOB_LEASE_SECONDS)
+
+@app.on_event("startup")
+async def resume_jobs():
+    await db.jobs.create_index("id")
+    await db.jobs.create_index("singleton", unique=True, partialFilterExpression={"singleton": {"$exists": True}})
+    schedule_background(claim_jobs_periodically())
+
+@app.on_event("startup")
+async def migrate_money():
+    # Once completed the job is never started again: every write since carries
+    # cents. A worker passing this check just as another one finishes starts
+    # a second run, which finds nothing left to convert
+    if await db.jobs.find_one({"type": "migrate_money_cents", "status": "completed"}, {"_id": 0, "id": 1}):
+        return
+    job = await start_job("migrate_money_cents", {}, singleton="migrate_money_cents")
+    logger.info("Storing reading amounts in cents (job %s)", job["id"])
+
+@app.on_event("startup")
+async def backfill_monthly_rollups():
+    # Archives from before monthly rollups existed; until the job is done
+    # leaderboards that reach the archive miss its older months
+    if await db.reading_rollups_monthly.estimated_document_count() or not await db.reading_rollups.estimated_document_count():
+        return
+    job = await start_job("backfill_monthly_rollups", {}, singleton="backfill_monthly_rollups")
+    logger.info("Rolling archived readings up by month (job %s)", job["id"])
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Readings still buffered are committed before the connection goes away
+    if reading_writer is not None:
+        await reading_writer.drain()
     client.close()
\ No newline at end of file
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks - SlotManager
+Mede os trechos do backend que rodam em toda requisição: cálculo da leitura,
+construção e model_dump dos modelos, datetime.fromisoformat, JWT, o parsing
+do CSV de importação e a serialização das listagens (por linha, validando
+contra o response_model e pelo caminho rápido com orjson).
+
+    python3 benchmarks/microbench.py run                       # mostra os tempos
+    python3 benchmarks/microbench.py run --save main           # grava benchmarks/baselines/main.json
+    python3 benchmarks/microbench.py compare reference         # compara com a linha de base versionada
+    python3 benchmarks/microbench.py compare main              # roda de novo e compara com a linha de base
+    python3 benchmarks/microbench.py compare main --candidate outra.json
+
+Cada benchmark é calibrado para rodar ao menos --min-time segundos por
+repetição, com o coletor de lixo desligado (timeit), e o tempo comparado é o
+menor das repetições, que é o mais estável entre execuções. Linhas de base só
+valem para a máquina em que foram gravadas: baselines/reference.json é a
+versionada, com o Python e a máquina de origem no próprio arquivo; em outra
+máquina, grave uma linha de base própria antes de comparar.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'slotmanager_bench')
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+import server  # noqa: E402  (the Motor client connects lazily, no database is needed)
+from fastapi.routing import serialize_response  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name, items=1):
+    """Registra uma fábrica que devolve a função medida; `items` divide o tempo por item processado."""
+    def register(factory):
+        BENCHMARKS[name] = (factory, items)
+        return factory
+    return register
+
+
+def run_coroutine(coro):
+    # calculate_reading never awaits anything, so it can be driven without an event loop
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+MACHINE = {'id': 'm1', 'code': 'M001', 'name': 'Máquina', 'multiplier': 0.25, 'client_id': 'c1',
+           'region_id': 'r1', 'operator_id': 'o1', 'active': True, 'created_at': '2026-01-01T00:00:00+00:00'}
+PERCENT_CLIENT = {'id': 'c1', 'commission_type': 'percentage', 'commission_value': 30.0}
+FIXED_OPERATOR = {'id': 'o1', 'commission_type': 'fixed', 'commission_value': 20.0}
+READING_FIELDS = dict(machine_id='m1', previous_in=1000.0, previous_out=800.0, current_in=2500.0, current_out=1900.0,
+                      gross_value=100.0, client_commission=30.0, operator_commission=20.0, net_value=50.0,
+                      reading_date=datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc))
+READING_DOC = dict(READING_FIELDS, id='r1', reading_date='2026-01-01T12:00:00+00:00',
+                   created_at='2026-01-01T12:00:00.123456+00:00', updated_at='2026-01-01T12:00:00.123456+00:00')
+
+
+@benchmark('calculate_reading.percentage_client')
+def bench_calculate_percentage():
+    data = server.ReadingCreate(machine_id='m1', previous_in=1000, previous_out=800, current_in=2500, current_out=1900)
+    return lambda: run_coroutine(server.calculate_reading(data, MACHINE, PERCENT_CLIENT))
+
+
+@benchmark('calculate_reading.with_fixed_operator')
+def bench_calculate_operator():
+    data = server.ReadingCreate(machine_id='m1', previous_in=1000, previous_out=800, current_in=2500, current_out=1900)
+    return lambda: run_coroutine(server.calculate_reading(data, MACHINE, PERCENT_CLIENT, FIXED_OPERATOR))
+
+
+@benchmark('Reading.construct')
+def bench_reading_construct():
+    return lambda: server.Reading(**READING_FIELDS)
+
+
+@benchmark('Reading.model_dump')
+def bench_reading_dump():
+    reading = server.Reading(**READING_FIELDS)
+    return reading.model_dump
+
+
+@benchmark('Reading.validate_stored_doc')
+def bench_reading_validate():
+    # What response_model=List[Reading] does for every document read from Mongo
+    return lambda: server.Reading.model_validate(READING_DOC)
+
+
+@benchmark('Machine.construct')
+def bench_machine_construct():
+    fields = {k: v for k, v in MACHINE.items() if k != 'created_at'}
+    return lambda: server.Machine(**fields)
+
+
+@benchmark('Machine.model_dump')
+def bench_machine_dump():
+    machine = server.Machine(**MACHINE)
+    return machine.model_dump
+
+
+LIST_ROWS = 1000
+
+
+def stored_machines():
+    return [server.index_for_search('machines', dict(MACHINE, id=f'm{i}', code=f'M{i:04d}', updated_at=READING_DOC['updated_at']))
+            for i in range(LIST_ROWS)]
+
+
+def stored_readings():
+    return [server.with_cents(dict(READING_DOC, id=f'r{i}')) for i in range(LIST_ROWS)]
+
+
+def shaped(model, docs):
+    # What the $project of server.list_response hands over
+    return [{name: doc.get(name, field.default) for name, field in model.model_fields.items()} for doc in docs]
+
+
+def validated_list(path, docs):
+    """O caminho do FastAPI com response_model: valida cada linha, converte e chama json.dumps."""
+    route = next(r for r in server.app.routes if getattr(r, 'path', None) == path and 'GET' in r.methods)
+    field = route.secure_cloned_response_field
+    return lambda: server.metrics.ProfiledJSONResponse(run_coroutine(serialize_response(field=field, response_content=docs)))
+
+
+@benchmark('list.machines.response_model', items=LIST_ROWS)
+def bench_machines_validated():
+    return validated_list('/api/machines', stored_machines())
+
+
+@benchmark('list.machines.fast_path', items=LIST_ROWS)
+def bench_machines_fast():
+    docs = shaped(server.Machine, stored_machines())
+    return lambda: server.TrustedJSONResponse(docs)
+
+
+@benchmark('list.readings.response_model', items=LIST_ROWS)
+def bench_readings_validated():
+    return validated_list('/api/readings', stored_readings())
+
+
+@benchmark('list.readings.fast_path', items=LIST_ROWS)
+def bench_readings_fast():
+    docs = shaped(server.Reading, stored_readings())
+    return lambda: server.TrustedJSONResponse(docs)
+
+
+@benchmark('datetime.fromisoformat', items=1000)
+def bench_fromisoformat():
+    values = [f'2026-{m:02d}-{d:02d}T{h:02d}:30:00.123456+00:00'
+              for m in range(1, 11) for d in range(1, 11) for h in range(10)]
+    parse = datetime.fromisoformat
+    return lambda: [parse(value) for value in values]
+
+
+@benchmark('jwt.create_access_token')
+def bench_jwt_encode():
+    return lambda: server.create_access_token({'sub': 'b6f4c1c2-8d55-4a7e-9e0a-6a4f6f1c2d3e'})
+
+
+@benchmark('jwt.decode')
+def bench_jwt_decode():
+    token = server.create_access_token({'sub': 'b6f4c1c2-8d55-4a7e-9e0a-6a4f6f1c2d3e'})
+    # The same call get_current_user makes
+    return lambda: server.jwt.decode(token, server.SECRET_KEY, algorithms=[server.ALGORITHM])
+
+
+@benchmark('import_readings.parse_csv', items=1000)
+def bench_parse_csv():
+    lines = ['machine_id,previous_in,previous_out,current_in,current_out,reading_date']
+    for i in range(1000):
+        lines.append(f'm{i % 50},{i * 10}.0,{i * 8}.0,{i * 10 + 500}.0,{i * 8 + 400}.0,2026-01-{i % 28 + 1:02d}T10:00:00+00:00')
+    content = ('\n'.join(lines) + '\n').encode('utf-8')
+    return lambda: server.parse_readings_csv(content)
+
+
+def measure(name, min_time, repeat):
+    factory, items = BENCHMARKS[name]
+    fn = factory()
+    fn()  # warm up caches and lazy imports
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / elapsed))
+    runs = [t / number / items for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min_ns': round(min(runs) * 1e9, 1),
+        'median_ns': round(statistics.median(runs) * 1e9, 1),
+        'stdev_pct': round(statistics.stdev(runs) / statistics.mean(runs) * 100, 2) if len(runs) > 1 else 0.0,
+        'loops': number,
+        'items': items,
+    }
+
+
+def run_all(args):
+    selected = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    if not selected:
+        sys.exit(f"❌ Nenhum benchmark contém '{args.filter}'")
+    results = {}
+    for name in selected:
+        results[name] = measure(name, args.min_time, args.repeat)
+        r = results[name]
+        unit = '/item' if r['items'] > 1 else '/op'
+        print(f"  {name:<40}{format_ns(r['min_ns']):>12}{unit:<6} mediana {format_ns(r['median_ns']):>10}  ±{r['stdev_pct']}%")
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        'cpus': os.cpu_count(),
+        'benchmarks': results,
+    }
+
+
+def format_ns(ns):
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+
+def baseline_path(name):
+    path = Path(name)
+    return path if path.suffix == '.json' else BASELINE_DIR / f'{name}.json'
+
+
+def compare(baseline, candidate, threshold):
+    regressions = []
+    print(f"\n  {'benchmark':<40}{'base':>12}{'atual':>12}{'variação':>11}")
+    for name, current in candidate['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if not before:
+            print(f"  {name:<40}{'-':>12}{format_ns(current['min_ns']):>12}{'novo':>11}")
+            continue
+        change = (current['min_ns'] - before['min_ns']) / before['min_ns'] * 100
+        marker = ''
+        if change > threshold:
+            marker = '  ❌'
+            regressions.append(name)
+        elif change < -threshold:
+            marker = '  ✓'
+        print(f"  {name:<40}{format_ns(before['min_ns']):>12}{format_ns(current['min_ns']):>12}{change:>+10.1f}%{marker}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) mais lentos que {threshold}%: {', '.join(regressions)}")
+        return False
+    print(f"\n✓ Nenhuma regressão acima de {threshold}%")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks do backend do SlotManager')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    timing = argparse.ArgumentParser(add_help=False)
+    timing.add_argument('--filter', help='roda só os benchmarks cujo nome contém o texto')
+    timing.add_argument('--repeat', type=int, default=7, help='repetições por benchmark (padrão: 7)')
+    timing.add_argument('--min-time', type=float, default=0.2, help='segundos mínimos por repetição (padrão: 0.2)')
+
+    run_parser = commands.add_parser('run', parents=[timing], help='executa os benchmarks')
+    run_parser.add_argument('--save', help='nome (ou caminho .json) da linha de base a gravar')
+
+    compare_parser = commands.add_parser('compare', parents=[timing], help='compara com uma linha de base')
+    compare_parser.add_argument('baseline', help='nome em benchmarks/baselines ou caminho .json')
+    compare_parser.add_argument('--candidate', help='resultado já gravado; sem ele os benchmarks rodam agora')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='variação percentual considerada regressão (padrão: 10)')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        results = run_all(args)
+        if args.save:
+            path = baseline_path(args.save)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print(f"\n✓ Linha de base salva em: {path}")
+        return
+
+    with open(baseline_path(args.baseline), 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if args.candidate:
+        with open(baseline_path(args.candidate), 'r', encoding='utf-8') as f:
+            candidate = json.load(f)
+    else:
+        candidate = run_all(args)
+    if not compare(baseline, candidate, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
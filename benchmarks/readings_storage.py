@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark de armazenamento das leituras - SlotManager
+Compara a coleção comum usada hoje com a coleção time-series de
+READINGS_STORAGE=timeseries, usando as leituras de um banco existente (o de
+produção restaurado ou um gerado por scripts/generate_data.py):
+
+    python3 benchmarks/readings_storage.py --mongo-url mongodb://localhost:27017 --db slotmanager
+    python3 benchmarks/readings_storage.py --db slotmanager --repeat 50 --output resultado.json
+
+As leituras (readings e readings_archive) são copiadas para duas coleções num
+banco à parte (padrão: <db>_storage_bench), com os mesmos índices que o
+servidor cria para o arquivo. Depois são medidos o espaço em disco (dados e
+índices) e a latência das consultas de relatório, com os mesmos filtros que o
+servidor monta para cada formato. O banco de origem só é lido.
+
+Precisa de MongoDB 7.0 ou mais recente, como o modo time-series do servidor.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo import MongoClient
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'slotmanager_bench')
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+import server  # noqa: E402  (only its filter helpers are used; the Motor client connects lazily)
+
+LAYOUTS = ('standard', 'timeseries')
+INDEXES = [[('reading_date', -1)], [('machine_id', 1), ('reading_date', -1)], [('updated_at', 1), ('id', 1)], [('id', 1)]]
+TOTALS_GROUP = {'_id': None, 'count': {'$sum': 1}, **server.money_sums()}
+
+
+def create_collections(db):
+    for name in LAYOUTS:
+        db.drop_collection(name)
+    db.create_collection('standard')
+    db.create_collection('timeseries', timeseries={
+        'timeField': 'reading_time', 'metaField': 'machine_id', 'granularity': 'hours'
+    })
+    for name in LAYOUTS:
+        for keys in INDEXES:
+            db[name].create_index(keys)
+
+
+def load(source, db, batch_size):
+    """Copia as leituras da origem para as duas coleções; devolve os segundos gastos em cada uma."""
+    spent = dict.fromkeys(LAYOUTS, 0.0)
+    copied = 0
+    for tier in ('readings', 'readings_archive'):
+        batch = []
+        for doc in source[tier].find({}, {'_id': 0}).batch_size(batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                copy_batch(db, batch, spent)
+                copied += len(batch)
+                print(f"\r  {copied} leituras copiadas", end='', flush=True)
+                batch = []
+        if batch:
+            copy_batch(db, batch, spent)
+            copied += len(batch)
+    print(f"\r  {copied} leituras copiadas")
+    return copied, spent
+
+
+def copy_batch(db, batch, spent):
+    started = time.perf_counter()
+    db.standard.insert_many([dict(doc) for doc in batch], ordered=False)
+    spent['standard'] += time.perf_counter() - started
+    docs = [{**doc, 'reading_time': server.parse_reading_time(doc['reading_date'])} for doc in batch]
+    started = time.perf_counter()
+    db.timeseries.insert_many(docs, ordered=False)
+    spent['timeseries'] += time.perf_counter() - started
+
+
+def storage(db, name):
+    stats = next(db[name].aggregate([{'$collStats': {'storageStats': {}}}]))['storageStats']
+    return {
+        'count': stats.get('count'),
+        'data_bytes': stats.get('size'),
+        'storage_bytes': stats.get('storageSize'),
+        'index_bytes': stats.get('totalIndexSize'),
+    }
+
+
+def report_queries(db, rng):
+    """As consultas de relatório do servidor, como (nome, função(layout) -> executa uma vez)."""
+    machine_ids = db.standard.distinct('machine_id')
+    first, last = (db.standard.find_one({}, {'reading_date': 1}, sort=[('reading_date', order)])['reading_date'] for order in (1, -1))
+    end = server.parse_reading_time(last)
+    span = (end - server.parse_reading_time(first)).days
+
+    def day(moment):
+        return moment.date().isoformat()
+
+    def window(days):
+        start = end - timedelta(days=rng.randint(days, max(days, span)))
+        return day(start), day(start + timedelta(days=days))
+
+    def find(layout, query, start, stop, limit=1000):
+        filter_ = server.archive_filter(query, start, stop, timeseries=layout == 'timeseries')
+        return list(db[layout].find(filter_, {'_id': 0, 'reading_time': 0}).sort('reading_date', -1).limit(limit))
+
+    def totals(layout, query, start, stop):
+        filter_ = server.archive_filter(query, start, stop, timeseries=layout == 'timeseries')
+        return list(db[layout].aggregate([{'$match': filter_}, {'$group': TOTALS_GROUP}]))
+
+    def daily(layout, machines, start, stop):
+        # The shape refresh_rollups runs over the archive
+        filter_ = server.archive_filter({'machine_id': {'$in': machines}}, start, stop, timeseries=layout == 'timeseries')
+        return list(db[layout].aggregate([
+            {'$match': filter_},
+            {'$group': {'_id': {'machine_id': '$machine_id', 'day': {'$substr': ['$reading_date', 0, 10]}},
+                        'count': {'$sum': 1}, **server.money_sums()}},
+        ]))
+
+    queries = []
+
+    # Arguments are drawn once per iteration, so both layouts answer the same question
+    def query(name, run, arguments):
+        queries.append((name, run, arguments))
+
+    query('relatorio_maquina (sem período)', lambda layout, m: find(layout, {'machine_id': m}, None, None),
+          lambda: (rng.choice(machine_ids),))
+    query('relatorio_maquina (30 dias)', lambda layout, m, s, e: find(layout, {'machine_id': m}, s, e),
+          lambda: (rng.choice(machine_ids), *window(30)))
+    query('leituras_frota (7 dias)', lambda layout, s, e: find(layout, {}, s, e),
+          lambda: window(7))
+    query('totais_frota (30 dias)', lambda layout, s, e: totals(layout, {}, s, e),
+          lambda: window(30))
+    query('totais_cliente (90 dias, 20 máquinas)', lambda layout, ms, s, e: totals(layout, {'machine_id': {'$in': ms}}, s, e),
+          lambda: (rng.sample(machine_ids, min(20, len(machine_ids))), *window(90)))
+    query('rollups_diarios (7 dias, 100 máquinas)', lambda layout, ms, s, e: daily(layout, ms, s, e),
+          lambda: (rng.sample(machine_ids, min(100, len(machine_ids))), *window(7)))
+    return queries
+
+
+def measure(queries, repeat, warmup):
+    results = {}
+    for name, run, arguments in queries:
+        timings = {layout: [] for layout in LAYOUTS}
+        for iteration in range(warmup + repeat):
+            args = arguments()
+            # Alternating the order keeps cache warm-up from favouring one layout
+            order = LAYOUTS if iteration % 2 == 0 else tuple(reversed(LAYOUTS))
+            for layout in order:
+                started = time.perf_counter()
+                run(layout, *args)
+                if iteration >= warmup:
+                    timings[layout].append((time.perf_counter() - started) * 1000)
+        results[name] = {layout: {
+            'p50_ms': round(statistics.median(values), 2),
+            'p95_ms': round(sorted(values)[math.ceil(len(values) * 0.95) - 1], 2),
+        } for layout, values in timings.items()}
+        row = results[name]
+        print(f"  {name:<42}{row['standard']['p50_ms']:>10.2f}{row['timeseries']['p50_ms']:>12.2f}"
+              f"{row['standard']['p95_ms']:>10.2f}{row['timeseries']['p95_ms']:>12.2f}")
+    return results
+
+
+def format_bytes(value):
+    value = float(value or 0)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a coleção comum de leituras com a time-series')
+    parser.add_argument('--mongo-url', default=os.environ.get('MONGO_URL'), help='padrão: $MONGO_URL')
+    parser.add_argument('--db', default=os.environ.get('DB_NAME'), help='banco com as leituras (padrão: $DB_NAME)')
+    parser.add_argument('--bench-db', help='banco das coleções de teste (padrão: <db>_storage_bench)')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20, help='execuções medidas por consulta (padrão: 20)')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', action='store_true', help='mantém o banco de teste no final')
+    parser.add_argument('--output', help='grava o resultado em JSON')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_url)
+    version = tuple(client.server_info()['versionArray'][:2])
+    if version < (7, 0):
+        sys.exit("❌ É preciso MongoDB 7.0 ou mais recente")
+    source = client[args.db]
+    bench_name = args.bench_db or f"{args.db}_storage_bench"
+    if bench_name == args.db:
+        sys.exit("❌ --bench-db precisa ser diferente do banco de origem")
+    db = client[bench_name]
+
+    print(f"📦 Copiando leituras de {args.db} para {bench_name}...")
+    create_collections(db)
+    copied, spent = load(source, db, args.batch_size)
+    if not copied:
+        sys.exit("❌ Nenhuma leitura no banco de origem")
+
+    sizes = {layout: storage(db, layout) for layout in LAYOUTS}
+    print(f"\n  {'':<20}{'comum':>14}{'time-series':>14}")
+    for key, label in (('storage_bytes', 'dados em disco'), ('index_bytes', 'índices')):
+        print(f"  {label:<20}{format_bytes(sizes['standard'][key]):>14}{format_bytes(sizes['timeseries'][key]):>14}")
+    print(f"  {'carga':<20}{spent['standard']:>13.1f}s{spent['timeseries']:>13.1f}s")
+
+    print(f"\n  {'consulta':<42}{'comum p50':>10}{'ts p50':>12}{'comum p95':>10}{'ts p95':>12}  (ms)")
+    latency = measure(report_queries(db, random.Random(args.seed)), args.repeat, args.warmup)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'mongodb': client.server_info()['version'],
+                'readings': copied,
+                'load_seconds': {layout: round(value, 2) for layout, value in spent.items()},
+                'storage': sizes,
+                'latency': latency,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Resultado salvo em: {args.output}")
+    if not args.keep:
+        client.drop_database(bench_name)
+
+
+if __name__ == '__main__':
+    main()
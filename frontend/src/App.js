@@ -24,6 +24,13 @@ export const getAuthHeaders = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
+// Regiões, clientes, operadores, máquinas e vínculos numa só requisição; o
+// navegador revalida pelo ETag e recebe 304 quando nada mudou
+export const fetchBootstrap = async (params = {}) => {
+  const response = await axios.get(`${API}/bootstrap`, { headers: getAuthHeaders(), params });
+  return response.data;
+};
+
 const ProtectedRoute = ({ children }) => {
   const token = localStorage.getItem('token');
   return token ? children : <Navigate to="/login" />;
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { API, getAuthHeaders } from '@/App';
+import { API, getAuthHeaders, fetchBootstrap } from '@/App';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -37,40 +37,22 @@ const ClientsWithReadings = () => {
   });
 
   useEffect(() => {
-    fetchClients();
-    fetchMachines();
-    fetchLinks();
+    fetchReferenceData();
     fetchReadings();
-    fetchOperators();
   }, []);
 
-  const fetchClients = async () => {
+  const fetchReferenceData = async () => {
     try {
-      const response = await axios.get(`${API}/clients`, { headers: getAuthHeaders() });
-      setClients(response.data);
+      const data = await fetchBootstrap();
+      setClients(data.clients);
+      setMachines(data.machines);
+      setLinks(data.links);
+      setOperators(data.operators);
     } catch (error) {
       toast.error('Erro ao carregar clientes');
     }
   };
 
-  const fetchMachines = async () => {
-    try {
-      const response = await axios.get(`${API}/machines`, { headers: getAuthHeaders() });
-      setMachines(response.data);
-    } catch (error) {
-      toast.error('Erro ao carregar máquinas');
-    }
-  };
-
-  const fetchLinks = async () => {
-    try {
-      const response = await axios.get(`${API}/links`, { headers: getAuthHeaders() });
-      setLinks(response.data || []);
-    } catch (error) {
-      console.error('Erro ao carregar vínculos');
-    }
-  };
-
   const fetchReadings = async () => {
     try {
       const response = await axios.get(`${API}/readings`, { headers: getAuthHeaders() });
@@ -80,15 +62,6 @@ const ClientsWithReadings = () => {
     }
   };
 
-  const fetchOperators = async () => {
-    try {
-      const response = await axios.get(`${API}/operators`, { headers: getAuthHeaders() });
-      setOperators(response.data);
-    } catch (error) {
-      console.error('Erro ao carregar operadores');
-    }
-  };
-
   const getClientMachines = (clientId) => {
     return machines.filter(m => m.client_id === clientId);
   };
@@ -143,17 +116,9 @@ const ClientsWithReadings = () => {
 
   const getLastReading = async (machineId) => {
     try {
-      const response = await axios.get(`${API}/readings`, {
-        headers: getAuthHeaders(),
-      });
-      
-      // Filtrar leituras desta máquina e pegar a mais recente
-      const machineReadings = response.data.filter(r => r.machine_id === machineId);
-      if (machineReadings.length === 0) return null;
-      
-      // Ordenar por data e pegar a mais recente
-      machineReadings.sort((a, b) => new Date(b.reading_date) - new Date(a.reading_date));
-      return machineReadings[0];
+      // Último contador de cada máquina; sem alterações o servidor responde 304
+      const data = await fetchBootstrap({ include_meters: true });
+      return data.meters[machineId] || null;
     } catch (error) {
       console.error('Erro ao buscar última leitura');
       return null;
@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
-import { API, getAuthHeaders } from '@/App';
+import { API, getAuthHeaders, fetchBootstrap } from '@/App';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Monitor, Users, UserCog, TrendingUp, DollarSign, FileText, Calendar, ArrowUpRight, ArrowDownRight, AlertCircle, Activity, Zap, Target } from 'lucide-react';
@@ -13,21 +13,61 @@ const Dashboard = () => {
   const [topMachines, setTopMachines] = useState([]);
   const [loading, setLoading] = useState(true);
   const [daysFilter, setDaysFilter] = useState(7);
+  const lookups = useRef({ machines: [], clients: [] });
 
   useEffect(() => {
     fetchAllData();
   }, [daysFilter]);
 
+  // Atualizações em tempo real: o servidor envia os totais alterados e as novas leituras
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!token) return undefined;
+
+    const source = new EventSource(`${API}/events/dashboard?token=${encodeURIComponent(token)}`);
+    source.addEventListener('readings', (event) => {
+      const { created, deleted, delta } = JSON.parse(event.data);
+      setStats(prev => prev && {
+        ...prev,
+        total_readings: prev.total_readings + delta.total_readings,
+        total_gross: prev.total_gross + delta.total_gross,
+        total_commissions: prev.total_commissions + delta.total_commissions,
+        total_net: prev.total_net + delta.total_net
+      });
+
+      const daysAgo = new Date(Date.now() - (daysFilter * 24 * 60 * 60 * 1000));
+      const fresh = created
+        .filter(r => new Date(r.reading_date) >= daysAgo)
+        .map(enrichReading);
+      setRecentReadings(prev => [...fresh, ...prev.filter(r => !deleted.includes(r.id))]
+        .sort((a, b) => new Date(b.reading_date) - new Date(a.reading_date))
+        .slice(0, 5));
+    });
+    source.addEventListener('resync', () => fetchAllData());
+
+    return () => source.close();
+  }, [daysFilter]);
+
+  const enrichReading = (reading) => {
+    const machine = lookups.current.machines.find(m => m.id === reading.machine_id);
+    const client = lookups.current.clients.find(c => c.id === machine?.client_id);
+    return {
+      ...reading,
+      machineName: machine ? `${machine.code} - ${machine.name}` : 'N/A',
+      clientName: client?.name || 'N/A'
+    };
+  };
+
   const fetchAllData = async () => {
     try {
-      const [statsRes, readingsRes, machinesRes, clientsRes] = await Promise.all([
+      const [statsRes, readingsRes, reference] = await Promise.all([
         axios.get(`${API}/reports/dashboard`, { headers: getAuthHeaders() }),
         axios.get(`${API}/readings`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/machines`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/clients`, { headers: getAuthHeaders() })
+        fetchBootstrap()
       ]);
       
       setStats(statsRes.data);
+      lookups.current = { machines: reference.machines, clients: reference.clients };
       
       // Pegar últimas 5 leituras com informações da máquina e cliente
       const sorted = readingsRes.data.sort((a, b) => 
@@ -39,15 +79,7 @@ const Dashboard = () => {
       const daysAgo = new Date(now.getTime() - (daysFilter * 24 * 60 * 60 * 1000));
       const filtered = sorted.filter(r => new Date(r.reading_date) >= daysAgo);
       
-      const enrichedReadings = filtered.slice(0, 5).map(reading => {
-        const machine = machinesRes.data.find(m => m.id === reading.machine_id);
-        const client = clientsRes.data.find(c => c.id === machine?.client_id);
-        return {
-          ...reading,
-          machineName: machine ? `${machine.code} - ${machine.name}` : 'N/A',
-          clientName: client?.name || 'N/A'
-        };
-      });
+      const enrichedReadings = filtered.slice(0, 5).map(enrichReading);
       
       setRecentReadings(enrichedReadings);
       
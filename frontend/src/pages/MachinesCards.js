@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { API, getAuthHeaders } from '@/App';
+import { API, getAuthHeaders, fetchBootstrap } from '@/App';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -27,53 +27,29 @@ const MachinesCards = () => {
   });
 
   useEffect(() => {
-    fetchMachines();
-    fetchClients();
-    fetchOperators();
-    fetchRegions();
+    fetchReferenceData();
   }, []);
 
-  const fetchMachines = async () => {
+  const fetchReferenceData = async () => {
     try {
-      const response = await axios.get(`${API}/machines`, {
-        headers: getAuthHeaders(),
-      });
-      setMachines(response.data);
+      const data = await fetchBootstrap();
+      setMachines(data.machines);
+      setClients(data.clients);
+      setOperators(data.operators);
+      setRegions(data.regions);
     } catch (error) {
       toast.error('Erro ao carregar máquinas');
     }
   };
 
-  const fetchClients = async () => {
-    try {
-      const response = await axios.get(`${API}/clients`, {
-        headers: getAuthHeaders(),
-      });
-      setClients(response.data);
-    } catch (error) {
-      console.error('Erro ao carregar clientes');
-    }
-  };
-
-  const fetchOperators = async () => {
-    try {
-      const response = await axios.get(`${API}/operators`, {
-        headers: getAuthHeaders(),
-      });
-      setOperators(response.data);
-    } catch (error) {
-      console.error('Erro ao carregar operadores');
-    }
-  };
-
-  const fetchRegions = async () => {
+  const fetchMachines = async () => {
     try {
-      const response = await axios.get(`${API}/regions`, {
+      const response = await axios.get(`${API}/machines`, {
         headers: getAuthHeaders(),
       });
-      setRegions(response.data);
+      setMachines(response.data);
     } catch (error) {
-      console.error('Erro ao carregar regiões');
+      toast.error('Erro ao carregar máquinas');
     }
   };
 
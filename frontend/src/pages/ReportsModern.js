@@ -1,12 +1,13 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import { API, getAuthHeaders } from '@/App';
+import { API, getAuthHeaders, fetchBootstrap } from '@/App';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { toast } from 'sonner';
-import { format } from 'date-fns';
-import { BarChart3, TrendingUp, Users, MapPin, Monitor, DollarSign, Target, Award, Activity } from 'lucide-react';
+import { format, startOfMonth, endOfMonth, subMonths } from 'date-fns';
+import { Button } from '@/components/ui/button';
+import { BarChart3, TrendingUp, Users, MapPin, Monitor, DollarSign, Target, Award, Activity, Printer, Download, Trophy } from 'lucide-react';
 
 const ReportsModern = () => {
   const [machines, setMachines] = useState([]);
@@ -18,37 +19,28 @@ const ReportsModern = () => {
   const [machineReport, setMachineReport] = useState(null);
   const [clientReport, setClientReport] = useState(null);
   const [regionReport, setRegionReport] = useState(null);
+  const [rankingEntity, setRankingEntity] = useState('machines');
+  const [rankingMetric, setRankingMetric] = useState('gross');
+  const [rankingOrder, setRankingOrder] = useState('top');
+  const [rankingPeriod, setRankingPeriod] = useState('month');
+  const [ranking, setRanking] = useState(null);
 
   useEffect(() => {
-    fetchMachines();
-    fetchClients();
-    fetchRegions();
+    fetchReferenceData();
   }, []);
 
-  const fetchMachines = async () => {
-    try {
-      const response = await axios.get(`${API}/machines`, { headers: getAuthHeaders() });
-      setMachines(response.data);
-    } catch (error) {
-      toast.error('Erro ao carregar máquinas');
-    }
-  };
-
-  const fetchClients = async () => {
-    try {
-      const response = await axios.get(`${API}/clients`, { headers: getAuthHeaders() });
-      setClients(response.data);
-    } catch (error) {
-      toast.error('Erro ao carregar clientes');
-    }
-  };
+  useEffect(() => {
+    fetchRanking();
+  }, [rankingEntity, rankingMetric, rankingOrder, rankingPeriod]);
 
-  const fetchRegions = async () => {
+  const fetchReferenceData = async () => {
     try {
-      const response = await axios.get(`${API}/regions`, { headers: getAuthHeaders() });
-      setRegions(response.data);
+      const data = await fetchBootstrap();
+      setMachines(data.machines);
+      setClients(data.clients);
+      setRegions(data.regions);
     } catch (error) {
-      toast.error('Erro ao carregar regiões');
+      toast.error('Erro ao carregar dados');
     }
   };
 
@@ -79,6 +71,64 @@ const ReportsModern = () => {
     }
   };
 
+  // Ranking calculado no servidor a partir dos totais diários, sem baixar os relatórios
+  const fetchRanking = async () => {
+    const now = new Date();
+    const params = { metric: rankingMetric, order: rankingOrder, limit: 10 };
+    if (rankingPeriod === 'month') {
+      params.start_date = format(startOfMonth(now), 'yyyy-MM-dd');
+    } else if (rankingPeriod === 'year') {
+      params.start_date = format(subMonths(now, 12), 'yyyy-MM-dd');
+    }
+    try {
+      const response = await axios.get(`${API}/reports/leaderboards/${rankingEntity}`, { headers: getAuthHeaders(), params });
+      setRanking(response.data);
+    } catch (error) {
+      toast.error('Erro ao carregar ranking');
+    }
+  };
+
+  const rankingName = (entry) => {
+    if (!entry.item) return 'Removido';
+    return rankingEntity === 'machines' ? `${entry.item.code} - ${entry.item.name}` : entry.item.name;
+  };
+
+  const rankingValue = (entry) => {
+    if (rankingMetric === 'net') return entry.net_value;
+    if (rankingMetric === 'commission') return entry.commission;
+    return entry.gross_value;
+  };
+
+  // Comprovantes de todos os clientes da região no mês atual, gerados no servidor
+  const downloadReceipts = async (kind) => {
+    const now = new Date();
+    try {
+      const response = await axios.get(`${API}/receipts/batch`, {
+        headers: getAuthHeaders(),
+        params: {
+          region_id: selectedRegion,
+          start_date: format(startOfMonth(now), 'yyyy-MM-dd'),
+          end_date: format(endOfMonth(now), 'yyyy-MM-dd'),
+          format: kind,
+        },
+        responseType: 'blob',
+      });
+      const url = window.URL.createObjectURL(response.data);
+      if (kind === 'html') {
+        // Abre numa nova aba, de onde sai a impressão (ou o PDF) de todas as páginas
+        window.open(url, '_blank');
+      } else {
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `comprovantes-${format(now, 'yyyy-MM')}.zip`;
+        a.click();
+      }
+      setTimeout(() => window.URL.revokeObjectURL(url), 60000);
+    } catch (error) {
+      toast.error(error.response?.status === 404 ? 'Nenhuma leitura neste mês para a região' : 'Erro ao gerar comprovantes');
+    }
+  };
+
   return (
     <div className="animate-fade-in space-y-6">
       {/* Header */}
@@ -115,6 +165,14 @@ const ReportsModern = () => {
             <MapPin className="mr-2" size={16} />
             Por Região
           </TabsTrigger>
+          <TabsTrigger 
+            value="ranking" 
+            data-testid="ranking-tab" 
+            className="data-[state=active]:bg-gradient-to-r data-[state=active]:from-yellow-500 data-[state=active]:to-amber-500 data-[state=active]:text-white"
+          >
+            <Trophy className="mr-2" size={16} />
+            Ranking
+          </TabsTrigger>
         </TabsList>
 
         {/* Machine Report */}
@@ -319,6 +377,27 @@ const ReportsModern = () => {
                     ))}
                   </SelectContent>
                 </Select>
+                {selectedRegion && (
+                  <div className="flex gap-3 mt-4">
+                    <Button
+                      data-testid="region-receipts-print"
+                      onClick={() => downloadReceipts('html')}
+                      className="bg-gradient-to-r from-yellow-500 to-orange-500 hover:from-yellow-600 hover:to-orange-600 text-white"
+                    >
+                      <Printer className="mr-2" size={16} />
+                      Imprimir comprovantes do mês
+                    </Button>
+                    <Button
+                      data-testid="region-receipts-zip"
+                      onClick={() => downloadReceipts('zip')}
+                      variant="outline"
+                      className="border-yellow-500 text-yellow-400 hover:bg-yellow-500/10"
+                    >
+                      <Download className="mr-2" size={16} />
+                      Baixar .zip
+                    </Button>
+                  </div>
+                )}
               </div>
 
               {regionReport && (
@@ -384,6 +463,81 @@ const ReportsModern = () => {
             </CardContent>
           </Card>
         </TabsContent>
+        {/* Ranking */}
+        <TabsContent value="ranking" className="mt-6 space-y-6">
+          <Card className="bg-gradient-to-br from-amber-900/90 to-yellow-900/90 border-2 border-yellow-500 shadow-2xl">
+            <CardHeader className="border-b-2 border-yellow-500/30">
+              <CardTitle className="flex items-center gap-2 text-white text-2xl">
+                <Trophy className="text-yellow-400" size={28} />
+                Ranking
+              </CardTitle>
+            </CardHeader>
+            <CardContent className="pt-6">
+              <div className="grid grid-cols-1 md:grid-cols-4 gap-3 mb-6">
+                <Select value={rankingEntity} onValueChange={setRankingEntity}>
+                  <SelectTrigger data-testid="ranking-entity-select" className="bg-slate-700 border-yellow-500 text-white h-12">
+                    <SelectValue />
+                  </SelectTrigger>
+                  <SelectContent className="bg-slate-700 border-yellow-500">
+                    <SelectItem value="machines">Máquinas</SelectItem>
+                    <SelectItem value="clients">Clientes</SelectItem>
+                    <SelectItem value="regions">Regiões</SelectItem>
+                  </SelectContent>
+                </Select>
+                <Select value={rankingMetric} onValueChange={setRankingMetric}>
+                  <SelectTrigger data-testid="ranking-metric-select" className="bg-slate-700 border-yellow-500 text-white h-12">
+                    <SelectValue />
+                  </SelectTrigger>
+                  <SelectContent className="bg-slate-700 border-yellow-500">
+                    <SelectItem value="gross">Receita bruta</SelectItem>
+                    <SelectItem value="net">Lucro líquido</SelectItem>
+                    <SelectItem value="commission">Comissões</SelectItem>
+                  </SelectContent>
+                </Select>
+                <Select value={rankingOrder} onValueChange={setRankingOrder}>
+                  <SelectTrigger data-testid="ranking-order-select" className="bg-slate-700 border-yellow-500 text-white h-12">
+                    <SelectValue />
+                  </SelectTrigger>
+                  <SelectContent className="bg-slate-700 border-yellow-500">
+                    <SelectItem value="top">Maiores</SelectItem>
+                    <SelectItem value="bottom">Menores</SelectItem>
+                  </SelectContent>
+                </Select>
+                <Select value={rankingPeriod} onValueChange={setRankingPeriod}>
+                  <SelectTrigger data-testid="ranking-period-select" className="bg-slate-700 border-yellow-500 text-white h-12">
+                    <SelectValue />
+                  </SelectTrigger>
+                  <SelectContent className="bg-slate-700 border-yellow-500">
+                    <SelectItem value="month">Este mês</SelectItem>
+                    <SelectItem value="year">Últimos 12 meses</SelectItem>
+                    <SelectItem value="all">Todo o período</SelectItem>
+                  </SelectContent>
+                </Select>
+              </div>
+
+              {ranking && ranking.items.length === 0 && (
+                <p className="text-center text-slate-300 py-8">Nenhuma leitura no período</p>
+              )}
+
+              {ranking && ranking.items.length > 0 && (
+                <div className="space-y-3">
+                  {ranking.items.map((entry) => (
+                    <div key={entry.id} data-testid={`ranking-row-${entry.rank}`} className="flex items-center justify-between p-4 rounded-xl bg-gradient-to-r from-amber-800/40 to-yellow-800/40 border border-yellow-400/30 hover:border-yellow-400 transition-all">
+                      <div className="flex items-center gap-4">
+                        <span className="text-2xl font-bold text-yellow-400 w-10">{entry.rank}º</span>
+                        <div>
+                          <p className="text-white font-semibold">{rankingName(entry)}</p>
+                          <p className="text-sm text-amber-200">{entry.count} leituras</p>
+                        </div>
+                      </div>
+                      <p className="text-lg font-bold text-green-400">R$ {rankingValue(entry).toFixed(2)}</p>
+                    </div>
+                  ))}
+                </div>
+              )}
+            </CardContent>
+          </Card>
+        </TabsContent>
       </Tabs>
     </div>
   );
@@ -2,105 +2,436 @@
 """
 Conversor de Backup - SlotManager
 Converte backups do formato antigo para o novo formato compatível
+
+O arquivo antigo é lido de forma incremental: a primeira passada carrega só as
+seções pequenas (regiões, clientes, perfis, máquinas) e a segunda percorre as
+leituras uma a uma, gravando a saída registro por registro.
+
+Com --mongo-url URL (ou --mongo, que usa $MONGO_URL), os registros são
+carregados direto no MongoDB em lotes, sem arquivo intermediário. Os ids são derivados dos ids antigos, então uma carga
+interrompida pode ser executada de novo e continua de onde parou.
 """
 
+import argparse
+import hashlib
 import json
+import os
 import uuid
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from money import with_cents  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CHUNK_SIZE = 1024 * 1024
+READINGS_KEY = 'readings'
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'slotmanager/legacy-backup')
+DEFAULT_BATCH_SIZE = 5000
+DUPLICATE_KEY = 11000
+
+# Created after the load; the unique id index is created before it so reruns
+# skip documents that were already inserted
+SECONDARY_INDEXES = {
+    'regions': [[('updated_at', 1), ('id', 1)]],
+    'clients': [[('updated_at', 1), ('id', 1)]],
+    'operators': [[('updated_at', 1), ('id', 1)]],
+    'machines': [[('client_id', 1)], [('region_id', 1)], [('operator_id', 1)], [('updated_at', 1), ('id', 1)]],
+    'readings': [[('machine_id', 1), ('reading_date', -1)], [('reading_date', -1)], [('updated_at', 1), ('id', 1)]],
+}
+
+_decoder = json.JSONDecoder()
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+class JSONStream:
+    """Leitor incremental do objeto raiz de um arquivo JSON."""
+
+    def __init__(self, path):
+        self.file = open(path, 'r', encoding='utf-8')
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def close(self):
+        self.file.close()
+
+    def _fill(self):
+        if self.pos > CHUNK_SIZE:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise ValueError("Fim inesperado do arquivo JSON")
+            self._fill()
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"JSON inválido: esperado '{char}' na posição {self.pos}")
+        self.pos += 1
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number cut at the end of the buffer decodes "successfully" but short
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Percorre as chaves do objeto raiz; arrays são entregues como iteradores."""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if self._peek() == '[':
+                iterator = self._array()
+                yield key, iterator
+                for _ in iterator:  # drain whatever the caller did not consume
+                    pass
+            else:
+                yield key, self._value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect(']')
+            return
+
+
+class RecordWriter:
+    """Grava o novo formato como um objeto JSON com um registro por linha."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('{')
+        self.sections = 0
+        self.count = 0
+
+    def begin(self, section):
+        self.file.write(',\n' if self.sections else '\n')
+        self.file.write(f'"{section}": [')
+        self.sections += 1
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(',\n' if self.count else '\n')
+        self.file.write(_encode(record))
+        self.count += 1
+
+    def end(self):
+        self.file.write('\n]')
+
+    def close(self):
+        self.file.write('\n}\n')
+        self.file.close()
+
+
+class MongoLoader:
+    """Carrega os registros direto no MongoDB com inserts em lote não ordenados."""
+
+    def __init__(self, mongo_url, db_name, source_id, batch_size=DEFAULT_BATCH_SIZE):
+        from pymongo import MongoClient
+        from pymongo.errors import BulkWriteError
+
+        self.BulkWriteError = BulkWriteError
+        self.client = MongoClient(mongo_url)
+        self.db = self.client[db_name]
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.source_id = source_id
+        self.stamp = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+        self.checkpoints = self.db.converter_checkpoints
+        state = self.checkpoints.find_one({"_id": source_id}) or {}
+        self.committed = state.get('sections', {})
+        self.completed = state.get('completed', False)
+        self.count = 0
+        self.repeated = {}
+
+    def begin(self, section):
+        self.section = section
+        self.collection = self.db[section]
+        self.collection.create_index('id', unique=True)
+        self.skip = self.committed.get(section, 0)
+        self.batch = []
+        self.count = 0
+        self.resumed = 0
+        if self.skip:
+            print(f"   ↻ retomando após {self.skip} registros já carregados")
+
+    def write(self, record):
+        self.count += 1
+        if self.count <= self.skip:
+            return
+        if self.section == 'readings':
+            # The API totals read the cents fields; the file output gets them on import
+            with_cents(record)
+        record['updated_at'] = self.stamp
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        try:
+            self.collection.insert_many(self.batch, ordered=False)
+        except self.BulkWriteError as e:
+            details = e.details
+            if details.get('writeConcernErrors') or any(err['code'] != DUPLICATE_KEY for err in details['writeErrors']):
+                raise
+            self._count_duplicates([self.batch[err['index']]['id'] for err in details['writeErrors']])
+        self.checkpoints.update_one(
+            {"_id": self.source_id},
+            {"$set": {f"sections.{self.section}": self.count, "updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        self.batch = []
+
+    def _count_duplicates(self, ids):
+        # A copy stamped by this run means the old file repeats the legacy id;
+        # otherwise the row was committed by an interrupted previous run
+        repeated = self.collection.count_documents({"id": {"$in": ids}, "updated_at": self.stamp})
+        self.repeated[self.section] = self.repeated.get(self.section, 0) + repeated
+        self.resumed += len(ids) - repeated
+
+    def end(self):
+        self._flush()
+        if self.resumed:
+            print(f"   ↻ {self.resumed} registros já estavam no banco")
+        if self.repeated.get(self.section):
+            print(f"   ⚠ {self.repeated[self.section]} registros com id antigo repetido ignorados (ficou o primeiro)")
+
+    def close(self):
+        if any(self.repeated.values()):
+            print("\nIds antigos repetidos no arquivo (registros ignorados):")
+            for section, repeated in self.repeated.items():
+                if repeated:
+                    print(f"  ⚠ {section}: {repeated}")
+        print("\nCriando índices...")
+        for section, indexes in SECONDARY_INDEXES.items():
+            for keys in indexes:
+                self.db[section].create_index(keys)
+        self.checkpoints.update_one({"_id": self.source_id}, {"$set": {"completed": True}}, upsert=True)
+        self.client.close()
+
+
+def source_fingerprint(input_file, namespace):
+    """Identifica o arquivo de origem para retomar cargas interrompidas."""
+    digest = hashlib.sha1(namespace.bytes)
+    digest.update(str(os.path.getsize(input_file)).encode())
+    with open(input_file, 'rb') as f:
+        digest.update(f.read(CHUNK_SIZE))
+    return digest.hexdigest()
+
+
+class Stats:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.section_started = self.started
+        self.total = 0
+
+    def section(self):
+        self.section_started = time.perf_counter()
+
+    def report(self, label, count):
+        self.total += count
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - self.section_started
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"   ⏱ {label}: {count} registros em {elapsed:.2f}s ({rate:,.0f} registros/s)")
+
+    def summary(self):
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - self.started
+        rate = self.total / elapsed if elapsed > 0 else 0
+        print(f"\nEstatísticas:")
+        print(f"  Tempo total: {elapsed:.2f}s")
+        print(f"  Registros: {self.total} ({rate:,.0f} registros/s)")
+        print(f"  Pico de memória: {peak_memory_mb()}")
+
+
+def peak_memory_mb():
+    if resource is None:
+        return "n/d"
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return f"{peak / 1024:.1f} MB"
+
+
+def load_sections(input_file):
+    """Primeira passada: carrega tudo menos as leituras."""
+    sections = {}
+    stream = JSONStream(input_file)
+    try:
+        for key, value in stream.items():
+            if key == READINGS_KEY:
+                continue
+            sections[key] = list(value) if hasattr(value, '__next__') else value
+    finally:
+        stream.close()
+    return sections
+
+
+def iter_readings(input_file):
+    """Segunda passada: percorre as leituras sem materializá-las."""
+    stream = JSONStream(input_file)
+    try:
+        for key, value in stream.items():
+            if key == READINGS_KEY:
+                yield from value
+    finally:
+        stream.close()
+
+
+def make_id(namespace, section, legacy_id):
+    return str(uuid.uuid5(namespace, f"{section}:{legacy_id}"))
+
+
+def convert_backup(input_file, writer, show_stats=False, namespace=ID_NAMESPACE):
+    """Converte backup do formato antigo para o novo, gravando em `writer`"""
+
+    stats = Stats(show_stats)
+    now = datetime.now().isoformat()
 
-def convert_backup(input_file, output_file):
-    """Converte backup do formato antigo para o novo"""
-    
     print(f"Lendo arquivo: {input_file}")
-    with open(input_file, 'r') as f:
-        old_data = json.load(f)
-    
+    old_data = load_sections(input_file)
+
     # Mapeamentos de IDs
     client_id_map = {}
     region_id_map = {}
     machine_id_map = {}
     operator_id_map = {}
-    
-    new_data = {
-        "clients": [],
-        "operators": [],
-        "regions": [],
-        "machines": [],
-        "readings": []
-    }
-    
+    counts = {}
+
     # 1. Converter Regions
     print("\n1. Convertendo Regiões...")
+    stats.section()
+    writer.begin('regions')
     for region in old_data.get('regions', []):
-        new_id = str(uuid.uuid4())
+        new_id = make_id(namespace, 'regions', region['id'])
         region_id_map[region['id']] = new_id
-        
-        new_data['regions'].append({
+
+        writer.write({
             "id": new_id,
             "name": region['name'],
             "description": region.get('description', ''),
-            "created_at": region.get('created_at', datetime.now().isoformat())
+            "created_at": region.get('created_at', now)
         })
-    print(f"   ✓ {len(new_data['regions'])} regiões convertidas")
-    
+    writer.end()
+    counts['regions'] = writer.count
+    print(f"   ✓ {counts['regions']} regiões convertidas")
+    stats.report("Regiões", counts['regions'])
+
     # 2. Converter Clients
     print("\n2. Convertendo Clientes...")
+    stats.section()
+    client_region_map = {}
+    writer.begin('clients')
     for client in old_data.get('clients', []):
-        new_id = str(uuid.uuid4())
+        new_id = make_id(namespace, 'clients', client['id'])
         client_id_map[client['id']] = new_id
-        
+        client_region_map[client['id']] = client.get('region_id')
+
         commission_value = float(client.get('commission', 0) or 0)
-        
-        new_data['clients'].append({
+
+        writer.write({
             "id": new_id,
             "name": client['name'],
             "commission_type": "percentage",
             "commission_value": commission_value,
             "phone": client.get('contact', '') or '',
             "email": client.get('email', '') or '',
-            "created_at": client.get('created_at', datetime.now().isoformat())
+            "created_at": client.get('created_at', now)
         })
-    print(f"   ✓ {len(new_data['clients'])} clientes convertidos")
-    
+    writer.end()
+    counts['clients'] = writer.count
+    print(f"   ✓ {counts['clients']} clientes convertidos")
+    stats.report("Clientes", counts['clients'])
+
     # 3. Converter Operators
     print("\n3. Convertendo Operadores...")
+    stats.section()
     operator_profiles = {p['id']: p for p in old_data.get('impersonation_profiles', [])}
-    seen_profiles = set()
-    
+    writer.begin('operators')
+
     for mc in old_data.get('manager_clients', []):
         profile_id = mc.get('impersonation_profile_id')
-        if profile_id and profile_id not in seen_profiles:
-            seen_profiles.add(profile_id)
+        if profile_id and profile_id not in operator_id_map:
             profile = operator_profiles.get(profile_id, {})
-            
-            new_id = str(uuid.uuid4())
+
+            new_id = make_id(namespace, 'operators', profile_id)
             operator_id_map[profile_id] = new_id
-            
+
             commission_value = float(mc.get('commission_percentage', 0) or 0)
-            
-            new_data['operators'].append({
+
+            writer.write({
                 "id": new_id,
-                "name": profile.get('name', f'Operador {len(new_data["operators"]) + 1}'),
+                "name": profile.get('name', f'Operador {writer.count + 1}'),
                 "commission_type": "percentage",
                 "commission_value": commission_value,
                 "phone": profile.get('phone', '') or '',
-                "created_at": mc.get('created_at', datetime.now().isoformat())
+                "created_at": mc.get('created_at', now)
             })
-    
-    if not new_data['operators']:
-        default_operator_id = str(uuid.uuid4())
-        new_data['operators'].append({
-            "id": default_operator_id,
+
+    if not writer.count:
+        writer.write({
+            "id": make_id(namespace, 'operators', 'default'),
             "name": "Sem Operador",
             "commission_type": "percentage",
             "commission_value": 0,
             "phone": "",
-            "created_at": datetime.now().isoformat()
+            "created_at": now
         })
-    
-    print(f"   ✓ {len(new_data['operators'])} operadores convertidos")
-    
+    writer.end()
+    counts['operators'] = writer.count
+    print(f"   ✓ {counts['operators']} operadores convertidos")
+    stats.report("Operadores", counts['operators'])
+
     # 4. Mapear clientes para operadores
     client_operators = {}
     for mc in old_data.get('manager_clients', []):
@@ -108,30 +439,29 @@ def convert_backup(input_file, output_file):
         profile_id = mc.get('impersonation_profile_id')
         if client_id and profile_id and profile_id in operator_id_map:
             client_operators[client_id] = operator_id_map[profile_id]
-    
+
     # 5. Converter Machines
     print("\n4. Convertendo Máquinas...")
+    stats.section()
+    default_region_id = next(iter(region_id_map.values()), None)
+    writer.begin('machines')
     for machine in old_data.get('machines', []):
-        new_id = str(uuid.uuid4())
-        machine_id_map[machine['id']] = new_id
-        
         old_client_id = machine['client_id']
         new_client_id = client_id_map.get(old_client_id)
-        
+
+        # Skipped machines stay out of the map so their readings are dropped too
         if not new_client_id:
             continue
-        
-        # Buscar região do cliente
-        old_region_id = None
-        for client in old_data['clients']:
-            if client['id'] == old_client_id:
-                old_region_id = client.get('region_id')
-                break
-        
-        new_region_id = region_id_map.get(old_region_id) if old_region_id else list(region_id_map.values())[0]
+
+        new_id = make_id(namespace, 'machines', machine['id'])
+        machine_id_map[machine['id']] = new_id
+
+        # Região do cliente
+        old_region_id = client_region_map.get(old_client_id)
+        new_region_id = region_id_map.get(old_region_id) if old_region_id else default_region_id
         operator_id = client_operators.get(old_client_id)
-        
-        new_data['machines'].append({
+
+        writer.write({
             "id": new_id,
             "code": str(machine.get('serial_number', machine['id'])),
             "name": machine.get('model', f"Máquina {machine['id']}"),
@@ -140,26 +470,34 @@ def convert_backup(input_file, output_file):
             "region_id": new_region_id,
             "operator_id": operator_id,
             "active": True,
-            "created_at": machine.get('created_at', datetime.now().isoformat())
+            "created_at": machine.get('created_at', now)
         })
-    print(f"   ✓ {len(new_data['machines'])} máquinas convertidas")
-    
+    writer.end()
+    counts['machines'] = writer.count
+    print(f"   ✓ {counts['machines']} máquinas convertidas")
+    stats.report("Máquinas", counts['machines'])
+
+    # Only the id maps are needed from here on
+    del old_data, operator_profiles, client_region_map
+
     # 6. Converter Readings
     print("\n5. Convertendo Leituras...")
-    for reading in old_data.get('readings', []):
+    stats.section()
+    writer.begin('readings')
+    for position, reading in enumerate(iter_readings(input_file)):
         old_machine_id = reading.get('machine_id')
         new_machine_id = machine_id_map.get(old_machine_id)
-        
+
         if not new_machine_id:
             continue
-        
-        new_id = str(uuid.uuid4())
-        
+
+        new_id = make_id(namespace, 'readings', reading.get('id', f"#{position}"))
+
         profit = float(reading.get('profit', 0) or 0)
         client_commission = abs(float(reading.get('commission_value', 0) or 0))
         operator_commission = abs(float(reading.get('operator_commission_value', 0) or 0))
         multiplier = float(reading.get('multiplier', 0.01) or 0.01)
-        
+
         # Calcular valores fictícios mas proporcionais
         if multiplier > 0 and profit != 0:
             difference = profit / multiplier
@@ -172,8 +510,9 @@ def convert_backup(input_file, output_file):
             previous_out = 800.0
             current_in = 1200.0
             current_out = 1000.0
-        
-        new_data['readings'].append({
+
+        created_at = reading.get('created_at', now)
+        writer.write({
             "id": new_id,
             "machine_id": new_machine_id,
             "previous_in": previous_in,
@@ -184,42 +523,63 @@ def convert_backup(input_file, output_file):
             "client_commission": client_commission,
             "operator_commission": operator_commission,
             "net_value": profit - client_commission - operator_commission,
-            "reading_date": reading.get('created_at', datetime.now().isoformat()),
-            "created_at": reading.get('created_at', datetime.now().isoformat())
+            "reading_date": created_at,
+            "created_at": created_at
         })
-    
-    print(f"   ✓ {len(new_data['readings'])} leituras convertidas")
-    
-    # Salvar novo formato
-    print(f"\nSalvando arquivo: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(new_data, f, indent=2, ensure_ascii=False)
-    
+    writer.end()
+    counts['readings'] = writer.count
+    writer.close()
+    print(f"   ✓ {counts['readings']} leituras convertidas")
+    stats.report("Leituras", counts['readings'])
+
     print("\n" + "="*60)
     print("CONVERSÃO COMPLETA!")
     print("="*60)
     print(f"\nResumo:")
-    print(f"  ✓ Clientes: {len(new_data['clients'])}")
-    print(f"  ✓ Operadores: {len(new_data['operators'])}")
-    print(f"  ✓ Regiões: {len(new_data['regions'])}")
-    print(f"  ✓ Máquinas: {len(new_data['machines'])}")
-    print(f"  ✓ Leituras: {len(new_data['readings'])}")
-    print(f"\nArquivo convertido salvo em: {output_file}")
-    print("\nAgora você pode importar este arquivo pela interface web:")
-    print("  Menu → Configurações → Importar Backup")
+    print(f"  ✓ Clientes: {counts['clients']}")
+    print(f"  ✓ Operadores: {counts['operators']}")
+    print(f"  ✓ Regiões: {counts['regions']}")
+    print(f"  ✓ Máquinas: {counts['machines']}")
+    print(f"  ✓ Leituras: {counts['readings']}")
+    stats.summary()
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso: python3 converter.py <arquivo_backup_antigo.json> [arquivo_saida.json]")
-        print("\nExemplo:")
-        print("  python3 converter.py backup_soberano_2025-10-26.json backup_convertido.json")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'backup_converted.json'
-    
+    parser = argparse.ArgumentParser(
+        description="Converte backups do formato antigo para o novo formato do SlotManager",
+        epilog="Exemplo: python3 converter.py backup_soberano_2025-10-26.json backup_convertido.json"
+    )
+    parser.add_argument('input_file', help="arquivo de backup no formato antigo")
+    parser.add_argument('output_file', nargs='?', default='backup_converted.json', help="arquivo de saída")
+    parser.add_argument('--stats', action='store_true', help="mostra registros por segundo e pico de memória")
+    parser.add_argument('--mongo-url', default=None, help="carrega direto no MongoDB desta URL em vez de gravar arquivo")
+    parser.add_argument('--mongo', action='store_true', help="como --mongo-url, usando $MONGO_URL")
+    parser.add_argument('--db', default=os.environ.get('DB_NAME'), help="banco de destino (padrão: $DB_NAME)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="documentos por insert em lote")
+    parser.add_argument('--namespace', default=None,
+                        help="separa os ids gerados quando backups de sistemas diferentes vão para o mesmo banco")
+    args = parser.parse_args()
+
+    namespace = uuid.uuid5(ID_NAMESPACE, args.namespace) if args.namespace else ID_NAMESPACE
+    mongo_url = args.mongo_url or (os.environ.get('MONGO_URL') if args.mongo else None)
+    if args.mongo and not mongo_url:
+        parser.error("--mongo precisa de $MONGO_URL")
+    if mongo_url and not args.db:
+        parser.error("a carga no MongoDB precisa de --db (ou $DB_NAME)")
+
     try:
-        convert_backup(input_file, output_file)
+        if mongo_url:
+            writer = MongoLoader(mongo_url, args.db, source_fingerprint(args.input_file, namespace), args.batch_size)
+            if writer.completed:
+                print(f"Este arquivo já foi carregado em '{args.db}'. Nada a fazer.")
+                sys.exit(0)
+            convert_backup(args.input_file, writer, show_stats=args.stats, namespace=namespace)
+            print(f"\nDados carregados no banco: {args.db}")
+        else:
+            convert_backup(args.input_file, RecordWriter(args.output_file), show_stats=args.stats, namespace=namespace)
+            print(f"\nArquivo convertido salvo em: {args.output_file}")
+            print("\nAgora você pode importar este arquivo pela interface web:")
+            print("  Menu → Configurações → Importar Backup")
     except Exception as e:
         print(f"\n❌ Erro durante a conversão: {str(e)}")
         import traceback
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Gerador de Dados Sintéticos - SlotManager
+Cria regiões, clientes, operadores, vínculos, máquinas e anos de leituras com
+distribuições realistas, para testar relatórios e importações com volume de
+produção:
+
+    python3 scripts/generate_data.py mongo --mongo-url mongodb://localhost:27017 --db slotmanager
+    python3 scripts/generate_data.py backup dados.smbk      # POST /api/backup/restore/binary
+    python3 scripts/generate_data.py json dados.json        # POST /api/backup/import ou /restore
+    python3 scripts/generate_data.py csv pasta/             # cadastros.json + leituras.csv (/readings/import)
+
+- multiplicadores do conjunto suportado (0.01, 0.10, 0.25, 0.50, 1.00)
+- medidores sempre crescentes por máquina, com movimento diário log-normal
+- comissões percentuais e fixas misturadas, calculadas como no servidor
+
+A mesma --seed gera exatamente os mesmos dados (ids inclusive), independente do
+número de processos: cada máquina tem seu próprio gerador aleatório e as
+leituras são produzidas em paralelo por lotes de máquinas. Informe --end-date
+para que as datas também se repitam entre execuções.
+
+No modo mongo as leituras mais antigas que READINGS_HOT_DAYS vão direto para
+readings_archive, com os totais diários em reading_rollups e os mensais em
+reading_rollups_monthly, como o servidor faria após arquivar. Os índices são
+criados pelo servidor ao iniciar.
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+import backup_format  # noqa: E402
+
+MULTIPLIERS = [0.01, 0.10, 0.25, 0.50, 1.00]
+CLIENT_PERCENTAGES = [20, 25, 30, 35, 40, 50]
+CLIENT_FIXED = [50, 100, 150, 200]
+OPERATOR_PERCENTAGES = [5, 10, 15]
+OPERATOR_FIXED = [10, 20, 30]
+CENT_FIELDS = ['gross_cents', 'client_commission_cents', 'operator_commission_cents', 'net_cents']
+ENTITY_COLLECTIONS = ['regions', 'clients', 'operators', 'machines', 'links']
+CSV_HEADER = ['machine_id', 'previous_in', 'previous_out', 'current_in', 'current_out', 'reading_date']
+MACHINES_PER_TASK = 50
+DEFAULT_BATCH_SIZE = 10000
+
+# Per-process state set by init_worker
+settings = {}
+worker_db = None
+
+
+UUID4_MASK = ~(0xf000 << 64) & ~(0xc000 << 48) & ((1 << 128) - 1)
+UUID4_BITS = (0x4000 << 64) | (0x8000 << 48)
+
+
+def new_id(rng):
+    # Same value as str(uuid.UUID(int=..., version=4)), formatted without the UUID object
+    h = f"{(rng.getrandbits(128) & UUID4_MASK) | UUID4_BITS:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def pick_commission(rng, percentages, fixed, fixed_share):
+    if rng.random() < fixed_share:
+        return 'fixed', float(rng.choice(fixed))
+    return 'percentage', float(rng.choice(percentages))
+
+
+def build_entities(args, created_at, stamp):
+    """Cadastros gerados no processo principal; as leituras dependem só do perfil de cada máquina."""
+    rng = random.Random(f"{args.seed}:entities")
+
+    def base(name):
+        return {'id': new_id(rng), 'name': name, 'created_at': created_at, 'updated_at': stamp}
+
+    regions = [dict(base(f'Região {i + 1}'), description=None) for i in range(args.regions)]
+    clients = []
+    for i in range(args.clients):
+        commission_type, commission_value = pick_commission(rng, CLIENT_PERCENTAGES, CLIENT_FIXED, 0.3)
+        clients.append(dict(base(f'Cliente {i + 1}'), commission_type=commission_type, commission_value=commission_value,
+                            phone=f'(11) 9{rng.randrange(10 ** 8):08d}', email=None))
+    operators = []
+    for i in range(args.operators):
+        commission_type, commission_value = pick_commission(rng, OPERATOR_PERCENTAGES, OPERATOR_FIXED, 0.4)
+        operators.append(dict(base(f'Operador {i + 1}'), commission_type=commission_type, commission_value=commission_value,
+                              phone=f'(11) 9{rng.randrange(10 ** 8):08d}'))
+
+    # Clients concentrate in a region and work with one or two operators
+    client_region = {c['id']: rng.choice(regions)['id'] for c in clients}
+    client_operators = {c['id']: rng.sample(operators, min(len(operators), rng.choice([1, 1, 2])))
+                        for c in clients} if operators else {}
+
+    machines, profiles, links = [], [], {}
+    for i in range(args.machines):
+        client = rng.choice(clients)
+        operator = rng.choice(client_operators[client['id']]) if operators and rng.random() < 0.8 else None
+        region_id = client_region[client['id']] if rng.random() < 0.9 else rng.choice(regions)['id']
+        machine = dict(base(f'Máquina {i + 1}'), code=f'SM{i + 1:06d}', multiplier=rng.choice(MULTIPLIERS),
+                       client_id=client['id'], region_id=region_id, operator_id=operator and operator['id'],
+                       active=rng.random() < 0.97)
+        machines.append(machine)
+        profiles.append((i, machine['id'], machine['multiplier'],
+                         (client['commission_type'], client['commission_value']),
+                         operator and (operator['commission_type'], operator['commission_value'])))
+        if operator:
+            links.setdefault((client['id'], operator['id']), {
+                'id': new_id(rng), 'client_id': client['id'], 'operator_id': operator['id'],
+                'created_at': created_at, 'updated_at': stamp,
+            })
+
+    return {'regions': regions, 'clients': clients, 'operators': operators,
+            'machines': machines, 'links': list(links.values())}, profiles
+
+
+def commission_cents(gross_cents, commission):
+    commission_type, value = commission
+    if commission_type == 'percentage':
+        return int((Decimal(gross_cents) * Decimal(str(value)) / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return round(value * 100)
+
+
+def machine_readings(profile):
+    """Leituras de uma máquina, da mais antiga para a mais recente."""
+    index, machine_id, multiplier, client, operator = profile
+    # Multipliers have at most two decimals, so gross in cents stays an integer product
+    multiplier_cents = round(multiplier * 100)
+    rng = random.Random(f"{settings['seed']}:machine:{index}")
+    interval = settings['interval_days']
+    days = settings['days']
+    stamp = settings['stamp']
+
+    daily_in = rng.lognormvariate(math.log(600), 0.7)
+    payout = rng.uniform(0.82, 0.94)
+    meter_in = float(rng.randrange(0, 500000))
+    meter_out = float(int(meter_in * payout))
+
+    # random() is much cheaper than uniform()/randrange() in this loop
+    random_ = rng.random
+    readings = []
+    for day in days[rng.randrange(interval)::interval]:
+        diff_in = max(1, int(daily_in * interval * (0.4 + 1.2 * random_())))
+        diff_out = int(diff_in * (payout - 0.1 + 0.2 * random_()))
+        previous_in, previous_out = meter_in, meter_out
+        meter_in += diff_in
+        meter_out += diff_out
+
+        # Same arithmetic as server.calculate_reading, in cents
+        gross = (diff_in - diff_out) * multiplier_cents
+        client_commission = commission_cents(gross, client)
+        operator_commission = commission_cents(gross, operator) if operator else 0
+        net = gross - client_commission - operator_commission
+        minutes = 8 * 60 + int(12 * 60 * random_())
+        reading_date = f"{day}T{minutes // 60:02d}:{minutes % 60:02d}:00+00:00"
+        readings.append({
+            'id': new_id(rng),
+            'machine_id': machine_id,
+            'previous_in': previous_in,
+            'previous_out': previous_out,
+            'current_in': meter_in,
+            'current_out': meter_out,
+            'gross_value': gross / 100,
+            'client_commission': client_commission / 100,
+            'operator_commission': operator_commission / 100,
+            'net_value': net / 100,
+            'gross_cents': gross,
+            'client_commission_cents': client_commission,
+            'operator_commission_cents': operator_commission,
+            'net_cents': net,
+            'reading_date': reading_date,
+            'created_at': reading_date,
+            'updated_at': stamp,
+        })
+    return readings
+
+
+def init_worker(values):
+    global worker_db
+    settings.update(values)
+    if settings['mode'] == 'mongo':
+        from pymongo import MongoClient
+        worker_db = MongoClient(settings['mongo_url'])[settings['db']]
+
+
+def insert_batches(collection, docs):
+    batch_size = settings['batch_size']
+    for start in range(0, len(docs), batch_size):
+        collection.insert_many(docs[start:start + batch_size], ordered=False)
+
+
+def rollups_of(readings):
+    rollups = {}
+    for r in readings:
+        key = (r['machine_id'], r['reading_date'][:10])
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = {'id': f'{key[0]}:{key[1]}', 'machine_id': key[0], 'day': key[1], 'count': 0,
+                                     **dict.fromkeys(CENT_FIELDS, 0)}
+        rollup['count'] += 1
+        for f in CENT_FIELDS:
+            rollup[f] += r[f]
+    return list(rollups.values())
+
+
+def monthly_rollups_of(daily):
+    rollups = {}
+    for day in daily:
+        key = (day['machine_id'], day['day'][:7])
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = {'id': f'{key[0]}:{key[1]}', 'machine_id': key[0], 'month': key[1], 'count': 0,
+                                     **dict.fromkeys(CENT_FIELDS, 0)}
+        rollup['count'] += day['count']
+        for f in CENT_FIELDS:
+            rollup[f] += day[f]
+    return list(rollups.values())
+
+
+def generate_task(profiles):
+    """Gera as leituras de um lote de máquinas e devolve (quantidade, saída no formato escolhido)."""
+    readings = [r for profile in profiles for r in machine_readings(profile)]
+    mode = settings['mode']
+    if mode == 'mongo':
+        cutoff = settings['cutoff']
+        archived = [r for r in readings if r['reading_date'] < cutoff]
+        hot = [r for r in readings if r['reading_date'] >= cutoff]
+        insert_batches(worker_db.readings, hot)
+        insert_batches(worker_db.readings_archive, archived)
+        daily = rollups_of(archived)
+        insert_batches(worker_db.reading_rollups, daily)
+        insert_batches(worker_db.reading_rollups_monthly, monthly_rollups_of(daily))
+        return len(readings), None
+    if mode == 'backup':
+        return len(readings), [(backup_format.encode_block(block), len(block))
+                               for block in backup_format.chunk_documents(readings)]
+    if mode == 'json':
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        return len(readings), ','.join(encode(r) for r in readings)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerows([r[field] for field in CSV_HEADER] for r in readings)
+    return len(readings), out.getvalue()
+
+
+def backup_meta(stamp):
+    return {'kind': 'full', 'since': None, 'watermark': {}, 'watermark_token': None, 'exported_at': stamp}
+
+
+class Progress:
+    def __init__(self, total_machines):
+        self.total_machines = total_machines
+        self.machines = 0
+        self.readings = 0
+        self.started = time.perf_counter()
+        self.last_print = 0.0
+
+    def add(self, machines, readings):
+        self.machines += machines
+        self.readings += readings
+        now = time.perf_counter()
+        if now - self.last_print >= 2 or self.machines == self.total_machines:
+            self.last_print = now
+            rate = self.readings / max(now - self.started, 1e-9)
+            print(f"\r   {self.machines}/{self.total_machines} máquinas, {self.readings} leituras ({rate:,.0f}/s)",
+                  end='', flush=True)
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"\n✓ {self.readings} leituras em {elapsed:.1f}s ({self.readings / max(elapsed, 1e-9):,.0f}/s)")
+
+
+def prepare_mongo(args, entities):
+    from pymongo import MongoClient
+
+    db = MongoClient(args.mongo_url)[args.db]
+    targets = ENTITY_COLLECTIONS + ['readings', 'readings_archive', 'reading_rollups', 'reading_rollups_monthly', 'tombstones']
+    existing = [name for name in targets if db[name].estimated_document_count()]
+    if existing and not args.drop:
+        sys.exit(f"❌ O banco {args.db} já tem dados em {', '.join(existing)}; use --drop para apagá-los")
+    for name in targets:
+        db[name].drop()
+    for name in ENTITY_COLLECTIONS:
+        if entities[name]:
+            db[name].insert_many(entities[name], ordered=False)
+
+
+def generate(args):
+    stamp = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+    end = date.fromisoformat(args.end_date) if args.end_date else datetime.now(timezone.utc).date()
+    total_days = max(1, int(round(args.years * 365)))
+    days = [(end - timedelta(days=offset)).isoformat() for offset in range(total_days - 1, -1, -1)]
+
+    entities, profiles = build_entities(args, f"{days[0]}T00:00:00+00:00", stamp)
+    print(f"Gerando {len(entities['regions'])} regiões, {len(entities['clients'])} clientes, "
+          f"{len(entities['operators'])} operadores, {len(entities['links'])} vínculos, {len(profiles)} máquinas")
+    print(f"Leituras a cada {args.interval_days} dia(s) de {days[0]} a {days[-1]} "
+          f"(~{len(profiles) * len(days) // args.interval_days} leituras) com {args.workers} processos")
+
+    if args.mode == 'mongo':
+        prepare_mongo(args, entities)
+
+    worker_settings = {
+        'mode': args.mode, 'seed': args.seed, 'days': days, 'interval_days': args.interval_days, 'stamp': stamp,
+        'mongo_url': getattr(args, 'mongo_url', None), 'db': getattr(args, 'db', None),
+        'batch_size': args.batch_size,
+        'cutoff': (datetime.now(timezone.utc) - timedelta(days=args.hot_days)).isoformat(),
+    }
+    tasks = [profiles[start:start + MACHINES_PER_TASK] for start in range(0, len(profiles), MACHINES_PER_TASK)]
+    progress = Progress(len(profiles))
+
+    with Pool(args.workers, initializer=init_worker, initargs=(worker_settings,)) as pool:
+        # imap keeps the machine order, so file outputs are identical for the same seed
+        results = pool.imap(generate_task, tasks) if args.mode != 'mongo' else pool.imap_unordered(generate_task, tasks)
+        if args.mode == 'mongo':
+            for task, (count, _) in zip(tasks, results):
+                progress.add(len(task), count)
+        elif args.mode == 'backup':
+            with open(args.output, 'wb') as f:
+                writer = backup_format.BackupWriter(f, backup_meta(stamp))
+                for name in ENTITY_COLLECTIONS:
+                    writer.add_collection(name)
+                    for block in backup_format.chunk_documents(entities[name]):
+                        writer.write_block(name, backup_format.encode_block(block), len(block))
+                writer.add_collection('readings')
+                for task, (count, blocks) in zip(tasks, results):
+                    for compressed, block_count in blocks:
+                        writer.write_block('readings', compressed, block_count)
+                    progress.add(len(task), count)
+                writer.add_collection('deleted')
+                writer.close()
+        elif args.mode == 'json':
+            with open(args.output, 'w', encoding='utf-8') as f:
+                header = dict(backup_meta(stamp), **{name: entities[name] for name in ENTITY_COLLECTIONS})
+                f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"readings":[')
+                first = True
+                for task, (count, chunk) in zip(tasks, results):
+                    if chunk:
+                        f.write(chunk if first else ',' + chunk)
+                        first = False
+                    progress.add(len(task), count)
+                f.write('],"deleted":[]}')
+        else:
+            output = Path(args.output)
+            output.mkdir(parents=True, exist_ok=True)
+            with open(output / 'cadastros.json', 'w', encoding='utf-8') as f:
+                json.dump(dict(backup_meta(stamp), **{name: entities[name] for name in ENTITY_COLLECTIONS}),
+                          f, ensure_ascii=False)
+            with open(output / 'leituras.csv', 'w', encoding='utf-8', newline='') as f:
+                f.write(','.join(CSV_HEADER) + '\n')
+                for task, (count, chunk) in zip(tasks, results):
+                    f.write(chunk)
+                    progress.add(len(task), count)
+    progress.finish()
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--seed', type=int, default=42)
+    common.add_argument('--regions', type=int, default=10)
+    common.add_argument('--clients', type=int, default=200)
+    common.add_argument('--operators', type=int, default=20)
+    common.add_argument('--machines', type=int, default=2000)
+    common.add_argument('--years', type=float, default=2, help='período de leituras em anos (padrão: 2)')
+    common.add_argument('--interval-days', type=int, default=7, help='dias entre leituras de uma máquina (padrão: 7)')
+    common.add_argument('--end-date', help='data da última leitura, AAAA-MM-DD (padrão: hoje)')
+    common.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    common.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    common.add_argument('--hot-days', type=int, default=int(os.environ.get('READINGS_HOT_DAYS', '180')),
+                        help='leituras mais antigas vão para o arquivo no modo mongo (padrão: $READINGS_HOT_DAYS ou 180)')
+
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos para o SlotManager')
+    modes = parser.add_subparsers(dest='mode', required=True)
+    mongo = modes.add_parser('mongo', parents=[common], help='insere direto no MongoDB')
+    mongo.add_argument('--mongo-url', default=os.environ.get('MONGO_URL'), help='padrão: $MONGO_URL')
+    mongo.add_argument('--db', default=os.environ.get('DB_NAME'), help='padrão: $DB_NAME')
+    mongo.add_argument('--drop', action='store_true', help='apaga as coleções existentes antes de carregar')
+    modes.add_parser('backup', parents=[common], help='backup binário (.smbk)').add_argument('output')
+    modes.add_parser('json', parents=[common], help='backup JSON').add_argument('output')
+    modes.add_parser('csv', parents=[common], help='cadastros.json + leituras.csv em uma pasta').add_argument('output')
+
+    args = parser.parse_args()
+    if args.mode == 'mongo' and not (args.mongo_url and args.db):
+        parser.error('informe --mongo-url e --db (ou $MONGO_URL e $DB_NAME)')
+    if min(args.regions, args.clients, args.machines, args.interval_days, args.workers) < 1:
+        parser.error('--regions, --clients, --machines, --interval-days e --workers devem ser maiores que zero')
+    generate(args)
+
+
+if __name__ == '__main__':
+    main()
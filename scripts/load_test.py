@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Teste de Carga - SlotManager
+Sobe a API no próprio processo (httpx + ASGITransport, sem servidor HTTP) contra
+um MongoDB local ou um banco em memória (mongomock-motor), cria uma frota
+sintética e dispara uma mistura de operações com vários clientes simultâneos.
+
+Ao final mostra vazão e p50/p95/p99 por endpoint e, com --output, grava um JSON
+que pode ser comparado com outra execução:
+
+    python3 scripts/load_test.py run --memory --duration 30 --output antes.json
+    python3 scripts/load_test.py run --mongo-url mongodb://localhost:27017 --mix office
+    python3 scripts/load_test.py compare antes.json depois.json
+
+Cliente e servidor dividem o mesmo event loop, então os números servem para
+comparar execuções entre si, não como capacidade absoluta do servidor.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from generate_data import MULTIPLIERS
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_DIR / 'backend'
+DEFAULT_DB = 'slotmanager_loadtest'
+
+# Weights per scenario; --weights overrides them
+MIXES = {
+    # collectors on their route submitting readings
+    'route': {'reading': 70, 'machine_report': 15, 'dashboard': 10, 'import': 5},
+    # back office browsing reports
+    'office': {'dashboard': 30, 'machine_report': 20, 'client_report': 20, 'region_report': 15, 'reading': 10, 'export': 5},
+    'mixed': {'reading': 40, 'dashboard': 15, 'machine_report': 15, 'client_report': 10, 'region_report': 8, 'import': 7, 'export': 5},
+}
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def load_app(args):
+    """Importa o servidor com o banco escolhido; o server.py lê o ambiente na importação."""
+    os.environ['MONGO_URL'] = args.mongo_url or 'mongodb://localhost:27017'
+    os.environ['DB_NAME'] = args.db
+    # The harness measures; the budget warnings would only add noise
+    os.environ.setdefault('QUERY_BUDGET_COUNT', '1000000')
+    os.environ.setdefault('QUERY_BUDGET_MS', '1000000')
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    if args.memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("❌ --memory requer o pacote mongomock-motor (pip install mongomock-motor)")
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db]
+    return server
+
+
+class Fleet:
+    """Ids criados no seed e o último medidor de cada máquina (leituras sempre crescentes)."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.regions = []
+        self.clients = []
+        self.operators = []
+        self.machines = []
+        self.meters = {}
+
+    def next_reading(self, machine_id, when=None):
+        previous_in, previous_out = self.meters.get(machine_id, (0.0, 0.0))
+        current_in = round(previous_in + self.rng.randint(50, 2000), 2)
+        current_out = round(previous_out + self.rng.randint(10, 1500), 2)
+        self.meters[machine_id] = (current_in, current_out)
+        reading = {
+            'machine_id': machine_id,
+            'previous_in': previous_in,
+            'previous_out': previous_out,
+            'current_in': current_in,
+            'current_out': current_out,
+        }
+        if when:
+            reading['reading_date'] = when.isoformat()
+        return reading
+
+
+def csv_rows(readings):
+    lines = ['machine_id,previous_in,previous_out,current_in,current_out,reading_date']
+    for r in readings:
+        lines.append(f"{r['machine_id']},{r['previous_in']},{r['previous_out']},{r['current_in']},{r['current_out']},{r.get('reading_date', '')}")
+    return '\n'.join(lines) + '\n'
+
+
+async def checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code} {response.text[:200]}")
+    return response.json()
+
+
+async def seed(http, fleet, args):
+    rng = fleet.rng
+    for i in range(args.regions):
+        region = await checked(await http.post('/api/regions', json={'name': f'Região {i + 1}'}))
+        fleet.regions.append(region['id'])
+    for i in range(args.operators):
+        operator = await checked(await http.post('/api/operators', json={
+            'name': f'Operador {i + 1}', 'commission_type': rng.choice(['percentage', 'fixed']),
+            'commission_value': rng.choice([5, 10, 15])}))
+        fleet.operators.append(operator['id'])
+    for i in range(args.clients):
+        client = await checked(await http.post('/api/clients', json={
+            'name': f'Cliente {i + 1}', 'commission_type': rng.choice(['percentage', 'fixed']),
+            'commission_value': rng.choice([10, 20, 30, 40])}))
+        fleet.clients.append(client['id'])
+
+    machines = [{
+        'code': f'LT{i + 1:05d}',
+        'name': f'Máquina {i + 1}',
+        'multiplier': rng.choice(MULTIPLIERS),
+        'client_id': rng.choice(fleet.clients),
+        'region_id': rng.choice(fleet.regions),
+        'operator_id': rng.choice(fleet.operators + [None]),
+    } for i in range(args.machines)]
+    for start in range(0, len(machines), 500):
+        created = await checked(await http.post('/api/machines/bulk', json=machines[start:start + 500]))
+        fleet.machines.extend(created['ids'])
+
+    # Reading history, oldest first so the meters keep growing
+    now = datetime.now(timezone.utc)
+    history = [fleet.next_reading(machine_id, now - timedelta(days=7 * (args.history - step)))
+               for step in range(args.history) for machine_id in fleet.machines]
+    for start in range(0, len(history), 1000):
+        csv = csv_rows(history[start:start + 1000])
+        await checked(await http.post('/api/readings/import', files={'file': ('seed.csv', csv, 'text/csv')}))
+
+
+# ---- scenarios: each returns the response of the request being measured ----
+
+async def scenario_reading(http, fleet):
+    return await http.post('/api/readings', json=fleet.next_reading(fleet.rng.choice(fleet.machines)))
+
+async def scenario_dashboard(http, fleet):
+    return await http.get('/api/reports/dashboard')
+
+async def scenario_machine_report(http, fleet):
+    return await http.get(f'/api/reports/by-machine/{fleet.rng.choice(fleet.machines)}')
+
+async def scenario_client_report(http, fleet):
+    return await http.get(f'/api/reports/by-client/{fleet.rng.choice(fleet.clients)}')
+
+async def scenario_region_report(http, fleet):
+    return await http.get(f'/api/reports/by-region/{fleet.rng.choice(fleet.regions)}')
+
+async def scenario_import(http, fleet):
+    rows = [fleet.next_reading(fleet.rng.choice(fleet.machines)) for _ in range(50)]
+    return await http.post('/api/readings/import', files={'file': ('carga.csv', csv_rows(rows), 'text/csv')})
+
+async def scenario_export(http, fleet):
+    return await http.get('/api/backup/export')
+
+SCENARIOS = {
+    'reading': scenario_reading,
+    'dashboard': scenario_dashboard,
+    'machine_report': scenario_machine_report,
+    'client_report': scenario_client_report,
+    'region_report': scenario_region_report,
+    'import': scenario_import,
+    'export': scenario_export,
+}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    # nearest rank
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for name, entries in sorted(samples.items()):
+        latencies = sorted(entry[0] for entry in entries)
+        errors = sum(1 for entry in entries if entry[1] >= 400)
+        queries = [entry[2] for entry in entries if entry[2] is not None]
+        endpoints[name] = {
+            'count': len(entries),
+            'errors': errors,
+            'rps': round(len(entries) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2),
+            'avg_queries': round(sum(queries) / len(queries), 1) if queries else None,
+        }
+    return endpoints
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_weights(args):
+    weights = dict(MIXES[args.mix])
+    if args.weights:
+        weights = {}
+        for item in args.weights.split(','):
+            name, _, weight = item.partition('=')
+            if name not in SCENARIOS:
+                sys.exit(f"❌ Cenário desconhecido: {name} (disponíveis: {', '.join(SCENARIOS)})")
+            weights[name] = float(weight or 1)
+    return weights
+
+
+async def run(args):
+    try:
+        import httpx
+    except ImportError:
+        sys.exit("❌ O teste de carga requer o pacote httpx (pip install httpx)")
+
+    server = load_app(args)
+    rng = random.Random(args.seed)
+    fleet = Fleet(rng)
+    weights = parse_weights(args)
+    names, scenario_weights = list(weights), list(weights.values())
+
+    if not args.memory:
+        existing = await server.db.list_collection_names()
+        if existing and not args.reset:
+            sys.exit(f"❌ O banco {args.db} já tem dados; use --reset para apagá-lo ou escolha outro --db")
+        if args.reset:
+            await server.client.drop_database(args.db)
+
+    await server.app.router.startup()
+    transport = httpx.ASGITransport(app=server.app)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', limits=limits, timeout=None) as http:
+            auth = await checked(await http.post('/api/auth/register', json={
+                'email': 'carga@example.com', 'name': 'Teste de Carga', 'password': 'loadtest'}))
+            http.headers['Authorization'] = f"Bearer {auth['access_token']}"
+
+            print(f"Criando frota: {args.machines} máquinas, {args.history} leituras de histórico por máquina...")
+            seed_started = time.perf_counter()
+            await seed(http, fleet, args)
+            print(f"✓ Frota criada em {time.perf_counter() - seed_started:.1f}s")
+
+            samples = {name: [] for name in names}
+            deadline = time.perf_counter() + args.duration
+            remaining = [args.requests]
+
+            async def worker():
+                while time.perf_counter() < deadline:
+                    if args.requests:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    name = rng.choices(names, weights=scenario_weights)[0]
+                    started = time.perf_counter()
+                    response = await SCENARIOS[name](http, fleet)
+                    latency = time.perf_counter() - started
+                    # mongomock issues no driver commands, so there is nothing to count in memory
+                    timing = None if args.memory else SERVER_TIMING_DB.search(response.headers.get('server-timing', ''))
+                    samples[name].append((latency, response.status_code, int(timing.group(2)) if timing else None))
+
+            print(f"Executando mix '{args.weights or args.mix}' com {args.concurrency} clientes por até {args.duration}s...")
+            started = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+            elapsed = time.perf_counter() - started
+    finally:
+        await server.app.router.shutdown()
+
+    endpoints = summarize({name: entries for name, entries in samples.items() if entries}, elapsed)
+    total = sum(endpoint['count'] for endpoint in endpoints.values())
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'config': {
+            'backend': 'memory' if args.memory else 'mongodb',
+            'mix': args.mix, 'weights': weights, 'concurrency': args.concurrency,
+            'duration': args.duration, 'requests': args.requests, 'seed': args.seed,
+            'regions': args.regions, 'clients': args.clients, 'operators': args.operators,
+            'machines': args.machines, 'history': args.history,
+        },
+        'elapsed_s': round(elapsed, 2),
+        'total_requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'endpoints': endpoints,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n✓ Resultados salvos em: {args.output}")
+
+
+def print_results(results):
+    print(f"\n{results['total_requests']} requisições em {results['elapsed_s']}s "
+          f"({results['throughput_rps']} req/s)\n")
+    print(f"{'endpoint':<16}{'qtd':>7}{'erros':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for name, e in results['endpoints'].items():
+        queries = '-' if e['avg_queries'] is None else e['avg_queries']
+        print(f"{name:<16}{e['count']:>7}{e['errors']:>7}{e['rps']:>9}{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{queries:>9}")
+
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    def change(before, after):
+        return (after - before) / before * 100 if before else 0.0
+
+    regressions = []
+    print(f"base: {baseline.get('git_commit')} ({baseline['throughput_rps']} req/s)  "
+          f"novo: {candidate.get('git_commit')} ({candidate['throughput_rps']} req/s)\n")
+    print(f"{'endpoint':<16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'req/s':>18}")
+    for name, before in baseline['endpoints'].items():
+        after = candidate['endpoints'].get(name)
+        if not after:
+            continue
+        cells = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rps'):
+            delta = change(before[metric], after[metric])
+            # Latency going up or throughput going down is a regression
+            worse = -delta if metric == 'rps' else delta
+            if worse > args.threshold:
+                regressions.append(f"{name} {metric}: {before[metric]} -> {after[metric]} ({delta:+.1f}%)")
+            cells.append(f"{after[metric]} ({delta:+.1f}%)")
+        print(f"{name:<16}" + ''.join(f"{cell:>18}" for cell in cells))
+
+    if regressions:
+        print(f"\n❌ Regressões acima de {args.threshold}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\n✓ Nenhuma regressão acima de {args.threshold}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga local da API do SlotManager')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='executa o teste de carga')
+    backend = run_parser.add_mutually_exclusive_group()
+    backend.add_argument('--mongo-url', default=os.environ.get('MONGO_URL'),
+                         help='MongoDB usado no teste (padrão: $MONGO_URL)')
+    backend.add_argument('--memory', action='store_true', help='usa um banco em memória (mongomock-motor)')
+    run_parser.add_argument('--db', default=DEFAULT_DB, help=f'nome do banco (padrão: {DEFAULT_DB})')
+    run_parser.add_argument('--reset', action='store_true', help='apaga o banco antes de começar')
+    run_parser.add_argument('--mix', choices=sorted(MIXES), default='mixed')
+    run_parser.add_argument('--weights', help='pesos próprios, ex.: reading=5,dashboard=1')
+    run_parser.add_argument('--concurrency', type=int, default=10)
+    run_parser.add_argument('--duration', type=float, default=30, help='segundos de execução')
+    run_parser.add_argument('--requests', type=int, default=0, help='para após N requisições (0 = só pelo tempo)')
+    run_parser.add_argument('--regions', type=int, default=5)
+    run_parser.add_argument('--clients', type=int, default=20)
+    run_parser.add_argument('--operators', type=int, default=5)
+    run_parser.add_argument('--machines', type=int, default=200)
+    run_parser.add_argument('--history', type=int, default=10, help='leituras de histórico por máquina')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', help='grava os resultados em JSON')
+
+    compare_parser = commands.add_parser('compare', help='compara dois resultados salvos')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='variação percentual considerada regressão (padrão: 10)')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare(args)
+    else:
+        if not args.memory and not args.mongo_url:
+            parser.error('informe --mongo-url (ou $MONGO_URL) ou use --memory')
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
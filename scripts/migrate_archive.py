@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Migração do arquivo de leituras - SlotManager
+Move o readings_archive de uma coleção comum para uma coleção time-series
+(READINGS_STORAGE=timeseries, MongoDB 7.0+). Rode com a API parada: enquanto
+a cópia não termina, parte das leituras arquivadas fica fora de
+relatórios, backups e sincronização.
+
+    python3 scripts/migrate_archive.py --mongo-url mongodb://localhost:27017 --db slotmanager
+
+Coleções time-series não podem ser renomeadas, então o arquivo comum vira
+readings_archive_legacy e é copiado em lotes; um lote só sai dele depois de
+gravado no novo, então uma execução interrompida continua de onde parou. As
+leituras copiadas recebem um novo updated_at para entrar no próximo backup
+delta. Os rollups diários não mudam: as leituras são as mesmas.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+async def migrate(server, batch_size):
+    db = server.db
+    version = tuple((await server.client.server_info())["versionArray"][:2])
+    if version < (7, 0):
+        sys.exit("❌ Coleções time-series com remoção por id precisam do MongoDB 7.0 ou mais novo")
+
+    existing = {c["name"]: c async for c in await db.list_collections(
+        filter={"name": {"$in": ["readings_archive", "readings_archive_legacy"]}})}
+    archive = existing.get("readings_archive")
+    if archive and archive.get("type") != "timeseries":
+        if "readings_archive_legacy" in existing:
+            sys.exit("❌ readings_archive e readings_archive_legacy são coleções comuns; junte as duas antes")
+        await db.readings_archive.rename("readings_archive_legacy")
+        print("readings_archive renomeada para readings_archive_legacy")
+        archive = None
+    if not archive:
+        await db.create_collection("readings_archive", timeseries=server.ARCHIVE_TIMESERIES_OPTIONS)
+        print("readings_archive criada como time-series")
+
+    total = await db.readings_archive_legacy.count_documents({})
+    moved = 0
+    started = time.perf_counter()
+    while True:
+        batch = await db.readings_archive_legacy.find({}).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        await server.write_archive([server.stamp(reading) for reading in batch])
+        await db.readings_archive_legacy.delete_many({"_id": {"$in": [r["_id"] for r in batch]}})
+        moved += len(batch)
+        print(f"   {moved}/{total} leituras copiadas", end="\r")
+    await db.readings_archive_legacy.drop()
+    print(f"\n✓ {moved} leituras migradas em {time.perf_counter() - started:.1f}s")
+    print("Agora suba a API com READINGS_STORAGE=timeseries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migra o arquivo de leituras para uma coleção time-series')
+    parser.add_argument('--mongo-url', default=os.environ.get('MONGO_URL'), help='padrão: $MONGO_URL')
+    parser.add_argument('--db', default=os.environ.get('DB_NAME'), help='padrão: $DB_NAME')
+    parser.add_argument('--batch-size', type=int, default=5000, help='leituras por lote (padrão: 5000)')
+    args = parser.parse_args()
+    if not (args.mongo_url and args.db):
+        parser.error('informe --mongo-url e --db (ou $MONGO_URL e $DB_NAME)')
+
+    os.environ['MONGO_URL'] = args.mongo_url
+    os.environ['DB_NAME'] = args.db
+    os.environ['READINGS_STORAGE'] = 'timeseries'
+    sys.path.insert(0, str(ROOT_DIR / 'backend'))
+    import server  # noqa: E402  (reads the connection and storage settings from the environment on import)
+
+    async def run():
+        try:
+            await migrate(server, args.batch_size)
+        finally:
+            server.client.close()
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Replica set local - SlotManager
+Sobe um replica set de teste com processos mongod locais (um primário e
+secundários), para experimentar o roteamento de leituras por carga
+(READ_PREFERENCE_REPORTS, READ_PREFERENCE_EXPORTS, READ_PREFERENCE_SEARCH e
+READ_MAX_STALENESS_SECONDS) e os eventos ao vivo por change stream sem
+precisar de um cluster:
+
+    python3 scripts/replica_set.py start                  # 3 membros em 27101-27103
+    python3 scripts/replica_set.py start --delay 120      # último secundário 120 s atrasado
+    READ_PREFERENCE_REPORTS=secondaryPreferred python3 scripts/replica_set.py check
+    python3 scripts/replica_set.py stop --clean
+
+O `start` mostra o MONGO_URL a usar no backend. O `check` importa o servidor
+com as mesmas variáveis de ambiente e mostra qual membro respondeu a cada
+carga, com o atraso de cada secundário. Com --delay, o membro atrasado deve
+sumir das leituras quando READ_MAX_STALENESS_SECONDS for menor que o atraso.
+
+Precisa do mongod no PATH (ou em --mongod).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DIR = Path(tempfile.gettempdir()) / 'slotmanager-replica-set'
+REPLICA_SET = 'rs-slotmanager'
+STATE_FILE = 'state.json'
+
+
+def member_command(port, command, *args):
+    with MongoClient(f'mongodb://127.0.0.1:{port}', directConnection=True, serverSelectionTimeoutMS=1000) as client:
+        return client.admin.command(command, *args)
+
+
+def wait_for(condition, timeout, message):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except PyMongoError:
+            pass
+        time.sleep(0.5)
+    sys.exit(f"❌ {message}")
+
+
+def replica_url(ports):
+    hosts = ','.join(f'127.0.0.1:{port}' for port in ports)
+    return f'mongodb://{hosts}/?replicaSet={REPLICA_SET}'
+
+
+def start(args):
+    base = Path(args.dir)
+    state_path = base / STATE_FILE
+    if state_path.exists():
+        sys.exit(f"❌ Já existe um replica set em {base}; use stop antes")
+    mongod = args.mongod or shutil.which('mongod')
+    if not mongod:
+        sys.exit("❌ mongod não encontrado no PATH (informe --mongod)")
+
+    ports = [args.port + i for i in range(args.members)]
+    pids = []
+    for port in ports:
+        path = base / str(port)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / 'mongod.log', 'ab') as log:
+            process = subprocess.Popen(
+                [mongod, '--replSet', REPLICA_SET, '--port', str(port), '--dbpath', str(path),
+                 '--bind_ip', '127.0.0.1', '--oplogSize', '128'],
+                stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+            )
+        pids.append(process.pid)
+    state_path.write_text(json.dumps({'ports': ports, 'pids': pids}), encoding='utf-8')
+
+    for port in ports:
+        wait_for(lambda: member_command(port, 'ping'), 30, f"mongod na porta {port} não respondeu")
+        print(f"  mongod 127.0.0.1:{port} no ar")
+
+    members = []
+    for i, port in enumerate(ports):
+        member = {'_id': i, 'host': f'127.0.0.1:{port}', 'priority': 2 if i == 0 else 1}
+        if args.delay and i == len(ports) - 1 and i > 0:
+            # Delayed members can never become primary; it stays visible so reads can pick it
+            member.update(priority=0, secondaryDelaySecs=args.delay)
+        members.append(member)
+    try:
+        member_command(ports[0], 'replSetInitiate', {'_id': REPLICA_SET, 'members': members})
+    except OperationFailure as e:
+        if e.code != 23:  # AlreadyInitialized
+            raise
+    wait_for(lambda: member_command(ports[0], 'hello').get('isWritablePrimary'), 60,
+             "o primário não foi eleito a tempo")
+
+    print(f"\n✓ Replica set {REPLICA_SET} pronto com {len(ports)} membros")
+    if args.delay and len(ports) > 1:
+        print(f"  127.0.0.1:{ports[-1]} replica com {args.delay} s de atraso")
+    print(f"\n  MONGO_URL=\"{replica_url(ports)}\"")
+
+
+def stop(args):
+    base = Path(args.dir)
+    state_path = base / STATE_FILE
+    if not state_path.exists():
+        sys.exit(f"❌ Nenhum replica set iniciado em {base}")
+    state = json.loads(state_path.read_text(encoding='utf-8'))
+    for pid in state['pids']:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            continue
+    for port in state['ports']:
+        wait_for(lambda: not port_open(port), 30, f"mongod na porta {port} não parou")
+    state_path.unlink()
+    if args.clean:
+        shutil.rmtree(base)
+    print("✓ Replica set parado" + (" e dados removidos" if args.clean else ""))
+
+
+def port_open(port):
+    try:
+        member_command(port, 'ping')
+        return True
+    except PyMongoError:
+        return False
+
+
+async def show_routing(server):
+    status = await server.client.admin.command('replSetGetStatus')
+    primary = next((m for m in status['members'] if m['stateStr'] == 'PRIMARY'), None)
+    print(f"  {'membro':<20}{'estado':<12}{'atraso':>8}")
+    for member in status['members']:
+        lag = (primary['optimeDate'] - member['optimeDate']).total_seconds() if primary else 0
+        print(f"  {member['name']:<20}{member['stateStr']:<12}{lag:>7.0f}s")
+
+    print(f"\n  {'carga':<10}{'preferência':<62}membro")
+    for workload in server.READ_WORKLOADS:
+        cursor = server.reads(workload).tombstones.find({}).limit(1)
+        await cursor.to_list(1)
+        host, port = cursor.address
+        role = 'primário' if primary and primary['name'] == f'{host}:{port}' else 'secundário'
+        print(f"  {workload:<10}{str(server.READ_PREFERENCES[workload]):<62}{host}:{port} ({role})")
+
+
+def check(args):
+    base = Path(args.dir)
+    mongo_url = args.mongo_url
+    if not mongo_url:
+        state_path = base / STATE_FILE
+        if not state_path.exists():
+            sys.exit(f"❌ Nenhum replica set iniciado em {base} (ou informe --mongo-url)")
+        mongo_url = replica_url(json.loads(state_path.read_text(encoding='utf-8'))['ports'])
+    os.environ['MONGO_URL'] = mongo_url
+    os.environ.setdefault('DB_NAME', 'slotmanager')
+    sys.path.insert(0, str(ROOT_DIR / 'backend'))
+    import server  # noqa: E402  (reads READ_PREFERENCE_* from the environment on import)
+
+    async def run():
+        try:
+            await show_routing(server)
+        finally:
+            server.client.close()
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replica set local para testes do SlotManager')
+    parser.add_argument('--dir', default=str(DEFAULT_DIR), help=f'pasta dos dados (padrão: {DEFAULT_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start_parser = commands.add_parser('start', help='sobe e inicia o replica set')
+    start_parser.add_argument('--members', type=int, default=3)
+    start_parser.add_argument('--port', type=int, default=27101, help='porta do primeiro membro (padrão: 27101)')
+    start_parser.add_argument('--delay', type=int, default=0, help='segundos de atraso do último secundário')
+    start_parser.add_argument('--mongod', help='caminho do binário mongod')
+
+    stop_parser = commands.add_parser('stop', help='para os processos mongod')
+    stop_parser.add_argument('--clean', action='store_true', help='apaga também os dados')
+
+    check_parser = commands.add_parser('check', help='mostra qual membro atende cada carga de leitura')
+    check_parser.add_argument('--mongo-url', help='padrão: o replica set iniciado em --dir')
+
+    args = parser.parse_args()
+    {'start': start, 'stop': stop, 'check': check}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared fixtures. Tests that need a database take `run`, which runs a scenario
+in one event loop against a fresh database patched into `server`: the MongoDB
+at $TEST_MONGO_URL when it is set, mongomock otherwise. `api` makes HTTP
+clients on the app, already authenticated.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'slotmanager_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+import server  # noqa: E402  (the Motor client connects lazily, no database is needed)
+
+TEST_MONGO_URL = os.environ.get('TEST_MONGO_URL')
+TEST_USER = {"id": "test-user", "email": "test@example.com", "name": "Test"}
+
+
+def add_union_with():
+    """mongomock has no $unionWith (MongoDB 4.4+), which the leaderboards rely on."""
+    from mongomock import aggregate
+
+    def union_with(docs, database, options):
+        if isinstance(options, str):
+            options = {"coll": options}
+        other = list(database.get_collection(options["coll"]).find({}))
+        return list(docs) + list(aggregate.process_pipeline(other, database, options.get("pipeline", []), None))
+
+    aggregate._PIPELINE_HANDLERS.setdefault("$unionWith", union_with)
+
+
+def make_client():
+    if TEST_MONGO_URL:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(TEST_MONGO_URL)
+    from mongomock_motor import AsyncMongoMockClient
+    add_union_with()
+    return AsyncMongoMockClient()
+
+
+@pytest.fixture
+def api():
+    return lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+
+
+@pytest.fixture
+def run(monkeypatch):
+    monkeypatch.setitem(server.app.dependency_overrides, server.get_current_user, lambda: TEST_USER)
+
+    def runner(scenario):
+        async def main():
+            client = make_client()
+            name = f"slotmanager_test_{uuid.uuid4().hex[:12]}"
+            monkeypatch.setattr(server, "client", client)
+            monkeypatch.setattr(server, "db", client[name])
+            try:
+                return await scenario()
+            finally:
+                if TEST_MONGO_URL:
+                    await client.drop_database(name)
+                client.close()
+        return asyncio.run(main())
+    return runner
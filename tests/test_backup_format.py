@@ -0,0 +1,122 @@
+import io
+import struct
+import zlib
+
+import pytest
+
+import backup_format  # on sys.path through conftest.py
+import server
+
+BACKUP = {
+    "kind": "full",
+    "since": None,
+    "regions": [{"id": f"r{i}", "name": f"Região {i}"} for i in range(5)],
+    "clients": [{"id": "c1", "name": "Bar", "commission_value": 12.5}],
+}
+
+
+def binary(backup=BACKUP, collections=("regions", "clients")) -> bytes:
+    output = io.BytesIO()
+    backup_format.from_json(backup, output, collections)
+    return output.getvalue()
+
+
+def with_manifest(manifest: bytes) -> bytes:
+    offset = len(backup_format.MAGIC)
+    trailer = backup_format._TRAILER.pack(offset, len(manifest), zlib.crc32(manifest))
+    return backup_format.MAGIC + manifest + trailer + backup_format.MAGIC
+
+
+def test_round_trip(monkeypatch):
+    monkeypatch.setattr(backup_format, "BLOCK_DOCS", 2)
+    content = binary()
+    manifest = backup_format.read_manifest(io.BytesIO(content))
+    assert [len(c["blocks"]) for c in manifest["collections"].values()] == [3, 1]
+    assert backup_format.to_json(io.BytesIO(content)) == BACKUP
+    assert backup_format.verify(io.BytesIO(content))["valid"]
+
+
+def test_flipped_byte_is_reported_without_raising():
+    content = bytearray(binary())
+    content[len(backup_format.MAGIC) + 3] ^= 0xFF
+    report = backup_format.verify(io.BytesIO(bytes(content)))
+    assert not report["valid"]
+    assert report["errors"] == ["regions: Block at offset 5 is corrupted"]
+    assert report["collections"]["clients"] == {"blocks": 1, "documents": 1, "expected": 1}
+
+
+def test_block_count_mismatch_is_reported():
+    output = io.BytesIO()
+    writer = backup_format.BackupWriter(output, {"kind": "full"})
+    writer.write_block("regions", backup_format.encode_block(BACKUP["regions"]), 4)
+    writer.close()
+    report = backup_format.verify(io.BytesIO(output.getvalue()))
+    assert report["errors"] == ["regions: block at offset 5 has 5 documents, expected 4"]
+    assert report["collections"]["regions"] == {"blocks": 1, "documents": 5, "expected": 4}
+
+
+@pytest.mark.parametrize("length", [len(backup_format.MAGIC), 12, len(backup_format.MAGIC) + backup_format._TRAILER.size])
+def test_truncated_file(length):
+    with pytest.raises(backup_format.BackupFormatError, match="Truncated backup"):
+        backup_format.read_manifest(io.BytesIO(binary()[:length]))
+
+
+def test_cut_trailer():
+    with pytest.raises(backup_format.BackupFormatError):
+        backup_format.verify(io.BytesIO(binary()[:-3]))
+
+
+def test_corrupt_manifest():
+    with pytest.raises(backup_format.BackupFormatError, match="not valid JSON"):
+        backup_format.read_manifest(io.BytesIO(with_manifest(b'{"format": "slotmanager-bac')))
+    with pytest.raises(backup_format.BackupFormatError, match="Unsupported"):
+        backup_format.read_manifest(io.BytesIO(with_manifest(b'[1, 2]')))
+
+
+def test_wrong_file():
+    with pytest.raises(backup_format.BackupFormatError, match="Not a SlotManager"):
+        backup_format.read_manifest(io.BytesIO(b"PK\x03\x04" + struct.pack("<Q", 0)))
+
+
+def test_damaged_uploads_are_rejected_with_400(run, api):
+    good = binary()
+    flipped = bytearray(good)
+    flipped[len(backup_format.MAGIC) + 3] ^= 0xFF
+
+    async def scenario():
+        async with api() as http:
+            await http.post("/api/regions", json={"name": "Existente"})
+            verified = await http.post("/api/backup/verify", files={"file": ("a.smbk", good[:10])})
+            responses = [
+                await http.post("/api/backup/restore/binary", params={"drop_existing": True},
+                                files=[("files", (f"{n}.smbk", content))])
+                for n, content in (("truncated", good[:10]), ("flipped", bytes(flipped)), ("manifest", with_manifest(b"{")))
+            ]
+            return verified, responses, await server.db.regions.count_documents({})
+
+    verified, responses, regions = run(scenario)
+    assert verified.status_code == 200
+    assert verified.json()["valid"] is False and verified.json()["errors"] == ["Truncated backup"]
+    assert [r.status_code for r in responses] == [400, 400, 400]
+    assert responses[0].json()["detail"] == "truncated.smbk: Truncated backup"
+    assert responses[1].json()["detail"] == "flipped.smbk: regions: Block at offset 5 is corrupted"
+    assert regions == 1
+
+
+def test_binary_export_restores(run, api, monkeypatch):
+    monkeypatch.setattr(server, "CHANGES_SAFETY_LAG_SECONDS", 0)
+
+    async def scenario():
+        async with api() as http:
+            for name in ("Norte", "Sul"):
+                await http.post("/api/regions", json={"name": name})
+            exported = await http.get("/api/backup/export/binary")
+            await server.db.regions.delete_many({})
+            restored = await http.post("/api/backup/restore/binary", files=[("files", ("full.smbk", exported.content))])
+            return exported, restored.json(), await server.db.regions.find({}, {"_id": 0, "name": 1}).to_list(None)
+
+    exported, restored, regions = run(scenario)
+    report = backup_format.verify(io.BytesIO(exported.content))
+    assert report["valid"] and report["meta"]["kind"] == "full"
+    assert restored["applied"][0]["regions"] == 2
+    assert sorted(r["name"] for r in regions) == ["Norte", "Sul"]
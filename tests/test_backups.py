@@ -0,0 +1,152 @@
+import pytest
+from fastapi import HTTPException
+
+import server  # on sys.path through conftest.py
+
+TS = "2026-01-01T00:00:00.000000+00:00"
+
+
+def client_doc(client_id, updated_at=TS, name=None):
+    return {"id": client_id, "name": name or client_id, "commission_type": "percentage", "commission_value": 10.0,
+            "created_at": TS, "updated_at": updated_at}
+
+
+async def dump(since=None, collections=("clients",)):
+    backup = server.BackupDump(since, list(collections))
+    sections = {}
+    async for name, batches in backup.sections():
+        sections[name] = [doc for batch in [b async for b in batches] for doc in batch]
+    return sections, server.encode_watermark(backup.watermark), backup.watermark
+
+
+@pytest.fixture
+def no_lag(monkeypatch):
+    monkeypatch.setattr(server, "CHANGES_SAFETY_LAG_SECONDS", 0)
+
+
+def test_delta_carries_updates_and_deletes_and_restores(run, api, no_lag):
+    async def scenario():
+        async with api() as http:
+            client = (await http.post("/api/clients", json={"name": "Bar", "commission_type": "percentage", "commission_value": 10})).json()
+            operator = (await http.post("/api/operators", json={"name": "Ana", "commission_type": "fixed", "commission_value": 5})).json()
+            link = (await http.post("/api/links", json={"client_id": client["id"], "operator_id": operator["id"]})).json()
+            full = (await http.get("/api/backup/export")).json()
+
+            await http.put(f"/api/clients/{client['id']}", json={"name": "Bar Novo", "commission_type": "percentage", "commission_value": 10})
+            await http.delete(f"/api/links/{link['id']}")
+            delta = (await http.get("/api/backup/export", params={"since": full["watermark_token"]})).json()
+
+            restored = await http.post("/api/backup/restore", json={"backups": [full, delta], "drop_existing": True})
+            clients = await server.db.clients.find({}, {"_id": 0}).to_list(None)
+            links = await server.db.links.count_documents({})
+            return full, delta, restored.json(), clients, links
+
+    full, delta, restored, clients, links = run(scenario)
+    assert full["kind"] == "full" and len(full["links"]) == 1 and full["deleted"] == []
+    assert delta["kind"] == "delta" and delta["since"] == full["watermark_token"]
+    assert [c["name"] for c in delta["clients"]] == ["Bar Novo"]
+    assert delta["operators"] == [] and delta["links"] == []
+    assert [(t["collection"], t["entity_id"]) for t in delta["deleted"]] == [("links", full["links"][0]["id"])]
+    assert restored["applied"][1]["deleted"] == 1
+    assert [c["name"] for c in clients] == ["Bar Novo"] and links == 0
+
+
+def test_restore_chain_must_apply_in_order():
+    full = {"kind": "full", "watermark_token": "t0"}
+    first = {"kind": "delta", "since": "t0", "watermark_token": "t1"}
+    second = {"kind": "delta", "since": "t1", "watermark_token": "t2"}
+    server.validate_restore_chain([full, first, second])
+
+    for chain in ([full, second], [full, second, first], [first, second], []):
+        with pytest.raises(HTTPException) as error:
+            server.validate_restore_chain(chain)
+        assert error.value.status_code == 400
+
+
+def test_broken_chain_is_rejected_before_anything_changes(run, api, no_lag):
+    async def scenario():
+        async with api() as http:
+            await http.post("/api/regions", json={"name": "Norte"})
+            full = (await http.get("/api/backup/export")).json()
+            await http.post("/api/regions", json={"name": "Sul"})
+            first = (await http.get("/api/backup/export", params={"since": full["watermark_token"]})).json()
+            second = (await http.get("/api/backup/export", params={"since": first["watermark_token"]})).json()
+            response = await http.post("/api/backup/restore", json={"backups": [full, second], "drop_existing": True})
+            return response, await server.db.regions.count_documents({})
+
+    response, regions = run(scenario)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Backup 1 does not continue the chain"
+    assert regions == 2
+
+
+def test_documents_sharing_a_timestamp_are_split_by_id(run, no_lag):
+    async def scenario():
+        await server.db.clients.insert_many([client_doc(i) for i in ("a", "b", "c")])
+        full, token, watermark = await dump()
+        # Committed late with the same timestamp, but a larger id
+        await server.db.clients.insert_one(client_doc("d"))
+        delta, _, _ = await dump(token)
+        from_b = await server.db.clients.find(server.changed_since_filter({"ts": TS, "id": "b"})).to_list(None)
+        return full, watermark, delta, from_b
+
+    full, watermark, delta, from_b = run(scenario)
+    assert [c["id"] for c in full["clients"]] == ["a", "b", "c"]
+    assert watermark["clients"] == {"ts": TS, "id": "c"}
+    assert [c["id"] for c in delta["clients"]] == ["d"]
+    assert sorted(c["id"] for c in from_b) == ["c", "d"]
+
+
+def test_changes_inside_the_safety_lag_are_sent_again_and_absorbed(run, api, monkeypatch):
+    monkeypatch.setattr(server, "CHANGES_SAFETY_LAG_SECONDS", 60)
+
+    async def scenario():
+        async with api() as http:
+            await http.post("/api/clients", json={"name": "Bar", "commission_type": "fixed", "commission_value": 5})
+            full = (await http.get("/api/backup/export")).json()
+            delta = (await http.get("/api/backup/export", params={"since": full["watermark_token"]})).json()
+            restored = (await http.post("/api/backup/restore", json={"backups": [full, delta], "drop_existing": True})).json()
+            return full, delta, restored, await server.db.clients.count_documents({})
+
+    full, delta, restored, clients = run(scenario)
+    assert full["watermark"]["clients"]["ts"] < full["clients"][0]["updated_at"]
+    assert full["watermark"]["clients"]["id"] == ""
+    assert [c["id"] for c in delta["clients"]] == [c["id"] for c in full["clients"]]
+    assert [applied["clients"] for applied in restored["applied"]] == [1, 1]
+    assert clients == 1
+
+
+def test_marks_never_move_back_or_past_the_horizon():
+    horizon = {"ts": "2026-01-01T00:01:00", "id": ""}
+    assert server.hold_back(None, {"ts": "2026-01-01T00:00:30", "id": "x"}, horizon) == {"ts": "2026-01-01T00:00:30", "id": "x"}
+    assert server.hold_back(None, {"ts": "2026-01-01T00:02:00", "id": "x"}, horizon) == horizon
+    previous = {"ts": "2026-01-01T00:05:00", "id": "y"}
+    assert server.hold_back(previous, {"ts": "2026-01-01T00:06:00", "id": "z"}, horizon) == previous
+    assert server.hold_back(previous, None, horizon) == previous
+
+
+def test_collections_are_read_concurrently(run, monkeypatch):
+    started = []
+
+    async def fake_dump(collection, mark, ts_field="updated_at", database=None, session=None):
+        started.append(collection)
+        for n in range(3):
+            yield [{"id": f"{collection}-{n}", ts_field: TS}]
+
+    monkeypatch.setattr(server, "dump_collection", fake_dump)
+
+    async def scenario():
+        collections = ["regions", "clients", "machines"]
+        backup = server.BackupDump(None, collections)
+        order = []
+        async for name, batches in backup.sections():
+            async for batch in batches:
+                order.append(batch[0]["id"])
+            if name == "regions":
+                seen = list(started)
+        return order, seen, backup.watermark
+
+    order, seen, watermark = run(scenario)
+    assert seen == ["regions", "clients", "machines"]
+    assert order == [f"{c}-{n}" for c in ("regions", "clients", "machines") for n in range(3)]
+    assert watermark["machines"] == {"ts": TS, "id": "machines-2"}
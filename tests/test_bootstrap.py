@@ -0,0 +1,66 @@
+import asyncio
+
+import server  # on sys.path through conftest.py
+
+
+async def bootstrap(http, etag=None, **params):
+    return await http.get("/api/bootstrap", params=params, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_unchanged_data_answers_304(run, api):
+    async def scenario():
+        async with api() as http:
+            await http.post("/api/regions", json={"name": "Norte"})
+            first = await bootstrap(http)
+            etag = first.headers["etag"]
+            return first, etag, await bootstrap(http, etag), await bootstrap(http, f'W/{etag}, "other"'), await bootstrap(http, "*")
+
+    first, etag, again, weak, star = run(scenario)
+    assert first.status_code == 200 and [r["name"] for r in first.json()["regions"]] == ["Norte"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert [r.status_code for r in (again, weak, star)] == [304, 304, 304]
+    assert again.content == b"" and again.headers["etag"] == etag
+
+
+def test_reference_data_changes_move_the_etag(run, api):
+    async def scenario():
+        async with api() as http:
+            region = (await http.post("/api/regions", json={"name": "Norte"})).json()
+            etags = [(await bootstrap(http)).headers["etag"]]
+            await http.post("/api/regions", json={"name": "Sul"})
+            etags.append((await bootstrap(http)).headers["etag"])
+            await http.put(f"/api/regions/{region['id']}", json={"name": "Norte Novo"})
+            etags.append((await bootstrap(http)).headers["etag"])
+            await http.delete(f"/api/regions/{region['id']}")
+            while server.running_jobs:
+                await asyncio.gather(*list(server.running_jobs))
+            after_delete = await bootstrap(http, etags[-1])
+            return etags, after_delete
+
+    etags, after_delete = run(scenario)
+    assert len(set(etags)) == 3
+    assert after_delete.status_code == 200 and after_delete.headers["etag"] not in etags
+    assert [r["name"] for r in after_delete.json()["regions"]] == ["Sul"]
+
+
+def test_meters_have_their_own_etag(run, api):
+    async def scenario():
+        await server.db.machines.insert_one({"id": "m1", "name": "M1", "updated_at": "2026-01-01T00:00:00+00:00"})
+        async with api() as http:
+            plain, meters = await bootstrap(http), await bootstrap(http, include_meters=True)
+            await server.db.readings.insert_one({
+                "id": "r1", "machine_id": "m1", "current_in": 10, "current_out": 4,
+                "reading_date": "2026-10-01T10:00:00+00:00", "updated_at": "2026-10-01T10:00:00+00:00",
+            })
+            plain_after = await bootstrap(http, plain.headers["etag"])
+            meters_after = await bootstrap(http, meters.headers["etag"], include_meters=True)
+            return plain, meters, plain_after, meters_after
+
+    plain, meters, plain_after, meters_after = run(scenario)
+    assert plain.headers["etag"] != meters.headers["etag"]
+    assert "meters" not in plain.json() and meters.json()["meters"] == {}
+    # A new reading only touches the payload that carries meters
+    assert plain_after.status_code == 304
+    assert meters_after.status_code == 200
+    assert meters_after.json()["meters"]["m1"] == {
+        "reading_id": "r1", "current_in": 10, "current_out": 4, "reading_date": "2026-10-01T10:00:00+00:00"}
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+import server  # on sys.path through conftest.py
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(server, "CASCADE_BATCH_SIZE", 2)
+
+
+async def finish_jobs():
+    while server.running_jobs:
+        await asyncio.gather(*list(server.running_jobs))
+
+
+def entity(entity_id, **fields):
+    return {"id": entity_id, "name": entity_id, "commission_type": "percentage", "commission_value": 10.0,
+            "created_at": "2026-01-01T00:00:00+00:00", "updated_at": "2026-01-01T00:00:00+00:00", **fields}
+
+
+def reading(reading_id, machine_id, day="2026-10-01"):
+    return {"id": reading_id, "machine_id": machine_id, "reading_date": f"{day}T10:00:00+00:00", "gross_cents": 1000,
+            "client_commission_cents": 100, "operator_commission_cents": 0, "net_cents": 900}
+
+
+async def seed():
+    await server.db.regions.insert_many([entity("north"), entity("south")])
+    await server.db.clients.insert_many([entity("bar"), entity("pub")])
+    await server.db.operators.insert_many([entity("ana"), entity("rui")])
+    await server.db.machines.insert_many(
+        [entity(f"n{i}", client_id="bar", region_id="north", operator_id="ana") for i in range(5)]
+        + [entity("s0", client_id="pub", region_id="south", operator_id="rui")]
+    )
+    await server.db.links.insert_many([
+        {"id": "bar-ana", "client_id": "bar", "operator_id": "ana"},
+        {"id": "bar-rui", "client_id": "bar", "operator_id": "rui"},
+        {"id": "pub-rui", "client_id": "pub", "operator_id": "rui"},
+    ])
+    await server.db.readings.insert_many([reading(f"{m}-hot", m) for m in ("n0", "n1", "n2", "n3", "n4", "s0")])
+    archived = [reading(f"{m}-old", m, "2020-01-15") for m in ("n0", "n4", "s0")]
+    await server.write_archive(archived)
+    await server.refresh_rollups(archived)
+
+
+async def tombstones(collection):
+    return sorted(await server.db.tombstones.distinct("entity_id", {"collection": collection}))
+
+
+def test_reassigning_a_client_moves_its_machines_and_links(run, api):
+    async def scenario():
+        await seed()
+        async with api() as http:
+            response = await http.delete("/api/clients/bar", params={"reassign_to": "pub"})
+            await finish_jobs()
+            job = (await http.get(f"/api/jobs/{response.json()['job_id']}")).json()
+        machines = {m["id"]: m["client_id"] for m in await server.db.machines.find({}, {"_id": 0}).to_list(None)}
+        links = sorted((link["client_id"], link["operator_id"]) for link in await server.db.links.find({}).to_list(None))
+        return job, machines, links, await server.db.readings.count_documents({}), await tombstones("links")
+
+    job, machines, links, readings, deleted_links = run(scenario)
+    assert job["status"] == "completed"
+    assert job["result"]["reassigned"] == {"machines": 5, "links": 1}
+    assert set(machines.values()) == {"pub"}
+    # pub already had rui, so bar's copy of that pair is dropped instead of duplicated
+    assert links == [("pub", "ana"), ("pub", "rui")]
+    assert deleted_links == ["bar-rui"]
+    assert readings == 6
+
+
+def test_reassigning_to_a_missing_client_is_rejected(run, api):
+    async def scenario():
+        await seed()
+        async with api() as http:
+            response = await http.delete("/api/clients/bar", params={"reassign_to": "bar"})
+        return response, await server.db.clients.count_documents({})
+
+    response, clients = run(scenario)
+    assert response.status_code == 400 and clients == 2
+
+
+def test_deleting_a_region_cascades_to_machines_and_readings(run, api):
+    async def scenario():
+        await seed()
+        async with api() as http:
+            response = await http.delete("/api/regions/north")
+            await finish_jobs()
+            job = (await http.get(f"/api/jobs/{response.json()['job_id']}")).json()
+        left = {name: await server.db[name].distinct("id") for name in ("machines", "readings", "readings_archive")}
+        rollups = await server.db.reading_rollups.distinct("machine_id")
+        monthly = await server.db.reading_rollups_monthly.distinct("machine_id")
+        return job, left, rollups, monthly, await tombstones("machines"), await tombstones("readings")
+
+    job, left, rollups, monthly, machine_tombstones, reading_tombstones = run(scenario)
+    assert job["status"] == "completed"
+    assert job["result"]["deleted"] == {"machines": 5, "readings": 7, "reading_rollups": 2}
+    assert left == {"machines": ["s0"], "readings": ["s0-hot"], "readings_archive": ["s0-old"]}
+    assert rollups == ["s0"] and monthly == ["s0"]
+    assert machine_tombstones == [f"n{i}" for i in range(5)]
+    assert len(reading_tombstones) == 7
+
+
+def test_an_interrupted_job_is_resumed_once_its_lease_lapses(run):
+    async def scenario():
+        await seed()
+        # A worker died after the first batch: n0 and n1 are gone with their readings
+        progress = server.JobProgress("partial")
+        await server.db.regions.delete_one({"id": "north"})
+        await server.delete_readings_cascade(["n0", "n1"], progress)
+        await server.delete_in_batches("machines", {"id": {"$in": ["n0", "n1"]}}, progress)
+        job = {"id": "partial", "type": "cascade_delete", "status": "running", "owner": "gone:1:dead",
+               "params": {"entity": "region", "entity_id": "north", "reassign_to": None},
+               "progress": {}, "created_at": server.utc_now_iso(), "updated_at": server.utc_now_iso()}
+        await server.db.jobs.insert_one({**job, "lease_until": server.lease_deadline()})
+
+        await server.run_job(job)
+        held = await server.db.jobs.find_one({"id": "partial"}, {"_id": 0})
+        await server.db.jobs.update_one({"id": "partial"}, {"$set": {"lease_until": "2020-01-01T00:00:00+00:00"}})
+        await server.run_job(job)
+        done = await server.db.jobs.find_one({"id": "partial"}, {"_id": 0})
+        return held, done, await server.db.machines.distinct("id"), await server.db.readings.distinct("id")
+
+    held, done, machines, readings = run(scenario)
+    assert held["status"] == "running" and held["owner"] == "gone:1:dead"
+    assert done["status"] == "completed" and done["owner"] == server.WORKER_ID
+    assert done["result"]["deleted"]["machines"] == 3
+    assert machines == ["s0"] and readings == ["s0-hot"]
+
+
+def test_singleton_jobs_start_once(run, monkeypatch):
+    started = []
+
+    async def slow(params, progress):
+        started.append(params)
+        await asyncio.sleep(0.01)
+        return {}
+
+    monkeypatch.setitem(server.JOB_RUNNERS, "slow", slow)
+
+    async def scenario():
+        await server.db.jobs.create_index("singleton", unique=True, partialFilterExpression={"singleton": {"$exists": True}})
+        first = await server.start_job("slow", {"n": 1}, singleton="slow")
+        second = await server.start_job("slow", {"n": 2}, singleton="slow")
+        await finish_jobs()
+        third = await server.start_job("slow", {"n": 3}, singleton="slow")
+        await finish_jobs()
+        return first, second, third
+
+    first, second, third = run(scenario)
+    assert second["id"] == first["id"] and third["id"] != first["id"]
+    assert started == [{"n": 1}, {"n": 3}]
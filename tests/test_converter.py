@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import mongomock
+import pymongo
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+import converter_backup  # noqa: E402
+from money import to_cents  # noqa: E402  (backend is on sys.path through conftest.py)
+
+LEGACY = {
+    "regions": [{"id": 1, "name": "Norte"}],
+    "clients": [{"id": 10, "name": "Bar", "region_id": 1, "commission": 10}],
+    "machines": [{"id": 100, "client_id": 10, "serial_number": "M-1", "multiplicity": 0.25}],
+    "readings": [
+        {"id": 1000, "machine_id": 100, "profit": 100.1, "commission_value": 10.01,
+         "operator_commission_value": 0.3, "created_at": "2026-10-01T10:00:00+00:00"},
+        {"id": 1001, "machine_id": 100, "profit": 0.29, "commission_value": -0.07,
+         "created_at": "2026-10-02T10:00:00+00:00"},
+    ],
+}
+
+
+@pytest.fixture
+def mongo_url(monkeypatch):
+    if os.environ.get("TEST_MONGO_URL"):
+        return os.environ["TEST_MONGO_URL"]
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda url: client)
+    return "mongodb://mongomock"
+
+
+def test_loaded_readings_carry_cents(tmp_path, mongo_url):
+    source = tmp_path / "legacy.json"
+    source.write_text(json.dumps(LEGACY), encoding="utf-8")
+    loader = converter_backup.MongoLoader(mongo_url, "slotmanager_converter_test", "legacy")
+    try:
+        converter_backup.convert_backup(str(source), loader)
+        readings = sorted(loader.db.readings.find({}, {"_id": 0}), key=lambda r: r["reading_date"])
+    finally:
+        loader.client.drop_database("slotmanager_converter_test")
+
+    assert [(r["gross_cents"], r["client_commission_cents"], r["operator_commission_cents"], r["net_cents"])
+            for r in readings] == [(10010, 1001, 30, 8979), (29, 7, 0, 22)]
+    for reading in readings:
+        assert reading["gross_cents"] == to_cents(reading["gross_value"])
+        assert reading["net_value"] == reading["net_cents"] / 100
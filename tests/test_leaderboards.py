@@ -0,0 +1,147 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'slotmanager_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+import server  # noqa: E402  (the Motor client connects lazily, no database is needed)
+
+
+def stages(pipeline):
+    return [next(iter(stage)) for stage in pipeline]
+
+
+def unions(pipeline):
+    return [stage["$unionWith"]["coll"] for stage in pipeline if "$unionWith" in stage]
+
+
+def test_month_arithmetic_wraps_years():
+    assert server.month_after("2023-12") == "2024-01"
+    assert server.month_before("2024-01") == "2023-12"
+    assert server.last_day("2024-02") == "2024-02-29"
+
+
+def test_rollup_ranges_split_whole_months_from_edge_days():
+    assert server.rollup_ranges("2024-01-15", "2024-04-10") == (
+        {"$gte": "2024-02", "$lte": "2024-03"}, [("2024-01-15", "2024-01-31"), ("2024-04-01", "2024-04-10")])
+    assert server.rollup_ranges("2024-02-01T00:00:00", "2024-02-29T23:59:59") == ({"$gte": "2024-02", "$lte": "2024-02"}, [])
+    assert server.rollup_ranges(None, None) == ({}, [])
+    assert server.rollup_ranges(None, "2024-03-05") == ({"$lte": "2024-02"}, [("2024-03-01", "2024-03-05")])
+
+
+def test_rollup_ranges_within_one_month_use_days_only():
+    assert server.rollup_ranges("2024-03-05", "2024-03-20") == (None, [("2024-03-05", "2024-03-20")])
+    assert server.rollup_ranges("2024-03-31", "2024-04-01") == (None, [("2024-03-31", "2024-04-01")])
+
+
+def test_pipeline_ranks_in_the_database():
+    pipeline = server.leaderboard_pipeline("clients", None, None, "net_cents", -1, 5, seed=False)
+    assert unions(pipeline) == ["reading_rollups_monthly"]
+    assert "$lookup" in stages(pipeline)
+    assert pipeline[-2:] == [{"$sort": {"net_cents": -1, "_id": 1}}, {"$limit": 5}]
+
+
+def test_pipeline_seeds_zero_totals_only_for_bottom():
+    top = server.leaderboard_pipeline("regions", "2020-01-15", None, "gross_cents", -1, 3, seed=False)
+    bottom = server.leaderboard_pipeline("regions", "2020-01-15", None, "gross_cents", 1, 3, seed=True)
+    assert unions(top) == ["reading_rollups_monthly", "reading_rollups"]
+    assert unions(bottom) == unions(top) + ["regions"]
+
+
+def test_hot_periods_skip_the_archive(monkeypatch):
+    monkeypatch.setattr(server, "needs_archive", lambda start_date: False)
+    pipeline = server.leaderboard_pipeline("machines", "2026-10-01", None, "gross_cents", -1, 3, seed=False)
+    assert unions(pipeline) == [] and "$lookup" not in stages(pipeline)
+
+
+def entity(entity_id, **fields):
+    return {"id": entity_id, "name": entity_id, **fields}
+
+
+def reading(machine_id, day, gross_cents):
+    return {"id": f"{machine_id}@{day}", "machine_id": machine_id, "reading_date": f"{day}T10:00:00+00:00",
+            "gross_cents": gross_cents, "client_commission_cents": gross_cents // 10, "operator_commission_cents": 0,
+            "net_cents": gross_cents - gross_cents // 10}
+
+
+async def seed():
+    """
+    Four machines with readings and an idle one, whose client and region have
+    none. The archive spans January to March 2020 so a period can cut months in
+    half; the hot readings are from yesterday.
+    """
+    await server.db.regions.insert_many([entity("north"), entity("south"), entity("empty")])
+    await server.db.clients.insert_many([entity("bar"), entity("pub"), entity("cafe"), entity("idle")])
+    await server.db.machines.insert_many([
+        entity("m1", client_id="bar", region_id="north"),
+        entity("m2", client_id="bar", region_id="north"),
+        entity("m3", client_id="pub", region_id="south"),
+        entity("m4", client_id="cafe", region_id="north"),
+        entity("m5", client_id="idle", region_id="empty"),
+    ])
+    archived = [
+        reading("m1", "2020-01-10", 1000), reading("m1", "2020-01-20", 500), reading("m1", "2020-02-15", 700),
+        reading("m2", "2020-03-05", 300), reading("m2", "2020-03-20", 2000),
+        reading("m3", "2020-01-31", 300), reading("m3", "2020-02-01", 1200),
+        reading("m4", "2020-03-10", 1500),
+    ]
+    await server.write_archive(archived)
+    await server.refresh_rollups(archived)
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
+    await server.db.readings.insert_many([reading("m1", yesterday, 400), reading("m3", yesterday, 400)])
+
+
+def ranked(body):
+    return [(row["rank"], row["id"], row["gross_value"]) for row in body["items"]]
+
+
+def leaderboards(run, api, *queries):
+    async def scenario():
+        await seed()
+        async with api() as http:
+            responses = [await http.get(f"/api/reports/leaderboards/{entity}", params=params) for entity, params in queries]
+        assert all(response.status_code == 200 for response in responses), [r.text for r in responses]
+        return [response.json() for response in responses]
+
+    return run(scenario)
+
+
+def test_rankings_add_hot_readings_to_the_archive(run, api):
+    machines, clients, regions = leaderboards(run, api, ("machines", {}), ("clients", {}), ("regions", {}))
+    assert ranked(machines) == [(1, "m1", 26.0), (2, "m2", 23.0), (3, "m3", 19.0), (4, "m4", 15.0)]
+    assert ranked(clients) == [(1, "bar", 49.0), (2, "pub", 19.0), (3, "cafe", 15.0)]
+    assert ranked(regions) == [(1, "north", 64.0), (2, "south", 19.0)]
+    bar = clients["items"][0]
+    assert bar["item"]["name"] == "bar" and bar["count"] == 6
+    assert (bar["client_commission"], bar["net_value"], bar["commission"]) == (4.9, 44.1, 4.9)
+
+
+def test_periods_cutting_months_in_half_count_only_their_days(run, api):
+    period = {"start_date": "2020-01-15", "end_date": "2020-03-10"}
+    machines, clients, regions = leaderboards(run, api, ("machines", period), ("clients", period), ("regions", period))
+    # m3 and m4 tie, as do all three clients: equal totals rank by id
+    assert ranked(machines) == [(1, "m3", 15.0), (2, "m4", 15.0), (3, "m1", 12.0), (4, "m2", 3.0)]
+    assert ranked(clients) == [(1, "bar", 15.0), (2, "cafe", 15.0), (3, "pub", 15.0)]
+    assert ranked(regions) == [(1, "north", 30.0), (2, "south", 15.0)]
+
+
+def test_open_periods_join_partial_months_with_hot_readings(run, api):
+    (machines,) = leaderboards(run, api, ("machines", {"start_date": "2020-01-15"}))
+    assert ranked(machines) == [(1, "m2", 23.0), (2, "m3", 19.0), (3, "m1", 16.0), (4, "m4", 15.0)]
+
+
+def test_bottom_rankings_start_with_entities_without_readings(run, api):
+    period = {"start_date": "2020-01-15", "end_date": "2020-03-10", "order": "bottom"}
+    machines, clients, regions = leaderboards(
+        run, api, ("machines", {**period, "limit": 3}), ("clients", {**period, "limit": 2}), ("regions", period))
+    assert ranked(machines) == [(1, "m5", 0.0), (2, "m2", 3.0), (3, "m1", 12.0)]
+    assert ranked(clients) == [(1, "idle", 0.0), (2, "bar", 15.0)]
+    assert ranked(regions) == [(1, "empty", 0.0), (2, "south", 15.0), (3, "north", 30.0)]
+    assert clients["items"][0]["item"]["name"] == "idle" and clients["items"][0]["count"] == 0
+
+
+def test_commission_ranking_adds_both_commissions(run, api):
+    (machines,) = leaderboards(run, api, ("machines", {"metric": "commission", "limit": 2}))
+    assert [(row["id"], row["commission"]) for row in machines["items"]] == [("m1", 2.6), ("m2", 2.3)]
@@ -0,0 +1,111 @@
+import server  # on sys.path through conftest.py
+
+
+def machine(code, client_id="bar", region_id="north", **fields):
+    return {"code": code, "name": code, "multiplier": 0.25, "client_id": client_id, "region_id": region_id, **fields}
+
+
+async def seed(http, count=4):
+    await server.db.regions.insert_many([{"id": "north", "name": "Norte"}, {"id": "south", "name": "Sul"}])
+    await server.db.clients.insert_many([{"id": "bar", "name": "Bar"}])
+    await server.db.operators.insert_many([{"id": "ana", "name": "Ana"}, {"id": "rui", "name": "Rui"}])
+    if not count:
+        return []
+    response = await http.post("/api/machines/bulk", json=[machine(f"M{i}", operator_id="ana") for i in range(count)])
+    return response.json()["ids"]
+
+
+def test_create_keeps_valid_machines_and_reports_the_rest(run, api):
+    async def scenario():
+        async with api() as http:
+            await seed(http, 0)
+            response = await http.post("/api/machines/bulk", json=[
+                machine("M1"),
+                machine("M2", client_id="gone"),
+                machine("M3", operator_id="ana"),
+                machine("M4", region_id="nowhere", operator_id="nobody"),
+            ])
+            codes = sorted(await server.db.machines.distinct("code"))
+            return response, codes
+
+    response, codes = run(scenario)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2 and body["failed"] == 2 and len(body["ids"]) == 2
+    assert body["errors"] == [
+        {"index": 1, "code": "M2", "error": "Client not found: gone"},
+        {"index": 3, "code": "M4", "error": "Region not found: nowhere; Operator not found: nobody"},
+    ]
+    assert codes == ["M1", "M3"]
+
+
+def test_create_rejects_malformed_payloads_and_oversized_batches(run, api, monkeypatch):
+    monkeypatch.setattr(server, "MACHINE_BULK_MAX", 2)
+
+    async def scenario():
+        async with api() as http:
+            await seed(http, 0)
+            malformed = await http.post("/api/machines/bulk", json=[machine("M1"), {"code": "M2"}])
+            oversized = await http.post("/api/machines/bulk", json=[machine(f"M{i}") for i in range(3)])
+            empty = await http.post("/api/machines/bulk", json=[])
+            return malformed, oversized, empty, await server.db.machines.count_documents({})
+
+    malformed, oversized, empty, machines = run(scenario)
+    assert malformed.status_code == 422
+    assert oversized.status_code == 400 and oversized.json()["detail"] == "At most 2 machines per request, got 3"
+    assert empty.status_code == 400
+    assert machines == 0
+
+
+def test_update_by_ids_reports_unknown_ids(run, api):
+    async def scenario():
+        async with api() as http:
+            ids = await seed(http)
+            response = await http.patch("/api/machines/bulk/by-ids",
+                                        json={"ids": ids[:2] + ["ghost"], "changes": {"operator_id": "rui"}})
+            operators = {m["id"]: m["operator_id"] for m in await server.db.machines.find({}, {"_id": 0}).to_list(None)}
+            return ids, response.json(), operators
+
+    ids, body, operators = run(scenario)
+    assert body == {"matched": 2, "modified": 2, "missing": ["ghost"]}
+    assert [operators[i] for i in ids] == ["rui", "rui", "ana", "ana"]
+
+
+def test_updates_validate_changes(run, api):
+    async def scenario():
+        async with api() as http:
+            ids = await seed(http)
+            return [
+                await http.patch("/api/machines/bulk/by-ids", json={"ids": ids, "changes": {"region_id": "nowhere"}}),
+                await http.patch("/api/machines/bulk/by-ids", json={"ids": ids, "changes": {}}),
+                await http.patch("/api/machines/bulk/by-ids", json={"ids": ids, "changes": {"client_id": None}}),
+                await http.patch("/api/machines/bulk/by-filter", json={"filter": {}, "changes": {"active": False}}),
+            ]
+
+    responses = run(scenario)
+    assert [r.status_code for r in responses] == [404, 400, 400, 400]
+    assert responses[0].json()["detail"] == "Region not found: nowhere"
+
+
+def test_update_by_filter_is_capped(run, api, monkeypatch):
+    monkeypatch.setattr(server, "MACHINE_BULK_MAX", 3)
+
+    async def scenario():
+        async with api() as http:
+            await seed(http, 3)
+            await server.db.machines.insert_one({"id": "extra", "code": "X", "region_id": "north", "operator_id": "ana"})
+            too_wide = await http.patch("/api/machines/bulk/by-filter",
+                                        json={"filter": {"region_id": "north"}, "changes": {"region_id": "south"}})
+            await server.db.machines.update_one({"id": "extra"}, {"$set": {"operator_id": "rui"}})
+            narrowed = await http.patch("/api/machines/bulk/by-filter",
+                                        json={"filter": {"region_id": "north", "operator_id": "ana"},
+                                              "changes": {"region_id": "south", "operator_id": None}})
+            machines = await server.db.machines.find({}, {"_id": 0}).to_list(None)
+            return too_wide, narrowed.json(), machines
+
+    too_wide, narrowed, machines = run(scenario)
+    assert too_wide.status_code == 400
+    assert narrowed == {"matched": 3, "modified": 3}
+    moved = [m for m in machines if m["region_id"] == "south"]
+    assert len(moved) == 3 and all(m["operator_id"] is None for m in moved)
+    assert [m["id"] for m in machines if m["region_id"] == "north"] == ["extra"]
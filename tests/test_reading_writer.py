@@ -0,0 +1,113 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'slotmanager_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+import server  # noqa: E402  (the Motor client connects lazily, no database is needed)
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+
+class FakeReadings:
+    """Stands in for db.readings: records every insert_many, optionally failing it."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.batches.append([dict(doc) for doc in docs])
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def readings(monkeypatch):
+    fake = FakeReadings()
+    monkeypatch.setattr(server, "readings_writes", lambda: fake)
+    return fake
+
+
+def make_writer(batch_size=3, window_ms=10_000, max_pending=100):
+    return server.ReadingWriter(batch_size, window_ms, max_pending, enqueue_timeout=1)
+
+
+def test_full_batch_commits_in_one_insert_and_stamps_at_commit(readings):
+    async def scenario():
+        writer = make_writer(batch_size=3)
+        docs = [{"id": f"r{i}"} for i in range(3)]
+        queued = server.utc_now_iso()
+        await asyncio.gather(*[writer.write(doc) for doc in docs])
+        return docs, queued
+
+    docs, queued = asyncio.run(scenario())
+    assert [[doc["id"] for doc in batch] for batch in readings.batches] == [["r0", "r1", "r2"]]
+    assert all(doc["updated_at"] >= queued for doc in readings.batches[0])
+    assert all("updated_at" in doc for doc in docs)
+
+
+def test_window_flushes_a_partial_batch(readings):
+    async def scenario():
+        writer = make_writer(batch_size=100, window_ms=5)
+        await asyncio.gather(writer.write({"id": "a"}), writer.write({"id": "b"}))
+
+    asyncio.run(scenario())
+    assert [[doc["id"] for doc in batch] for batch in readings.batches] == [["a", "b"]]
+
+
+def test_drain_commits_queued_readings(readings):
+    async def scenario():
+        writer = make_writer(batch_size=100)
+        writes = [asyncio.create_task(writer.write({"id": f"r{i}"})) for i in range(5)]
+        await asyncio.sleep(0)
+        assert readings.batches == []
+        await writer.drain()
+        await asyncio.gather(*writes)
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert [len(batch) for batch in readings.batches] == [5]
+    assert writer.queue == [] and not writer.commits
+
+
+def test_rejected_document_fails_only_its_own_write(readings):
+    readings.error = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}],
+        "writeConcernErrors": [],
+        "nInserted": 2,
+    })
+
+    async def scenario():
+        writer = make_writer(batch_size=3)
+        results = await asyncio.gather(*[writer.write({"id": f"r{i}"}) for i in range(3)], return_exceptions=True)
+        return writer, results
+
+    writer, results = asyncio.run(scenario())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], BulkWriteError)
+    assert writer.slots._value == 100
+
+
+def test_failed_insert_fails_the_whole_batch(readings):
+    readings.error = ConnectionError("primary unreachable")
+
+    async def scenario():
+        writer = make_writer(batch_size=2)
+        return await asyncio.gather(writer.write({"id": "a"}), writer.write({"id": "b"}), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_write_concern_comes_from_the_client_unless_overridden(monkeypatch):
+    monkeypatch.setattr(server, "db", AsyncIOMotorClient("mongodb://localhost:27017/?w=majority")["slotmanager_test"])
+    monkeypatch.setattr(server, "READINGS_WRITE_OVERRIDES", {})
+    assert server.readings_writes().write_concern.document == {"w": "majority"}
+
+    monkeypatch.setattr(server, "READINGS_WRITE_OVERRIDES", {"j": True})
+    assert server.readings_writes().write_concern.document == {"w": "majority", "j": True}
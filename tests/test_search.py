@@ -0,0 +1,83 @@
+import server  # on sys.path through conftest.py
+
+CLIENTS = ["Bar Sao Joao", "Bijoaoteca", "Joao", "Joãozinho Lanches", "BAR DO JOÃO", "Padaria Central"]
+
+
+async def seed(http):
+    for name in CLIENTS:
+        await http.post("/api/clients", json={"name": name, "commission_type": "fixed", "commission_value": 5})
+    await http.post("/api/clients", json={"name": "Mercado", "commission_type": "fixed", "commission_value": 5,
+                                          "phone": "(11) 98765-4321"})
+    await http.post("/api/operators", json={"name": "joão", "commission_type": "fixed", "commission_value": 5})
+
+
+def found(body):
+    return [(result["type"], result["match"], result["item"]["name"]) for result in body["results"]]
+
+
+def test_normalized_copies_fold_case_and_accents():
+    doc = server.index_for_search("clients", {"name": "  Pão de  AÇÚCAR ", "phone": "(11) 3333-4444"})
+    assert doc["search"]["keys"] == ["pao de acucar", "1133334444"]
+    assert doc["search"]["words"] == ["1133334444", "acucar", "de", "pao"]
+    assert {"pao", "acu", "car"} <= set(doc["search"]["grams"])
+    assert doc["search"]["sort"] == "pao de acucar"
+
+
+def test_results_are_ranked_exact_prefix_word_then_substring(run, api):
+    async def scenario():
+        async with api() as http:
+            await seed(http)
+            return (await http.get("/api/search", params={"q": "JOAO"})).json()
+
+    body = run(scenario)
+    assert found(body) == [
+        ("client", "exact", "Joao"),
+        ("operator", "exact", "joão"),
+        ("client", "prefix", "Joãozinho Lanches"),
+        ("client", "word", "BAR DO JOÃO"),
+        ("client", "word", "Bar Sao Joao"),
+        ("client", "substring", "Bijoaoteca"),
+    ]
+    assert body["has_more"] is False
+    assert all("search" not in result["item"] for result in body["results"])
+
+
+def test_accented_queries_match_unaccented_names(run, api):
+    async def scenario():
+        async with api() as http:
+            await seed(http)
+            accented = (await http.get("/api/search", params={"q": "são joão", "types": "clients"})).json()
+            phone = (await http.get("/api/search", params={"q": "98765-4321"})).json()
+            return accented, phone
+
+    accented, phone = run(scenario)
+    assert found(accented) == [("client", "substring", "Bar Sao Joao")]
+    assert found(phone) == [("client", "substring", "Mercado")]
+
+
+def test_pages_follow_the_ranking(run, api):
+    async def scenario():
+        async with api() as http:
+            await seed(http)
+            pages = [(await http.get("/api/search", params={"q": "joao", "limit": 2, "offset": offset})).json()
+                     for offset in (0, 2, 4)]
+            everything = (await http.get("/api/search", params={"q": "joao", "limit": 50})).json()
+            return pages, everything
+
+    pages, everything = run(scenario)
+    assert [page["has_more"] for page in pages] == [True, True, False]
+    assert [name for page in pages for name in found(page)] == found(everything)
+
+
+def test_invalid_searches_are_rejected(run, api):
+    async def scenario():
+        async with api() as http:
+            return [
+                await http.get("/api/search", params=params)
+                for params in ({"q": "  "}, {"q": "joao", "types": "regions"}, {"q": "joao", "limit": 0},
+                               {"q": "joao", "limit": server.SEARCH_MAX_LIMIT + 1},
+                               {"q": "joao", "offset": server.SEARCH_MAX_OFFSET + 1})
+            ]
+
+    responses = run(scenario)
+    assert [r.status_code for r in responses] == [400] * 5
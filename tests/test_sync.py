@@ -0,0 +1,151 @@
+import base64
+import json
+
+import pytest
+
+import server  # on sys.path through conftest.py
+
+OLD = "2026-01-01T00:00:00.000000+00:00"
+
+
+def doc(doc_id, updated_at=OLD):
+    return {"id": doc_id, "name": doc_id, "created_at": OLD, "updated_at": updated_at}
+
+
+async def sync(http, **params):
+    response = await http.get("/api/sync", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def pages(http, since=None, **params):
+    """Every page of one listing, following `more`."""
+    result = []
+    while True:
+        page = await sync(http, **params, **({"since": since} if since else {}))
+        result.append(page)
+        since = page["token"]
+        if not page["more"]:
+            return result
+
+
+def ids(page):
+    return [(collection, d["id"]) for collection, docs in page["changes"].items() for d in docs]
+
+
+@pytest.fixture
+def no_lag(monkeypatch):
+    monkeypatch.setattr(server, "CHANGES_SAFETY_LAG_SECONDS", 0)
+
+
+def test_listing_is_paged_across_collections(run, api, no_lag):
+    async def scenario():
+        # Several share a timestamp, so pages have to split ties by id
+        await server.db.regions.insert_many([doc(f"r{i}", OLD if i < 3 else f"2026-01-0{i}T00:00:00+00:00") for i in range(5)])
+        await server.db.clients.insert_many([doc(f"c{i}") for i in range(3)])
+        async with api() as http:
+            listing = await pages(http, limit=3, collections="regions,clients")
+            await server.db.clients.insert_one(doc("c9", "2026-02-01T00:00:00+00:00"))
+            following = await pages(http, since=listing[-1]["token"], limit=3, collections="regions,clients")
+        return listing, following
+
+    listing, following = run(scenario)
+    assert [page["full"] for page in listing] == [True, False, False]
+    assert [ids(page) for page in listing] == [
+        [("regions", "r0"), ("regions", "r1"), ("regions", "r2")],
+        [("regions", "r3"), ("regions", "r4"), ("clients", "c0")],
+        [("clients", "c1"), ("clients", "c2")],
+    ]
+    assert [ids(page) for page in following] == [[("clients", "c9")]]
+
+
+def test_token_resumes_mid_collection_without_repeating(run, api, monkeypatch):
+    # Everything is inside the safety lag: marks stay behind it, but the
+    # position inside a listing is exact
+    monkeypatch.setattr(server, "CHANGES_SAFETY_LAG_SECONDS", 60)
+
+    async def scenario():
+        async with api() as http:
+            for i in range(5):
+                await http.post("/api/regions", json={"name": f"R{i}"})
+            listing = await pages(http, limit=2, collections="regions")
+            again = await pages(http, since=listing[-1]["token"], limit=10, collections="regions")
+        return listing, again
+
+    listing, again = run(scenario)
+    listed = [region for page in listing for region in ids(page)]
+    assert [len(ids(page)) for page in listing] == [2, 2, 1]
+    assert len(set(listed)) == 5
+    # The next sync sends the overlap inside the lag again
+    assert sorted(ids(again[0])) == sorted(listed)
+
+
+def test_tombstones_are_tracked_per_collection(run, api, no_lag):
+    async def scenario():
+        await server.db.regions.insert_many([doc("r1"), doc("r2")])
+        await server.db.links.insert_many([doc("l1")])
+        async with api() as http:
+            full = await sync(http)
+            await server.db.regions.delete_one({"id": "r1"})
+            await server.record_tombstones("regions", ["r1"])
+            await server.db.links.delete_one({"id": "l1"})
+            await server.record_tombstones("links", ["l1"])
+            regions = await sync(http, since=full["token"], collections="regions")
+            links = await sync(http, since=regions["token"], collections="links")
+            regions_again = await sync(http, since=links["token"], collections="regions")
+        return full, regions, links, regions_again
+
+    full, regions, links, regions_again = run(scenario)
+    assert full["deleted"] == []
+    assert [(t["collection"], t["id"]) for t in regions["deleted"]] == [("regions", "r1")]
+    # The regions sync did not move the links' tombstone mark past l1
+    assert [(t["collection"], t["id"]) for t in links["deleted"]] == [("links", "l1")]
+    assert regions_again["deleted"] == [] and regions_again["changes"] == {"regions": []}
+
+
+def test_tombstone_pages_resume_too(run, api, no_lag):
+    async def scenario():
+        async with api() as http:
+            full = await sync(http, collections="links")
+            await server.record_tombstones("links", [f"l{i}" for i in range(3)])
+            listing = await pages(http, since=full["token"], limit=2, collections="links")
+        return listing
+
+    listing = run(scenario)
+    assert [len(page["deleted"]) for page in listing] == [2, 1]
+    assert sorted(t["id"] for page in listing for t in page["deleted"]) == ["l0", "l1", "l2"]
+
+
+def encoded(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("params", [
+    {"since": "not a token"},
+    {"since": encoded([1, 2])},
+    {"since": encoded({"marks": 5})},
+    {"since": encoded({"marks": {"regions": {"ts": 1}}})},
+    {"since": encoded({"marks": {}, "resume": {"regions": "x"}})},
+    {"since": encoded({"regions": "2026-01-01"})},
+    {"limit": 0},
+    {"limit": server.SYNC_MAX_PAGE_SIZE + 1},
+    {"collections": "regions,users"},
+])
+def test_malformed_requests_are_rejected(run, api, params):
+    async def scenario():
+        async with api() as http:
+            return await http.get("/api/sync", params=params)
+
+    assert run(scenario).status_code == 400
+
+
+def test_backup_watermark_is_accepted_as_since(run, api, no_lag):
+    async def scenario():
+        await server.db.regions.insert_many([doc("r1")])
+        async with api() as http:
+            backup = (await http.get("/api/backup/export")).json()
+            await server.db.regions.insert_one(doc("r2", "2026-02-01T00:00:00+00:00"))
+            return await sync(http, since=backup["watermark_token"], collections="regions")
+
+    page = run(scenario)
+    assert page["full"] is False and ids(page) == [("regions", "r2")]